@@ -0,0 +1,46 @@
+"""
+Local stand-in of the JointBert service with the single text and the batch predict endpoint.
+
+One forward pass at a time costs a fixed overhead plus a little per text, like the model on one GPU.
+
+usage: python performance_tests/bert_stand_in.py [port]
+"""
+import asyncio
+import sys
+
+from aiohttp import web
+
+FORWARD_OVERHEAD_SECONDS = 0.02
+SECONDS_PER_TEXT = 0.0005
+
+
+def predict(text: str) -> dict:
+    return {"intent_label": "greet", "intent_confidence": 0.9, "slot_labels": [], "input_text": text}
+
+
+def create_app(
+    forward_overhead: float = FORWARD_OVERHEAD_SECONDS, seconds_per_text: float = SECONDS_PER_TEXT
+) -> web.Application:
+    model_lock = asyncio.Lock()
+
+    async def forward(texts: list[str]) -> list[dict]:
+        async with model_lock:
+            await asyncio.sleep(forward_overhead + seconds_per_text * len(texts))
+        return [predict(text) for text in texts]
+
+    async def predict_one(request: web.Request) -> web.Response:
+        text = (await request.json())["input_text"]
+        return web.json_response((await forward([text]))[0])
+
+    async def predict_batch(request: web.Request) -> web.Response:
+        texts = (await request.json())["input_texts"]
+        return web.json_response({"predictions": await forward(texts)})
+
+    app = web.Application()
+    app.router.add_post("/predict/", predict_one)
+    app.router.add_post("/predict/batch", predict_batch)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), port=int(sys.argv[1]) if len(sys.argv) > 1 else 8848)
@@ -1,6 +1,15 @@
+"""
+Load test of the JointBert service with locust, or a throughput bench of the JointBert clients.
+
+bench usage: PYTHONPATH=src:performance_tests python performance_tests/bert_test.py [concurrency] [requests]
+the bench starts bert_stand_in on a local port and compares one request per text with micro-batched requests.
+"""
+import asyncio
 import configparser
 import os
 import json
+import sys
+import time
 
 from locust import HttpUser, task, between
 
@@ -24,3 +33,43 @@ class BertPerformanceTests(HttpUser):
                                data=json.dumps(payload),
                                headers=headers)
         print("res", res.json())
+
+
+async def run_client(model, concurrency: int, requests: int) -> float:
+    """predictions per second of concurrency workers sharing requests predictions"""
+    remaining = iter(range(requests))
+
+    async def worker():
+        for index in remaining:
+            await model.predict(f"hello {index}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start)
+
+
+async def bench(concurrency: int = 64, requests: int = 1000, port: int = 18848):
+    from aiohttp import web
+
+    from bert_stand_in import create_app
+    from models.intents.intent_classification import AsyncJointBertIntentClassificationModel
+    from utils.http_client import http_client_registry
+
+    runner = web.AppRunner(create_app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    model_url = f"http://127.0.0.1:{port}/predict/"
+    try:
+        for name, max_batch_size in [("one request per text", 1), ("micro-batched", 32)]:
+            model = AsyncJointBertIntentClassificationModel(
+                model_url, model_url + "batch", max_batch_size=max_batch_size
+            )
+            throughput = await run_client(model, concurrency, requests)
+            print(f"{name}: {throughput:.0f} predictions/s with {concurrency} concurrent callers")
+    finally:
+        await http_client_registry.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(bench(*(int(arg) for arg in sys.argv[1:3])))
@@ -0,0 +1,36 @@
+"""
+Measure the memory held by the conversations of many sessions.
+
+usage: PYTHONPATH=src python performance_tests/conversation_memory_bench.py [sessions]
+"""
+import sys
+import tracemalloc
+
+from tracker.context import ConversationContext
+
+
+def create_conversations(sessions: int) -> list[ConversationContext]:
+    conversations = []
+    for index in range(sessions):
+        conversation = ConversationContext(f"question {index}", f"session-{index}")
+        for one_round in range(12):
+            # one turn: the user message is appended, the nlu stages read the history, then the answer is appended
+            conversation.append_user_history(f"question {index} of round {one_round}")
+            conversation.get_history().format_string()
+            conversation.get_history().format_messages()
+            conversation.append_assistant_history(None)
+        conversations.append(conversation)
+    return conversations
+
+
+def main(sessions: int = 10_000):
+    tracemalloc.start()
+    conversations = create_conversations(sessions)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{len(conversations)} sessions: {current / 1024 / 1024:.1f} MiB, peak {peak / 1024 / 1024:.1f} MiB")
+    print(f"{current / len(conversations) / 1024:.2f} KiB per session")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,46 @@
+"""
+Compare the searches of a batch QA spreadsheet one by one with bulk searches, against unified_search_stand_in.
+
+usage: PYTHONPATH=src:performance_tests python performance_tests/file_batch_search_bench.py [questions] [rounds]
+"""
+import asyncio
+import sys
+import time
+
+from aiohttp import web
+
+from third_system.search_entity import SearchParam
+from third_system.unified_search import UnifiedSearch
+from unified_search_stand_in import create_app
+from utils.http_client import http_client_registry
+
+
+async def bench(questions: int = 50, rounds: int = 10, port: int = 18000):
+    runner = web.AppRunner(create_app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    unified_search = UnifiedSearch()
+    unified_search.base_url = f"http://127.0.0.1:{port}"
+    params = [SearchParam(query=f"question {index}", tags={"basic_type": "faq"}) for index in range(questions)]
+
+    async def one_by_one():
+        return await asyncio.gather(*(unified_search.search(param, "bench") for param in params))
+
+    async def bulk():
+        return await unified_search.bulk_search(params, "bench")
+
+    try:
+        for name, search_all in [("one request per question", one_by_one), ("bulk search", bulk)]:
+            start = time.perf_counter()
+            for _ in range(rounds):
+                results = await search_all()
+            elapsed = (time.perf_counter() - start) / rounds
+            assert len(results) == questions
+            print(f"{name}: {elapsed * 1000:.0f} ms per spreadsheet of {questions} questions")
+    finally:
+        await http_client_registry.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(bench(*(int(arg) for arg in sys.argv[1:3])))
@@ -0,0 +1,56 @@
+"""
+Local stand-in of the unified search service with the single and the bulk search endpoint.
+
+Every request costs a fixed latency plus a little per search, whatever the number of searches in it, and the
+service serves a few requests at a time like its worker processes.
+
+usage: python performance_tests/unified_search_stand_in.py [port]
+"""
+import asyncio
+import sys
+
+from aiohttp import web
+
+REQUEST_LATENCY_SECONDS = 0.05
+SECONDS_PER_SEARCH = 0.002
+WORKERS = 4
+
+
+def search(param: dict) -> list[dict]:
+    reference = {
+        "meta__source_type": "faq",
+        "meta__source_name": "faq.xlsx",
+        "meta__answers": f"answer of {param['query']}",
+    }
+    return [{"items": [{"meta__score": 0.9, "text": param["query"], "meta__reference": reference}]}]
+
+
+def create_app(
+    request_latency: float = REQUEST_LATENCY_SECONDS,
+    seconds_per_search: float = SECONDS_PER_SEARCH,
+    workers: int = WORKERS,
+) -> web.Application:
+    worker_slots = asyncio.Semaphore(workers)
+
+    async def serve(searches: int):
+        async with worker_slots:
+            await asyncio.sleep(request_latency + seconds_per_search * searches)
+
+    async def search_one(request: web.Request) -> web.Response:
+        param = await request.json()
+        await serve(1)
+        return web.json_response(search(param))
+
+    async def search_bulk(request: web.Request) -> web.Response:
+        params = (await request.json())["searches"]
+        await serve(len(params))
+        return web.json_response({"results": [search(param) for param in params]})
+
+    app = web.Application()
+    app.router.add_post("/search", search_one)
+    app.router.add_post("/search/bulk", search_bulk)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), port=int(sys.argv[1]) if len(sys.argv) > 1 else 8000)
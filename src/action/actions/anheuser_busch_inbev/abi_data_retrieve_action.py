@@ -4,7 +4,7 @@ from typing import Optional
 
 import pandas as pd
 from gluon_meson_sdk.models.abstract_models.chat_message_preparation import ChatMessagePreparation
-from gluon_meson_sdk.models.scenario_model_registry.base import DefaultScenarioModelRegistryCenter
+from models.chat_model.registry import ScenarioModelRegistryCenter
 from loguru import logger
 
 from action.base import Action, ActionResponse, ResponseMessageType, ChatResponseAnswer, GeneralResponse
@@ -227,7 +227,7 @@ def query_from_db(sql: str) -> tuple[str, Optional[Exception]]:
 
 class AbiDataRetrieveAction(Action):
     def __init__(self):
-        self.scenario_model_registry = DefaultScenarioModelRegistryCenter()
+        self.scenario_model_registry = ScenarioModelRegistryCenter()
         self.scenario_model = self.get_name() + "_action"
         self.data_set = extract_data_set(FILE_PATH, [1, 2, 3, 4, 5])
 
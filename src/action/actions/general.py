@@ -1,5 +1,5 @@
 import json
-from typing import Sequence
+from typing import Sequence, AsyncIterator, Union
 
 from gluon_meson_sdk.models.abstract_models.chat_message_preparation import ChatMessagePreparation
 from loguru import logger
@@ -10,12 +10,14 @@ from action.base import (
     ChatResponseAnswer,
     JumpOutResponse,
     ResponseMessageType,
+    collect_stream_response,
 )
 from action.context import ActionContext
+from models.chat_model.streaming import astream_chat
 from nlu.forms import FormStore
 from nlu.intent_with_entity import Intent, Slot
 from prompt_manager.base import PromptManager
-from gluon_meson_sdk.models.scenario_model_registry.base import DefaultScenarioModelRegistryCenter
+from models.chat_model.registry import ScenarioModelRegistryCenter
 
 
 class EndDialogueAction(Action):
@@ -38,7 +40,7 @@ class SlotFillingAction(Action):
         self.prompt_template = prompt_manager.load(name="slot_filling")
         self.intent = intent
         self.slots = slots[0]
-        self.scenario_model_registry = DefaultScenarioModelRegistryCenter()
+        self.scenario_model_registry = ScenarioModelRegistryCenter()
         self.scenario_model = "slot_filling_action"
 
     def get_slot_names(self):
@@ -78,7 +80,7 @@ class IntentConfirmAction(Action):
     def __init__(self, intent: Intent, prompt_manager: PromptManager):
         self.prompt_template = prompt_manager.load(name="intent_confirm")
         self.intent = intent
-        self.scenario_model_registry = DefaultScenarioModelRegistryCenter()
+        self.scenario_model_registry = ScenarioModelRegistryCenter()
         self.scenario_model = "intent_confirmation_action"
 
     async def run(self, context):
@@ -108,7 +110,7 @@ class IntentFillingAction(Action):
     def __init__(self, prompt_manager: PromptManager, form_store: FormStore):
         self.prompt_template = prompt_manager.load(name="intent_filling")
         self.intents = form_store.intent_list_config.get_intent_list()
-        self.scenario_model_registry = DefaultScenarioModelRegistryCenter()
+        self.scenario_model_registry = ScenarioModelRegistryCenter()
         self.scenario_model = "intent_filling_action"
 
     async def run(self, context):
@@ -140,7 +142,7 @@ class AskForIntentChoosingAction(Action):
 
     def __init__(self, prompt_manager: PromptManager):
         self.prompt_template = prompt_manager.load(name="intent_choosing")
-        self.scenario_model_registry = DefaultScenarioModelRegistryCenter()
+        self.scenario_model_registry = ScenarioModelRegistryCenter()
         self.scenario_model = "intent_choosing_action"
 
     async def run(self, context: ActionContext):
@@ -179,7 +181,7 @@ class SlotConfirmAction(Action):
         self.prompt_template = prompt_manager.load(name="slot_confirm")
         self.intent = intent
         self.slot = slot
-        self.scenario_model_registry = DefaultScenarioModelRegistryCenter()
+        self.scenario_model_registry = ScenarioModelRegistryCenter()
         self.scenario_model = "slot_confirm_action"
 
     async def run(self, context):
@@ -213,10 +215,13 @@ class ChitChatAction(Action):
         return "chitchat"
 
     def __init__(self):
-        self.scenario_model_registry = DefaultScenarioModelRegistryCenter()
+        self.scenario_model_registry = ScenarioModelRegistryCenter()
         self.scenario_model = "chit_chat_action"
 
     async def run(self, context) -> ActionResponse:
+        return await collect_stream_response(self.stream(context))
+
+    async def stream(self, context) -> AsyncIterator[Union[str, ActionResponse]]:
         logger.info("exec action slot chitchat")
         # todo: add history from context
         chat_model = await self.scenario_model_registry.get_model(self.scenario_model, context.conversation.session_id)
@@ -232,10 +237,13 @@ class ChitChatAction(Action):
         )
         chat_message_preparation.log(logger)
 
-        result = (await chat_model.achat(**chat_message_preparation.to_chat_params(), max_length=1024)).response
+        result = ""
+        async for delta in astream_chat(chat_model, **chat_message_preparation.to_chat_params(), max_length=1024):
+            result += delta
+            yield delta
 
         answer = ChatResponseAnswer(messageType=ResponseMessageType.FORMAT_TEXT, content=result)
-        return GeneralResponse(code=200, message="success", answer=answer, jump_out_flag=False)
+        yield GeneralResponse(code=200, message="success", answer=answer, jump_out_flag=False)
 
 
 def find_entity(entities, entity_type):
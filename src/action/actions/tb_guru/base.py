@@ -2,7 +2,7 @@ import asyncio
 from abc import ABC
 from typing import Union
 
-from gluon_meson_sdk.models.scenario_model_registry.base import DefaultScenarioModelRegistryCenter
+from models.chat_model.registry import ScenarioModelRegistryCenter
 from loguru import logger
 
 from action.base import Action, Attachment
@@ -22,7 +22,7 @@ def decode_bytes(contents: Union[bytes, None]) -> str:
 class TBGuruAction(Action, ABC):
     def __init__(self) -> None:
         self.unified_search = UnifiedSearch()
-        self.scenario_model_registry = DefaultScenarioModelRegistryCenter()
+        self.scenario_model_registry = ScenarioModelRegistryCenter()
         self.scenario_model = self.get_name() + "_action"
 
     async def download_first_processed_file(self, context: ActionContext) -> Union[SearchResponse, None]:
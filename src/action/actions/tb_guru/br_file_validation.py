@@ -1,9 +1,18 @@
+from typing import AsyncIterator, Union
+
 from gluon_meson_sdk.models.abstract_models.chat_message_preparation import ChatMessagePreparation
 from loguru import logger
 
-from action.base import ActionResponse, ResponseMessageType, ChatResponseAnswer, GeneralResponse
+from action.base import (
+    ActionResponse,
+    ResponseMessageType,
+    ChatResponseAnswer,
+    GeneralResponse,
+    collect_stream_response,
+)
 from action.actions.tb_guru.base import TBGuruAction
 from action.context import ActionContext
+from models.chat_model.streaming import astream_chat
 from third_system.search_entity import SearchParam
 from utils.common import get_texts_from_search_response
 
@@ -95,14 +104,18 @@ class BrFileValidation(TBGuruAction):
         return "br_file_validation"
 
     async def run(self, context: ActionContext) -> ActionResponse:
+        return await collect_stream_response(self.stream(context))
+
+    async def stream(self, context: ActionContext) -> AsyncIterator[Union[str, ActionResponse]]:
         logger.info(f"exec action: {self.get_name()} ")
 
         first_file = await self.download_first_processed_file(context)
         if not first_file:
-            return GeneralResponse.normal_failed_text_response(
+            yield GeneralResponse.normal_failed_text_response(
                 "No valid file uploaded, please upload a valid file and try again.",
                 context.conversation.current_intent.name,
             )
+            return
 
         chat_model = await self.scenario_model_registry.get_model(self.scenario_model, context.conversation.session_id)
 
@@ -136,13 +149,15 @@ class BrFileValidation(TBGuruAction):
                 chat_message_preparation.add_message("system", no_data_prompt, user_input=user_input)
                 br_file_contents = ""
         chat_message_preparation.log(logger)
-        result = (
-            await chat_model.achat(
-                **chat_message_preparation.to_chat_params(),
-                max_length=2048,
-                sub_scenario="validation" if br_file_contents else "no_data",
-            )
-        ).response
+        result = ""
+        async for delta in astream_chat(
+            chat_model,
+            **chat_message_preparation.to_chat_params(),
+            max_length=2048,
+            sub_scenario="validation" if br_file_contents else "no_data",
+        ):
+            result += delta
+            yield delta
         logger.info(f"chat result: {result}")
 
         mention_of_only_one_file_processed = ""
@@ -155,4 +170,4 @@ class BrFileValidation(TBGuruAction):
             intent=context.conversation.current_intent.name,
             references=search_res[0].items if search_res and not rule_is_provided else [],
         )
-        return GeneralResponse(code=200, message="success", answer=answer, jump_out_flag=False)
+        yield GeneralResponse(code=200, message="success", answer=answer, jump_out_flag=False)
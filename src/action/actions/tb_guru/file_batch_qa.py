@@ -55,11 +55,8 @@ class FileBatchAction(TBGuruAction):
     def get_name(self) -> str:
         return "file_batch_qa"
 
-    def get_function_with_chat_model(self, chat_model, tags, conversation):
-        async def get_result_from_llm(question, index):
-            response: list[SearchResponse] = await self.unified_search.search(
-                SearchParam(query=question, tags=tags), conversation.session_id
-            )
+    def get_function_with_chat_model(self, chat_model):
+        async def get_result_from_llm(question, index, response: list[SearchResponse]):
             logger.info(f"search response: {response}")
             context_info = "can't find any result"
             source_name = ""
@@ -142,10 +139,16 @@ class FileBatchAction(TBGuruAction):
         answer_df = df.iloc[:MAX_ROW_COUNT, :]
 
         chat_model = await self.scenario_model_registry.get_model(self.scenario_model, conversation.session_id)
-        get_result_from_llm = self.get_function_with_chat_model(chat_model, {"basic_type": "faq", **tags}, conversation)
+        get_result_from_llm = self.get_function_with_chat_model(chat_model)
+        questions = [row[questions_column] for row in answer_df.to_dict(orient="records")]
+        # one request per chunk of questions instead of one per question
+        responses = await self.unified_search.bulk_search(
+            [SearchParam(query=question, tags={"basic_type": "faq", **tags}) for question in questions],
+            conversation.session_id,
+        )
         tasks = [
-            get_result_from_llm(row[questions_column], index)
-            for index, row in enumerate(answer_df.to_dict(orient="records"))
+            get_result_from_llm(question, index, response)
+            for index, (question, response) in enumerate(zip(questions, responses))
         ]
         search_res = await asyncio.gather(*tasks)
         search_df = pd.DataFrame(search_res, columns=["answers", "reference_question", "reference_name", "score"])
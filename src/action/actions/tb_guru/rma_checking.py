@@ -1,10 +1,18 @@
 import json
+from typing import AsyncIterator, Union
 
 from gluon_meson_sdk.models.abstract_models.chat_message_preparation import ChatMessagePreparation
 from loguru import logger
 
-from action.base import ActionResponse, ResponseMessageType, ChatResponseAnswer, GeneralResponse
+from action.base import (
+    ActionResponse,
+    ResponseMessageType,
+    ChatResponseAnswer,
+    GeneralResponse,
+    collect_stream_response,
+)
 from action.actions.tb_guru.base import TBGuruAction
+from models.chat_model.streaming import astream_chat
 from third_system.search_entity import SearchParam
 from utils.action_helper import format_entities_for_search
 
@@ -39,6 +47,9 @@ class RMACheckingAction(TBGuruAction):
         return "rma_checking"
 
     async def run(self, context) -> ActionResponse:
+        return await collect_stream_response(self.stream(context))
+
+    async def stream(self, context) -> AsyncIterator[Union[str, ActionResponse]]:
         logger.info(f"exec action: {self.get_name()} ")
         chat_model = await self.scenario_model_registry.get_model(self.scenario_model, context.conversation.session_id)
         entity_dict = context.conversation.get_simplified_entities()
@@ -57,7 +68,8 @@ class RMACheckingAction(TBGuruAction):
                 content=f"the bank '{bank_name}' cannot be found in the Counterparty Bank file, please do further checks.",
                 intent=context.conversation.current_intent.name,
             )
-            return GeneralResponse(code=200, message="failed", answer=answer, jump_out_flag=False)
+            yield GeneralResponse(code=200, message="failed", answer=answer, jump_out_flag=False)
+            return
 
         all_banks_str = "\n".join([bank.model_dump_json() for bank in all_banks])
         chat_message_preparation = ChatMessagePreparation()
@@ -72,7 +84,10 @@ class RMACheckingAction(TBGuruAction):
         )
         chat_message_preparation.log(logger)
 
-        result = (await chat_model.achat(**chat_message_preparation.to_chat_params(), max_length=2048)).response
+        result = ""
+        async for delta in astream_chat(chat_model, **chat_message_preparation.to_chat_params(), max_length=2048):
+            result += delta
+            yield delta
         logger.info(f"chat result: {result}")
 
         answer = ChatResponseAnswer(
@@ -81,4 +96,4 @@ class RMACheckingAction(TBGuruAction):
             intent=context.conversation.current_intent.name,
             references=all_banks,
         )
-        return GeneralResponse(code=200, message="success", answer=answer, jump_out_flag=False)
+        yield GeneralResponse(code=200, message="success", answer=answer, jump_out_flag=False)
@@ -1,14 +1,24 @@
 import json
 import os
+from typing import AsyncIterator, Union
+
 from dotenv import load_dotenv
 
 from gluon_meson_component_sdk.knowledge_base.commands.search_command import BatchSearchCommand
 from gluon_meson_component_sdk.knowledge_base.search_document.search_document import SearchDocument
 from gluon_meson_sdk.models.abstract_models.chat_message_preparation import ChatMessagePreparation
-from gluon_meson_sdk.models.scenario_model_registry.base import DefaultScenarioModelRegistryCenter
+from models.chat_model.registry import ScenarioModelRegistryCenter
 from loguru import logger
 
-from action.base import Action, ActionResponse, ResponseMessageType, ChatResponseAnswer, GeneralResponse
+from action.base import (
+    Action,
+    ActionResponse,
+    ResponseMessageType,
+    ChatResponseAnswer,
+    GeneralResponse,
+    collect_stream_response,
+)
+from models.chat_model.streaming import astream_chat
 from third_system.knowledge_base import KnowledgeBase
 from third_system.search_entity import SearchItemReference, SearchParamFilter
 load_dotenv()
@@ -91,7 +101,7 @@ def summarize_question(chat_model, prompt, history):
     return summarized_question
 
 
-def reply_question(chat_model, prompt, question, history=None, query_result=None):
+async def stream_reply_question(chat_model, prompt, question, history=None, query_result=None) -> AsyncIterator[str]:
     chat_message_preparation = ChatMessagePreparation()
     chat_message_preparation.add_message(
         "user",
@@ -101,14 +111,16 @@ def reply_question(chat_model, prompt, question, history=None, query_result=None
         query_result=query_result
     )
     chat_message_preparation.log(logger)
-    result = chat_model.chat(**chat_message_preparation.to_chat_params(), max_length=2048).response
+    result = ""
+    async for delta in astream_chat(chat_model, **chat_message_preparation.to_chat_params(), max_length=2048):
+        result += delta
+        yield delta
     logger.info(f"chat result:\n {result}")
-    return result
 
 
 class ResearchReportInquiryAction(Action):
     def __init__(self):
-        self.scenario_model_registry = DefaultScenarioModelRegistryCenter()
+        self.scenario_model_registry = ScenarioModelRegistryCenter()
         self.scenario_model = self.get_name() + "_action"
         self.knowledge_base = KnowledgeBase()
         self.search_document = SearchDocument(size=SIZE)
@@ -140,13 +152,28 @@ class ResearchReportInquiryAction(Action):
         return search_response.items
 
     async def run(self, context) -> ActionResponse:
+        return await collect_stream_response(self.stream(context))
+
+    async def stream(self, context) -> AsyncIterator[Union[str, ActionResponse]]:
         logger.info(f"exec action:\n {self.get_name()} ")
         chat_model = await self.scenario_model_registry.get_model(self.scenario_model, context.conversation.session_id)
 
         question = context.conversation.current_user_input
         history = context.conversation.get_history().format_string()
 
-        result, references = reply_question(chat_model, chat_prompt, question, history=history), None
+        # hold the answer back until we know it does not start with SORRY, which means we need to search reports
+        result, references, answered = "", None, False
+        async for delta in stream_reply_question(chat_model, chat_prompt, question, history=history):
+            result += delta
+            if answered:
+                yield delta
+            elif not SORRY.startswith(result[:len(SORRY)]):
+                answered = True
+                yield result
+            elif len(result) >= len(SORRY):
+                break
+        if result and not answered and not result.startswith(SORRY):
+            yield result
 
         if result.startswith(SORRY):
             response = await self.search_from_knowledge_base(question, self.k, data_set_id_list=self.data_set_id_list)
@@ -163,12 +190,15 @@ class ResearchReportInquiryAction(Action):
                 for item in sorted(response, key=lambda x: x.search__score)[:self.max_references]
             ]
 
-            result = reply_question(
+            result = ""
+            async for delta in stream_reply_question(
                 chat_model,
                 reply_prompt,
                 question,
                 query_result=json.dumps([reference.json() if reference else None for reference in references])
-            )
+            ):
+                result += delta
+                yield delta
 
         answer = ChatResponseAnswer(
             messageType=ResponseMessageType.FORMAT_TEXT,
@@ -176,4 +206,4 @@ class ResearchReportInquiryAction(Action):
             intent=context.conversation.current_intent.name,
             references=references
         )
-        return GeneralResponse(code=200, message="success", answer=answer, jump_out_flag=False)
+        yield GeneralResponse(code=200, message="success", answer=answer, jump_out_flag=False)
@@ -1,7 +1,7 @@
 import json
 from abc import ABC, abstractmethod
 from enum import unique, Enum
-from typing import Optional, Union, List
+from typing import Optional, Union, List, AsyncIterator
 
 from pydantic import BaseModel
 
@@ -252,11 +252,23 @@ class Action(ABC):
         """Run the action given the context."""
         pass
 
+    async def stream(self, context: ActionContext) -> AsyncIterator[Union[str, ActionResponse]]:
+        """Stream the partial answers of the action, the last item is always the full ActionResponse."""
+        yield await self.run(context)
+
     @abstractmethod
     def get_name(self) -> str:
         pass
 
 
+async def collect_stream_response(stream: AsyncIterator[Union[str, ActionResponse]]) -> ActionResponse:
+    response = None
+    async for item in stream:
+        if isinstance(item, ActionResponse):
+            response = item
+    return response
+
+
 class DynamicAction(Action, ABC):
     @abstractmethod
     def load_from_config_context(self, config_context: ActionConfigContext):
@@ -9,6 +9,10 @@ class ActionRunner:
         """Run the given action with the provided context."""
         raise NotImplementedError
 
+    def stream(self, action: Action, context: ActionContext):
+        """Stream the partial answers of the given action with the provided context."""
+        raise NotImplementedError
+
     def register_actions(self, action: Action):
         """Register an action."""
         raise NotImplementedError
@@ -18,6 +22,9 @@ class SimpleActionRunner(ActionRunner):
     def run(self, action: Action, context: ActionContext):
         return action.run(context)
 
+    def stream(self, action: Action, context: ActionContext):
+        return action.stream(context)
+
 
 class BaseActionRunner(ActionRunner):
     """Basic implementation of an action runner."""
@@ -5,6 +5,7 @@ import logging
 import multiprocessing
 import os
 import traceback
+from contextlib import asynccontextmanager
 from typing import Optional
 from urllib.request import Request
 
@@ -15,25 +16,32 @@ from gluon_meson_sdk.models.exceptions import TokenLimitExceededException, ChatM
 from loguru import logger
 from sse_starlette import EventSourceResponse
 from starlette.middleware.cors import CORSMiddleware
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, PlainTextResponse
 from uvicorn import run
 
 from action.base import ErrorResponse, AttachmentResponse, JumpOutResponse, ActionResponse, ChatResponseAnswer
 from dialog_manager.base import BaseDialogManager, DialogManagerFactory
 from emailbot.emailbot import get_config, EmailBot, EmailBotSettings
 from logging_intercept_handler import InterceptHandler
+from metrics.base import metrics_registry
 from promptflow.command import ScoreCommand
 from router import api_router
 from third_system.atom_service import AtomService
 from third_system.microsoft_graph import Graph
 from third_system.unified_search import UnifiedSearch
+from tracker.base import ConversationVersionConflictException
+from tracker.persistent import conversation_tracker_backend
+from tracker.session_lock import SessionBusyException
 from utils.common import get_value_or_default_from_dict
+from utils.http_client import http_client_registry
 
 config = configparser.ConfigParser()
 config.read("config.ini")
 load_dotenv()
 
 is_local_mode = os.environ.get("ENV", "").lower() == "local"
+# more than one worker needs a shared conversation tracker, see CONVERSATION_TRACKER_BACKEND
+workers = int(os.environ.get("WORKERS", 1))
 
 log_handler = [
     {
@@ -45,7 +53,16 @@ log_handler = [
     }
 ]
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    dialog_manager.start()
+    yield
+    await dialog_manager.shutdown()
+    await http_client_registry.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 def get_app() -> FastAPI:
@@ -111,6 +128,36 @@ async def parse_file_name(file_url):
     return file_url.split("/")[-1]
 
 
+def get_error_message(err: Exception) -> str:
+    if isinstance(err, TokenLimitExceededException):
+        err_msg = "Dear user, your current context has exceeded the allowed token numbers." + err.message.split(
+            ":"
+        )[1].replace("This model's maximum context length is", "We allow")
+        return (
+                err_msg.replace("Your messages has exceeded the model's maximum context length. ", "")
+                + " Please start a new conversation, thanks."
+        )
+    elif isinstance(err, SessionBusyException):
+        return "Dear user, we are still working on your previous message in this conversation, please try again later."
+    elif isinstance(err, ConversationVersionConflictException):
+        return "Dear user, this conversation was updated by another message at the same time, please try again."
+    elif isinstance(err, ChatModelRequestException):
+        if err.model_source == "HSBC":
+            return "Ops.... share platform broke down, please contact your IT team for further assistance."
+        else:
+            return "Ops.... GM model broke down, please contact your IT team for further assistance."
+    return "Ops.... seems we hit problem to serve you, please contact your IT team for further assistance."
+
+
+def get_remaining_answer(content: str, streamed_answer: str) -> str:
+    if not streamed_answer:
+        return content
+    if content.startswith(streamed_answer):
+        return content[len(streamed_answer):]
+    logger.warning("final answer does not start with the streamed answer, skip the remaining part")
+    return ""
+
+
 @app.post("/score/")
 async def score(
         score_command: ScoreCommand,
@@ -119,10 +166,10 @@ async def score(
 ):
     """
     This api is a chat entrypoint, for adapt prompt flow protocol, we use the name score
+
+    partial answers are sent as soon as they are generated, the final event carries the rest of the answer,
+    the references and the session id.
     """
-    err_msg = ""
-    result = None
-    conversation = None
     session_id = score_command.conversation_id
     user_id = score_command.user_id
     file_urls = []
@@ -134,46 +181,41 @@ async def score(
     if score_command.from_email:
         await atom_service.create_human_message(session_id, user_id, score_command.question)
 
-    try:
-        first_file = (
-            await unified_search.download_raw_file_from_minio(file_urls[0]) if file_urls and file_urls[0] else None
-        )
-        result, conversation = await dialog_manager.handle_message(
-            message=score_command.question,
-            session_id=session_id,
-            first_file_name=await parse_file_name(file_urls[0]) if first_file else None,
-            file_urls=file_urls,
-            is_email_request=score_command.from_email,
-        )
-    except Exception as err:
-        logger.info(traceback.format_exc())
-        if conversation:
-            conversation.reset_history()
-
-        if isinstance(err, TokenLimitExceededException):
-            err_msg = "Dear user, your current context has exceeded the allowed token numbers." + err.message.split(
-                ":"
-            )[1].replace("This model's maximum context length is", "We allow")
-            err_msg = (
-                    err_msg.replace("Your messages has exceeded the model's maximum context length. ", "")
-                    + " Please start a new conversation, thanks."
+    async def generator():
+        err_msg = ""
+        result = None
+        conversation = None
+        streamed_answer = ""
+        try:
+            first_file = (
+                await unified_search.download_raw_file_from_minio(file_urls[0]) if file_urls and file_urls[0] else None
             )
-        elif isinstance(err, ChatModelRequestException):
-            if err.model_source == "HSBC":
-                err_msg = "Ops.... share platform broke down, please contact your IT team for further assistance."
-            else:
-                err_msg = "Ops.... GM model broke down, please contact your IT team for further assistance."
-        else:
-            err_msg = "Ops.... seems we hit problem to serve you, please contact your IT team for further assistance."
+            async for item in dialog_manager.handle_message_stream(
+                message=score_command.question,
+                session_id=session_id,
+                first_file_name=await parse_file_name(file_urls[0]) if first_file else None,
+                file_urls=file_urls,
+                is_email_request=score_command.from_email,
+            ):
+                if isinstance(item, str):
+                    streamed_answer += item
+                    async for response in generate_answer_with_len_limited({"answer": item}):
+                        yield response
+                else:
+                    result, conversation = item
+        except Exception as err:
+            logger.info(traceback.format_exc())
+            if conversation:
+                conversation.reset_history()
+            err_msg = get_error_message(err)
 
-    async def generator():
         if not result:
             response = {"answer": err_msg if err_msg else "unknown error occurred"}
         elif isinstance(result, JumpOutResponse):
             response = {"answer": "Sorry, I can't help you with that."}
         else:
             response = {
-                "answer": result.answer.get_content(),
+                "answer": get_remaining_answer(result.answer.get_content(), streamed_answer),
                 "references": result.answer.get_references(),
                 "session_id": session_id
             }
@@ -189,12 +231,20 @@ async def healthcheck():
     return {"status": "alive"}
 
 
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
 async def start_emailbot():
     logger.info("Starting emailbot")
     emailbot_configuration = get_config(EmailBotSettings)
     graph = await Graph()
     bot = EmailBot(emailbot_configuration, graph)
-    await bot.periodically_call_api()
+    try:
+        await bot.periodically_call_api()
+    finally:
+        await http_client_registry.close()
 
 
 def run_child_process():
@@ -223,7 +273,9 @@ def main():
             reload_dirs=os.path.dirname(os.path.abspath(__file__)),
         )
     else:
-        run("app:get_app", host="0.0.0.0", port=7688)
+        if workers > 1 and conversation_tracker_backend == "memory":
+            logger.warning("conversations are kept per worker, set CONVERSATION_TRACKER_BACKEND to share them")
+        run("app:get_app", host="0.0.0.0", port=7688, workers=workers)
 
 
 if __name__ == "__main__":
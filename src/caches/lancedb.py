@@ -1,16 +1,31 @@
+import asyncio
+
 from caches.base import Cache
+from models.embedding_model.client import EmbeddingClient
 from models.embedding_model.embedding import Embedding
-from typing import List, Union, Tuple
+from typing import List, Optional, Union, Tuple
 from utils.common import init_logger
 import lancedb
+import numpy as np
 import pyarrow as pa
 
 
 class LancedbCache(Cache):
     logger = init_logger(__name__)
 
-    def __init__(self, embedding_model: Embedding, cache_path: str, cache_table_name: str) -> None:
+    def __init__(
+        self,
+        embedding_model: Embedding,
+        cache_path: str,
+        cache_table_name: str,
+        embedding_client: Optional[EmbeddingClient] = None,
+    ) -> None:
         self.embedding_model = embedding_model
+        # used by the async methods, system prompts repeat verbatim so their vectors are pinned in its cache.
+        # same service, model and raw vectors as embedding_model, both paths read and write the same table
+        self.embedding_client = embedding_client or EmbeddingClient(
+            embedding_model.endpoint, embedding_model.model, normalize=False
+        )
         self.cache_path = cache_path
         self.db = lancedb.connect(cache_path)
         try:
@@ -45,6 +60,23 @@ class LancedbCache(Cache):
         self.logger.info("Searching from cache")
         system, query = self.format_query(messages)
         vector = self.calculate_vector(system, query)
+        return self.search_by_vector(vector, exact_match, similarity_score_threshold)
+
+    async def asearch_cache(
+        self,
+        messages: List,
+        exact_match: bool = False,
+        similarity_score_threshold: float = 0.02,
+    ) -> Union[str, None]:
+        """
+        Same as search_cache, with the vectors from the async embedding client
+        """
+        self.logger.info("Searching from cache")
+        system, query = self.format_query(messages)
+        vector = await self.acalculate_vector(system, query)
+        return self.search_by_vector(vector, exact_match, similarity_score_threshold)
+
+    def search_by_vector(self, vector, exact_match: bool, similarity_score_threshold: float) -> Union[str, None]:
         # always only return the first result
         cache_search_results = self.cache.search(vector).metric("cosine").limit(1).to_list()
 
@@ -72,7 +104,14 @@ class LancedbCache(Cache):
     def add_cache(self, messages: List, response: str) -> None:
         self.logger.info("Adding to cache...")
         system, query = self.format_query(messages)
-        vector = self.calculate_vector(system, query)
+        self.add_vector(self.calculate_vector(system, query), system, query, response)
+
+    async def aadd_cache(self, messages: List, response: str) -> None:
+        self.logger.info("Adding to cache...")
+        system, query = self.format_query(messages)
+        self.add_vector(await self.acalculate_vector(system, query), system, query, response)
+
+    def add_vector(self, vector, system: str, query: str, response: str) -> None:
         self.cache.add(
             [
                 {
@@ -92,6 +131,15 @@ class LancedbCache(Cache):
         query_vector = self.embedding_model.encode(query)
         return system_vector + query_vector
 
+    async def acalculate_vector(self, system: str, query: str) -> np.ndarray:
+        """
+        Same as calculate_vector, concurrent calls are batched and the vectors are cached by the embedding client
+        """
+        system_vector, query_vector = await asyncio.gather(
+            self.embedding_client.embed([system], pin=True), self.embedding_client.embed([query])
+        )
+        return np.concatenate([system_vector[0], query_vector[0]])
+
     def format_query(self, messages: List) -> Tuple[str, str]:
         """
         Format a vector database query from messages
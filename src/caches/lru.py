@@ -0,0 +1,161 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from loguru import logger
+
+from metrics.base import metrics_registry
+
+CACHE_REQUESTS_METRIC = "cache_requests_total"
+
+_MISSING = object()
+
+
+class LRUTTLCache:
+    """
+    In-process LRU cache whose entries also expire after ttl seconds, hits and misses are counted per cache name.
+
+    With persist_path, entries are kept in a sqlite file as well and loaded back on start, values have to be json
+    serializable then. set never touches the file, a writer thread saves the changes of the last flush_interval
+    seconds in one transaction, including the deletion of evicted and expired entries. close writes what is left.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int = 10000,
+        ttl: float = 3600,
+        persist_path: Optional[str] = None,
+        flush_interval: float = 1,
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        # dumped key to the (value, expires_at) row to write, or None for a row to delete
+        self._pending: dict[str, Optional[tuple[str, float]]] = {}
+        self._pending_clear = False
+        self._write_lock = threading.Lock()
+        self._closing = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        if persist_path:
+            self._open_persistence(persist_path)
+
+    def _open_persistence(self, persist_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(persist_path)), exist_ok=True)
+        self._connection = sqlite3.connect(persist_path, check_same_thread=False, isolation_level=None)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self._connection.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+        rows = self._connection.execute(
+            "SELECT key, value, expires_at FROM cache_entries ORDER BY expires_at DESC LIMIT ?", (self.maxsize,)
+        ).fetchall()
+        for key, value, expires_at in reversed(rows):
+            self.entries[self._load_key(key)] = (expires_at, json.loads(value))
+        logger.info(f"loaded {len(rows)} entries of cache {self.name} from {persist_path}")
+        self._writer = threading.Thread(target=self._write_periodically, name=f"{self.name}-cache-writer", daemon=True)
+        self._writer.start()
+
+    def _write_periodically(self):
+        while not self._closing.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as err:
+                logger.warning(f"failed to save entries of cache {self.name}: {err}")
+
+    def flush(self):
+        """write the changes since the last flush to the sqlite file in one transaction"""
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                clear, self._pending_clear = self._pending_clear, False
+            if self._connection is None or not (pending or clear):
+                return
+            self._connection.execute("BEGIN")
+            try:
+                if clear:
+                    self._connection.execute("DELETE FROM cache_entries")
+                self._connection.executemany(
+                    "DELETE FROM cache_entries WHERE key = ?", [(key,) for key, row in pending.items() if row is None]
+                )
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+                    [(key, *row) for key, row in pending.items() if row is not None],
+                )
+                self._connection.execute("COMMIT")
+            except sqlite3.Error:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _dump_key(key: Hashable) -> str:
+        return json.dumps(key, ensure_ascii=False)
+
+    @staticmethod
+    def _load_key(key: str) -> Hashable:
+        loaded = json.loads(key)
+        return tuple(loaded) if isinstance(loaded, list) else loaded
+
+    def _count(self, result: str):
+        metrics_registry.counter(CACHE_REQUESTS_METRIC, "cache lookups by result", cache=self.name, result=result).inc()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self.entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] <= time.time():
+                del self.entries[key]
+                self._forget(key)
+                entry = _MISSING
+            if entry is not _MISSING:
+                self.entries.move_to_end(key)
+        self._count("miss" if entry is _MISSING else "hit")
+        return default if entry is _MISSING else entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                evicted_key, _ = self.entries.popitem(last=False)
+                self._forget(evicted_key)
+            if self._connection is not None:
+                self._pending[self._dump_key(key)] = (json.dumps(value, ensure_ascii=False), expires_at)
+
+    def _forget(self, key: Hashable):
+        if self._connection is not None:
+            self._pending[self._dump_key(key)] = None
+
+    def __contains__(self, key: Hashable) -> bool:
+        """whether a live entry exists, without counting a lookup or refreshing its recency"""
+        entry = self.entries.get(key)
+        return entry is not None and entry[0] > time.time()
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            if self._connection is not None:
+                self._pending.clear()
+                self._pending_clear = True
+
+    def __len__(self):
+        return len(self.entries)
+
+    def close(self):
+        if self._writer is not None:
+            self._closing.set()
+            self._writer.join()
+            self._writer = None
+        if self._connection is not None:
+            self.flush()
+            with self._write_lock:
+                self._connection.close()
+                self._connection = None
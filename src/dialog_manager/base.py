@@ -1,5 +1,6 @@
+import asyncio
 import os
-from typing import Any
+from typing import Any, AsyncIterator, Union
 
 from fastapi import UploadFile
 from gluon_meson_sdk.dbs.milvus.milvus_connection import MilvusConnection
@@ -8,29 +9,36 @@ from gluon_meson_sdk.models.chat_model import ChatModel
 from gluon_meson_sdk.models.embedding_model import EmbeddingModel
 from loguru import logger
 
-from action.base import JumpOutResponse
+from action.base import JumpOutResponse, ActionResponse
 from action.context import ActionContext
 from action.runner import ActionRunner, SimpleActionRunner
-from nlu.forms import FormStore
-from nlu.intent_config import IntentListConfig
+from dialog_manager.config_snapshot import ConfigReloader, ConfigSnapshot, config_hot_reload_feature_toggle
+from metrics.tracing import request_trace, trace_span
 from nlu.llm.entity import LLMEntityExtractor
+from nlu.llm.fused_nlu import FusedNLU, fused_nlu_feature_toggle
 from nlu.llm.intent import LLMIntentClassifier
 from nlu.mlm.integrated import IntegratedNLU
+from nlu.rule.entity import RuleBasedEntityExtractor, rule_based_slot_extraction_feature_toggle
+from nlu.rule.intent import FastPathIntentClassifier, intent_fast_path_feature_toggle
 from output_adapter.base import BaseOutputAdapter, OutputAdapter
 from output_adapter.email_output_adapter import EmailOutputAdapter
 from policy.base import BasePolicyManager
 from policy.general import AssistantPolicy, IntentFillingPolicy, EndDialoguePolicy, JumpOutPolicy, IntentChoosingPolicy
 from policy.intent_available_checking import IntentAvailableCheckingPolicy
 from policy.slot_filling.slot_filling_policy import SlotFillingPolicy
-from prompt_manager.base import BasePromptManager
 from reasoner.base import Reasoner
 from reasoner.llm_reasoner import LlmReasoner
-from tracker.HistorySummarizer import HistorySummarizer
-from tracker.base import BaseConversationTracker, ConversationTracker
+from tracker.HistorySummarizer import HistorySummarizer, HistorySummarizationWorker
+from tracker.base import ConversationTracker
 from tracker.context import ConversationContext
+from tracker.persistent import create_conversation_tracker
+from tracker.session_lock import SessionLockManager
 
 summarize_history_feature_toggle = os.getenv("SUMMARIZE_HISTORY_FEATURE_TOGGLE", "False") == "True"
 
+# put after the partial answers of a streamed turn once the turn has finished
+_TURN_FINISHED = object()
+
 
 class BaseDialogManager:
     def __init__(
@@ -40,23 +48,48 @@ class BaseDialogManager:
         action_runner: ActionRunner,
         output_adapters: list[OutputAdapter],
         history_summarizer: HistorySummarizer,
+        session_lock_manager: SessionLockManager = None,
+        config_reloader: ConfigReloader = None,
     ):
         self.conversation_tracker = conversation_tracker
         self.action_runner = action_runner
         self.output_adapters = output_adapters
         self.reasoner = reasoner
         self.history_summarizer = history_summarizer
+        self.session_lock_manager = session_lock_manager or SessionLockManager()
+        self.history_summarization_worker = HistorySummarizationWorker(
+            history_summarizer, conversation_tracker, self.session_lock_manager
+        )
+        self.config_reloader = config_reloader
+        # streamed turns run on their own, they finish and are saved even if the caller stops reading
+        self.streamed_turns: set[asyncio.Task] = set()
+
+    def start(self):
+        self.conversation_tracker.start()
+        if self.config_reloader is not None:
+            self.config_reloader.start()
+
+    async def shutdown(self):
+        if self.config_reloader is not None:
+            await self.config_reloader.shutdown()
+        await asyncio.gather(*self.streamed_turns, return_exceptions=True)
+        await self.history_summarization_worker.shutdown()
+        await self.conversation_tracker.shutdown()
+
+    def set_reasoner(self, reasoner: Reasoner):
+        # requests already thinking keep the reasoner, and so the config snapshot, they started with
+        self.reasoner = reasoner
 
     async def greet(self, user_id: str) -> Any:
-        conversation = self.conversation_tracker.load_conversation(user_id)
+        conversation = await self.conversation_tracker.aload_conversation(user_id)
 
         action = self.reasoner.greet(conversation)
         action_response = self.action_runner.run(action, ActionContext(conversation))
         response = await self.output_adapter.process_output(action_response)
-        self.conversation_tracker.save_conversation(user_id, conversation)
+        await self.conversation_tracker.asave_conversation(user_id, conversation)
         return response
 
-    async def handle_message(
+    async def start_one_chat(
         self,
         message: Any,
         session_id: str,
@@ -64,13 +97,12 @@ class BaseDialogManager:
         files: list[UploadFile] = None,
         file_urls: list[str] = None,
         is_email_request=False,
-    ) -> tuple[Any, ConversationContext]:
+    ) -> ConversationContext:
         if files is None:
             files = []
         if file_urls is None:
             file_urls = []
-        self.conversation_tracker.clear_inactive_conversations()
-        conversation = self.conversation_tracker.load_conversation(session_id)
+        conversation = await self.conversation_tracker.aload_conversation(session_id)
         conversation.start_one_chat()
         logger.info(f"current intent is {conversation.current_intent}")
         conversation.current_user_input = message
@@ -79,19 +111,107 @@ class BaseDialogManager:
         conversation.add_files(files)
         conversation.add_file_urls(file_urls)
         conversation.set_email_request(is_email_request)
+        return conversation
 
-        plan = await self.reasoner.think(conversation)
-
-        response = await self.action_runner.run(plan.action, ActionContext(conversation))
+    async def end_one_chat(self, conversation: ConversationContext, response: ActionResponse):
         conversation.append_assistant_history(response.answer)
         if summarize_history_feature_toggle is True:
-            await self.history_summarizer.summarize_history(conversation)
-        self.conversation_tracker.save_conversation(conversation.session_id, conversation)
+            self.history_summarization_worker.schedule(conversation)
         conversation.current_round += 1
         if isinstance(response, JumpOutResponse):
             conversation.set_start_new_question(True)
+        await self.conversation_tracker.asave_conversation(conversation.session_id, conversation)
+
+    async def handle_message(
+        self,
+        message: Any,
+        session_id: str,
+        first_file_name: str = None,
+        files: list[UploadFile] = None,
+        file_urls: list[str] = None,
+        is_email_request=False,
+    ) -> tuple[Any, ConversationContext]:
+        with request_trace(session_id):
+            async with self.session_lock_manager.lock(session_id):
+                conversation = await self.start_one_chat(
+                    message, session_id, first_file_name, files, file_urls, is_email_request
+                )
+
+                with trace_span("reasoner"):
+                    plan = await self.reasoner.think(conversation)
+
+                with trace_span("action", action=plan.action.get_name()):
+                    response = await self.action_runner.run(plan.action, ActionContext(conversation))
+                await self.end_one_chat(conversation, response)
         return response, conversation
 
+    async def handle_message_stream(
+        self,
+        message: Any,
+        session_id: str,
+        first_file_name: str = None,
+        files: list[UploadFile] = None,
+        file_urls: list[str] = None,
+        is_email_request=False,
+    ) -> AsyncIterator[Union[str, tuple[Any, ConversationContext]]]:
+        """
+        Same as handle_message, but yield the partial answers of the action as soon as they are generated,
+        the last item is the (response, conversation) tuple.
+
+        The turn runs in its own task and hands the partial answers over through a queue, it finishes and is saved
+        even if the caller stops reading, e.g. when the client disconnects in the middle of the answer.
+        """
+        partial_answers: asyncio.Queue = asyncio.Queue()
+        turn = asyncio.create_task(
+            self._run_streamed_turn(
+                partial_answers, message, session_id, first_file_name, files, file_urls, is_email_request
+            )
+        )
+        self.streamed_turns.add(turn)
+        turn.add_done_callback(self._forget_streamed_turn)
+        while (item := await partial_answers.get()) is not _TURN_FINISHED:
+            yield item
+        # a cancelled caller must not cancel the turn
+        yield await asyncio.shield(turn)
+
+    async def _run_streamed_turn(
+        self,
+        partial_answers: asyncio.Queue,
+        message: Any,
+        session_id: str,
+        first_file_name: str = None,
+        files: list[UploadFile] = None,
+        file_urls: list[str] = None,
+        is_email_request=False,
+    ) -> tuple[Any, ConversationContext]:
+        try:
+            with request_trace(session_id):
+                async with self.session_lock_manager.lock(session_id):
+                    conversation = await self.start_one_chat(
+                        message, session_id, first_file_name, files, file_urls, is_email_request
+                    )
+
+                    with trace_span("reasoner"):
+                        plan = await self.reasoner.think(conversation)
+
+                    response = None
+                    with trace_span("action", action=plan.action.get_name()):
+                        async for item in self.action_runner.stream(plan.action, ActionContext(conversation)):
+                            if isinstance(item, ActionResponse):
+                                response = item
+                            else:
+                                partial_answers.put_nowait(item)
+                    await self.end_one_chat(conversation, response)
+            return response, conversation
+        finally:
+            partial_answers.put_nowait(_TURN_FINISHED)
+
+    def _forget_streamed_turn(self, turn: asyncio.Task):
+        self.streamed_turns.discard(turn)
+        if not turn.cancelled() and turn.exception() is not None:
+            # also seen by the caller if it still reads, logged here for callers that went away
+            logger.warning(f"streamed turn failed: {turn.exception()!r}")
+
 
 class DialogManagerFactory:
     @classmethod
@@ -104,20 +224,25 @@ class DialogManagerFactory:
         pwd = os.path.dirname(os.path.abspath(__file__))
         prompt_template_folder = os.path.join(pwd, "..", "resources", "prompt_templates")
 
-        reasoner = cls.create_reasoner(
-            model_type,
-            action_model_type,
-            intent_config_file_path,
-            prompt_template_folder,
-        )
+        snapshot = ConfigSnapshot.load(intent_config_file_path, prompt_template_folder)
+        embedding_model = EmbeddingModel()
+        milvus_for_langchain = MilvusForLangchain(embedding_model, MilvusConnection())
+
+        def create_reasoner(config_snapshot: ConfigSnapshot) -> Reasoner:
+            return cls.create_reasoner_from_snapshot(
+                config_snapshot, model_type, action_model_type, embedding_model, milvus_for_langchain
+            )
 
-        return BaseDialogManager(
-            BaseConversationTracker(),
-            reasoner,
+        dialog_manager = BaseDialogManager(
+            create_conversation_tracker(),
+            create_reasoner(snapshot),
             SimpleActionRunner(),
             [BaseOutputAdapter(), EmailOutputAdapter()],
             HistorySummarizer(),
         )
+        if config_hot_reload_feature_toggle:
+            dialog_manager.config_reloader = ConfigReloader(snapshot, create_reasoner, dialog_manager.set_reasoner)
+        return dialog_manager
 
     @classmethod
     def create_reasoner(
@@ -128,24 +253,44 @@ class DialogManagerFactory:
         prompt_template_folder,
     ):
         embedding_model = EmbeddingModel()
+        return cls.create_reasoner_from_snapshot(
+            ConfigSnapshot.load(intent_config_file_path, prompt_template_folder),
+            model_type,
+            action_model_type,
+            embedding_model,
+            MilvusForLangchain(embedding_model, MilvusConnection()),
+        )
 
-        intent_list_config = IntentListConfig.from_scenes(intent_config_file_path)
-        prompt_manager = BasePromptManager(prompt_template_folder)
+    @classmethod
+    def create_reasoner_from_snapshot(
+        cls,
+        snapshot: ConfigSnapshot,
+        model_type,
+        action_model_type,
+        embedding_model: EmbeddingModel,
+        milvus_for_langchain: MilvusForLangchain,
+    ):
+        intent_list_config = snapshot.intent_list_config
+        prompt_manager = snapshot.prompt_manager
 
         classifier = LLMIntentClassifier(
             embedding_model=embedding_model,
-            milvus_for_langchain=MilvusForLangchain(embedding_model, MilvusConnection()),
+            milvus_for_langchain=milvus_for_langchain,
             intent_list_config=intent_list_config,
             model_type=model_type,
             prompt_manager=prompt_manager,
         )
+        if intent_fast_path_feature_toggle:
+            classifier = FastPathIntentClassifier(classifier, intent_list_config)
 
-        form_store = FormStore(intent_list_config)
+        form_store = snapshot.form_store
+        rule_based_entity_extractor = RuleBasedEntityExtractor() if rule_based_slot_extraction_feature_toggle else None
         entity_extractor = LLMEntityExtractor(
             form_store,
             ChatModel(),
             model_type=model_type,
             prompt_manager=prompt_manager,
+            rule_based_entity_extractor=rule_based_entity_extractor,
         )
 
         slot_filling_policy = SlotFillingPolicy(prompt_manager, form_store)
@@ -170,6 +315,8 @@ class DialogManagerFactory:
             action_model_type=action_model_type,
         )
         nlu = IntegratedNLU(classifier, entity_extractor)
+        if fused_nlu_feature_toggle:
+            nlu = FusedNLU(intent_list_config, form_store, prompt_manager, fallback=nlu)
 
         reasoner = LlmReasoner(nlu, policy_manager, model_type)
         return reasoner
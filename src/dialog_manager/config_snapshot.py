@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import os
+from typing import Any, Callable, Optional
+
+from loguru import logger
+
+from metrics.base import metrics_registry
+from nlu.forms import FormStore
+from nlu.intent_config import IntentListConfig
+from policy.slot_filling.expression_slot_checker import compile_slot_expression
+from prompt_manager.base import PreloadedPromptManager
+
+config_hot_reload_feature_toggle = os.getenv("CONFIG_HOT_RELOAD_FEATURE_TOGGLE", "False") == "True"
+config_reload_interval = float(os.getenv("CONFIG_RELOAD_INTERVAL_SECONDS", 5))
+
+
+def fingerprint_folders(*folders: str) -> str:
+    """changes whenever a file below the folders is added, removed or modified"""
+    digest = hashlib.sha1()
+    for folder in folders:
+        for root, dirs, files in os.walk(folder):
+            dirs.sort()
+            for file_name in sorted(files):
+                file_path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(file_path)
+                except FileNotFoundError:
+                    continue
+                digest.update(f"{os.path.relpath(file_path, folder)}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+    return digest.hexdigest()
+
+
+class ConfigSnapshot:
+    """
+    Intents, forms and prompt templates loaded together, never changed after loading.
+
+    A reload builds a new snapshot instead of touching this one, so a request keeps the snapshot it started with.
+    """
+
+    __slots__ = (
+        "intent_config_file_path",
+        "prompt_template_folder",
+        "fingerprint",
+        "intent_list_config",
+        "form_store",
+        "prompt_manager",
+    )
+
+    def __init__(
+        self,
+        intent_config_file_path: str,
+        prompt_template_folder: str,
+        fingerprint: str,
+        intent_list_config: IntentListConfig,
+        form_store: FormStore,
+        prompt_manager: PreloadedPromptManager,
+    ):
+        self.intent_config_file_path = intent_config_file_path
+        self.prompt_template_folder = prompt_template_folder
+        self.fingerprint = fingerprint
+        self.intent_list_config = intent_list_config
+        self.form_store = form_store
+        self.prompt_manager = prompt_manager
+
+    @classmethod
+    def load(cls, intent_config_file_path: str, prompt_template_folder: str) -> "ConfigSnapshot":
+        # taken before reading, a file changed while loading makes the next check reload again
+        fingerprint = fingerprint_folders(intent_config_file_path, prompt_template_folder)
+        intent_list_config = IntentListConfig.from_scenes(intent_config_file_path)
+        for intent in intent_list_config.intents:
+            if intent.slot_expression is not None:
+                # an invalid expression fails the load instead of the first request of the intent
+                compile_slot_expression(intent.slot_expression)
+        form_store = FormStore(intent_list_config)
+        prompt_manager = PreloadedPromptManager(prompt_template_folder)
+        return cls(
+            intent_config_file_path, prompt_template_folder, fingerprint, intent_list_config, form_store, prompt_manager
+        )
+
+
+class ConfigReloader:
+    """
+    Poll the scene and prompt folders and install the components built from a new snapshot when they change.
+
+    Loading and building run in a worker thread, install is called in the event loop with the built result and should
+    only swap a reference. A snapshot failing to load is logged and the current one stays in use.
+    """
+
+    def __init__(
+        self,
+        snapshot: ConfigSnapshot,
+        build: Callable[[ConfigSnapshot], Any],
+        install: Callable[[Any], None],
+        interval: float = config_reload_interval,
+    ):
+        self.snapshot = snapshot
+        self.build = build
+        self.install = install
+        self.interval = interval
+        self.failed_fingerprint: Optional[str] = None
+        self.watcher_task: Optional[asyncio.Task] = None
+
+    def _load_and_build(self) -> Optional[tuple[ConfigSnapshot, Any]]:
+        fingerprint = fingerprint_folders(self.snapshot.intent_config_file_path, self.snapshot.prompt_template_folder)
+        if fingerprint in (self.snapshot.fingerprint, self.failed_fingerprint):
+            return None
+        try:
+            snapshot = ConfigSnapshot.load(self.snapshot.intent_config_file_path, self.snapshot.prompt_template_folder)
+            return snapshot, self.build(snapshot)
+        except Exception:
+            self.failed_fingerprint = fingerprint
+            raise
+
+    async def reload(self) -> bool:
+        """install a new snapshot if the files changed, return whether it was installed"""
+        try:
+            loaded = await asyncio.to_thread(self._load_and_build)
+        except Exception as err:
+            logger.error(f"Error reloading scenes and prompts, keep the current ones: {err}")
+            metrics_registry.counter("config_reload_total", "reloads of scenes and prompts", result="failure").inc()
+            return False
+        if loaded is None:
+            return False
+        snapshot, built = loaded
+        self.install(built)
+        self.snapshot = snapshot
+        self.failed_fingerprint = None
+        logger.info(
+            f"reloaded {len(snapshot.intent_list_config.intents)} intents "
+            f"and {len(snapshot.prompt_manager.templates)} prompt templates"
+        )
+        metrics_registry.counter("config_reload_total", "reloads of scenes and prompts", result="success").inc()
+        return True
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.reload()
+
+    def start(self):
+        if self.watcher_task is None:
+            self.watcher_task = asyncio.create_task(self._watch())
+
+    async def shutdown(self):
+        if self.watcher_task is not None:
+            self.watcher_task.cancel()
+            try:
+                await self.watcher_task
+            except asyncio.CancelledError:
+                pass
+            self.watcher_task = None
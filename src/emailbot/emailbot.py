@@ -2,7 +2,6 @@ import asyncio
 import time
 from typing import Generator, Union
 
-import aiohttp
 import environ
 from dotenv import load_dotenv
 from gluon_meson_sdk.client.sse_client import AsyncSSEClient
@@ -15,6 +14,7 @@ from models.email_model.model import Email
 from third_system.microsoft_graph import Graph
 from third_system.unified_search import UnifiedSearch
 from utils.common import extract_json_from_text
+from utils.http_client import get_http_session
 
 load_dotenv()
 
@@ -149,27 +149,28 @@ WHERE id = '{email.id}'
         self.database.insert_processed_email_into_database(new_email)
 
     async def _ask_thought_agent(self, payload: dict) -> Generator[str, list[Attachment], None]:
+        # the thought agent streams the answer in pieces, the caller joins them together
         streaming_returned = False
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    self.thought_agent_endpoint,
-                    json=payload,
-                    headers={
-                        "Content-Type": "application/json",
-                    },
-                ) as resp:
-                    response = resp.content.iter_chunks()
-                    response_capture = AioResponseCapture(response)
-                    client = AsyncSSEClient(response_capture)
-                    async for event in client.events():
-                        streaming_returned = True
-                        yield handle_response(extract_json_from_text(event.data))
-            except Exception as err:
-                logger.error(f"Error with thought agent: {err}")
-                yield "", []
-
-        if not streaming_returned and response_capture.collected_response:
+        response_capture = None
+        try:
+            async with get_http_session("thought_agent").post(
+                self.thought_agent_endpoint,
+                json=payload,
+                headers={
+                    "Content-Type": "application/json",
+                },
+            ) as resp:
+                response = resp.content.iter_chunks()
+                response_capture = AioResponseCapture(response)
+                client = AsyncSSEClient(response_capture)
+                async for event in client.events():
+                    streaming_returned = True
+                    yield handle_response(extract_json_from_text(event.data))
+        except Exception as err:
+            logger.error(f"Error with thought agent: {err}")
+            yield "", []
+
+        if not streaming_returned and response_capture and response_capture.collected_response:
             yield handle_response(extract_json_from_text(response_capture.collected_response))
 
     async def ask_thought_agent(self, email: Email) -> (str, list[Attachment]):
@@ -0,0 +1,132 @@
+import math
+import threading
+from collections import deque
+from typing import Iterable, Optional
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+DEFAULT_RESERVOIR_SIZE = 2048
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    label_str = ",".join(f'{key}="{escape_label_value(value)}"' for key, value in sorted(labels.items()))
+    return "{" + label_str + "}"
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+
+class Histogram:
+    """Keep count/sum of all observations and the latest observations to estimate quantiles."""
+
+    def __init__(self, reservoir_size: int = DEFAULT_RESERVOIR_SIZE):
+        self.count = 0
+        self.sum = 0.0
+        self.reservoir = deque(maxlen=reservoir_size)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            self.reservoir.append(value)
+
+    def quantile(self, q: float) -> float:
+        with self._lock:
+            values = sorted(self.reservoir)
+        if not values:
+            return math.nan
+        index = min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))
+        return values[index]
+
+    def quantiles(self, qs: Iterable[float] = DEFAULT_QUANTILES) -> dict[float, float]:
+        return {q: self.quantile(q) for q in qs}
+
+
+class MetricsRegistry:
+    """In-process metrics, rendered in the prometheus text format by the /metrics route."""
+
+    def __init__(self):
+        self.metrics: dict[str, dict[tuple, object]] = {}
+        self.types: dict[str, str] = {}
+        self.descriptions: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_type: str, factory, name: str, description: Optional[str], labels: dict):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            registered_type = self.types.setdefault(name, metric_type)
+            if registered_type != metric_type:
+                raise ValueError(f"metric {name} is already registered as {registered_type}")
+            if description:
+                self.descriptions[name] = description
+            metric_by_labels = self.metrics.setdefault(name, {})
+            if key not in metric_by_labels:
+                metric_by_labels[key] = factory()
+            return metric_by_labels[key]
+
+    def counter(self, name: str, description: str = None, **labels) -> Counter:
+        return self._get_or_create("counter", Counter, name, description, labels)
+
+    def gauge(self, name: str, description: str = None, **labels) -> Gauge:
+        return self._get_or_create("gauge", Gauge, name, description, labels)
+
+    def histogram(self, name: str, description: str = None, **labels) -> Histogram:
+        return self._get_or_create("summary", Histogram, name, description, labels)
+
+    def clear(self):
+        with self._lock:
+            self.metrics.clear()
+            self.types.clear()
+            self.descriptions.clear()
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            snapshot = {name: dict(metric_by_labels) for name, metric_by_labels in self.metrics.items()}
+        for name, metric_by_labels in sorted(snapshot.items()):
+            if name in self.descriptions:
+                lines.append(f"# HELP {name} {self.descriptions[name]}")
+            lines.append(f"# TYPE {name} {self.types[name]}")
+            for key, metric in metric_by_labels.items():
+                labels = dict(key)
+                if isinstance(metric, Histogram):
+                    for q, value in metric.quantiles().items():
+                        lines.append(f"{name}{format_labels({**labels, 'quantile': str(q)})} {value}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {metric.sum}")
+                    lines.append(f"{name}_count{format_labels(labels)} {metric.count}")
+                else:
+                    lines.append(f"{name}{format_labels(labels)} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
@@ -0,0 +1,83 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from loguru import logger
+
+from metrics.base import metrics_registry
+
+log_request_trace_feature_toggle = os.getenv("LOG_REQUEST_TRACE_FEATURE_TOGGLE", "False") == "True"
+
+REQUEST_LATENCY_METRIC = "dialog_request_latency_seconds"
+STAGE_LATENCY_METRIC = "dialog_stage_latency_seconds"
+LLM_LATENCY_METRIC = "llm_call_latency_seconds"
+
+
+class Span:
+    def __init__(self, name: str, duration: float, labels: dict):
+        self.name = name
+        self.duration = duration
+        self.labels = labels
+
+    def to_dict(self):
+        return {"name": self.name, "duration": round(self.duration, 4), **self.labels}
+
+
+class RequestTrace:
+    """Spans recorded during one dialog request, in the order they finished."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.spans: list[Span] = []
+        self.started_at = time.perf_counter()
+
+    def add_span(self, name: str, duration: float, **labels):
+        self.spans.append(Span(name, duration, labels))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def breakdown(self) -> list[dict]:
+        return [span.to_dict() for span in self.spans]
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_request_trace", default=None)
+
+
+def get_current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def request_trace(session_id: str):
+    trace = RequestTrace(session_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        elapsed = trace.elapsed()
+        metrics_registry.histogram(REQUEST_LATENCY_METRIC, "latency of one dialog request").observe(elapsed)
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # the trace was closed from another context, e.g. an abandoned streaming response
+            _current_trace.set(None)
+        if log_request_trace_feature_toggle:
+            logger.info(f"session {session_id}, request took {elapsed:.3f}s, trace: {trace.breakdown()}")
+
+
+@contextmanager
+def trace_span(stage: str, metric_name: str = STAGE_LATENCY_METRIC, **labels):
+    """Record how long the block takes, both in the per-request trace and in the in-process histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        metric_labels = {key: value for key, value in labels.items() if isinstance(value, str)}
+        metrics_registry.histogram(metric_name, stage=stage, **metric_labels).observe(duration)
+        trace = get_current_trace()
+        if trace is not None:
+            trace.add_span(stage, duration, **labels)
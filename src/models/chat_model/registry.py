@@ -0,0 +1,47 @@
+from gluon_meson_sdk.models.scenario_model_registry.base import DefaultScenarioModelRegistryCenter
+
+from metrics.tracing import trace_span, LLM_LATENCY_METRIC
+from models.chat_model.response_cache import get_llm_response_cache
+
+
+class TracedChatModel:
+    """Delegate to the scenario chat model and record the latency of every call."""
+
+    def __init__(self, chat_model, scenario: str):
+        self.chat_model = chat_model
+        self.scenario = scenario
+
+    def _trace_span(self, kwargs: dict):
+        return trace_span(
+            f"llm:{self.scenario}", LLM_LATENCY_METRIC, scenario=self.scenario, sub_scenario=kwargs.get("sub_scenario")
+        )
+
+    def chat(self, *args, **kwargs):
+        with self._trace_span(kwargs):
+            return self.chat_model.chat(*args, **kwargs)
+
+    async def achat(self, *args, **kwargs):
+        with self._trace_span(kwargs):
+            return await self.chat_model.achat(*args, **kwargs)
+
+    def _traced_astream_chat(self, stream_chat):
+        async def astream_chat(*args, **kwargs):
+            with self._trace_span(kwargs):
+                async for chunk in stream_chat(*args, **kwargs):
+                    yield chunk
+
+        return astream_chat
+
+    def __getattr__(self, name):
+        attr = getattr(self.chat_model, name)
+        if name == "astream_chat":
+            return self._traced_astream_chat(attr)
+        return attr
+
+
+class ScenarioModelRegistryCenter(DefaultScenarioModelRegistryCenter):
+    async def get_model(self, scenario: str, *args, **kwargs):
+        chat_model = TracedChatModel(await super().get_model(scenario, *args, **kwargs), scenario)
+        llm_response_cache = get_llm_response_cache()
+        # cache hits never reach the model, the llm latency metric only has real calls
+        return llm_response_cache.wrap(chat_model, scenario) if llm_response_cache else chat_model
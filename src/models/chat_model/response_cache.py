@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Optional
+
+import numpy as np
+import yaml
+from loguru import logger
+
+from caches.lru import LRUTTLCache
+from metrics.base import metrics_registry
+from models.embedding_model.client import EmbeddingClient
+
+llm_response_cache_feature_toggle = os.getenv("LLM_RESPONSE_CACHE_FEATURE_TOGGLE", "False") == "True"
+llm_response_cache_config_path = os.getenv(
+    "LLM_RESPONSE_CACHE_CONFIG_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "..", "resources", "llm_response_cache.yaml"),
+)
+LLM_RESPONSE_CACHE_METRIC = "llm_response_cache_total"
+
+
+def message_role_and_content(message) -> tuple[Optional[str], str]:
+    if isinstance(message, dict):
+        return message.get("role"), str(message.get("content", ""))
+    return getattr(message, "role", None), str(getattr(message, "content", message))
+
+
+def split_prompt(kwargs: dict[str, Any]) -> tuple[str, str]:
+    """
+    (key of everything but the non system messages, text of the non system messages)
+
+    calls with the same first part only differ in what the user said, their answers may be reused by similarity.
+    """
+    fixed = {key: value for key, value in kwargs.items() if key != "messages"}
+    system = []
+    conversation = []
+    for message in kwargs.get("messages") or []:
+        role, content = message_role_and_content(message)
+        if role == "system":
+            system.append(content)
+        else:
+            conversation.append(f"{role}: {content}")
+    fixed["system"] = system
+    fixed_key = json.dumps(fixed, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(fixed_key.encode("utf-8")).hexdigest(), "\n".join(conversation)
+
+
+class ScenarioResponseCache:
+    """
+    Answers of one scenario by the hash of the whole prompt, with an optional similarity lookup.
+
+    For the similarity lookup the non system messages are embedded. A prompt with the same system messages and
+    arguments reuses the answer of the most similar cached prompt if their similarity reaches the threshold.
+    """
+
+    def __init__(
+        self,
+        scenario: str,
+        ttl: float = 3600,
+        maxsize: int = 2000,
+        similarity_threshold: Optional[float] = None,
+        share_sub_scenarios: bool = False,
+        embedding_client: EmbeddingClient = None,
+    ):
+        self.scenario = scenario
+        self.similarity_threshold = similarity_threshold
+        self.share_sub_scenarios = share_sub_scenarios
+        self.maxsize = maxsize
+        self.responses = LRUTTLCache(f"llm_response:{scenario}", maxsize, ttl)
+        # embeddings of the cached prompts by their fixed part, checked against responses before use
+        self.embeddings: dict[str, OrderedDict[str, np.ndarray]] = {}
+        self.embedding_client = embedding_client or (EmbeddingClient() if similarity_threshold else None)
+
+    def _count(self, result: str):
+        metrics_registry.counter(
+            LLM_RESPONSE_CACHE_METRIC, "llm calls answered by the response cache", scenario=self.scenario, result=result
+        ).inc()
+
+    def keys(self, kwargs: dict[str, Any]) -> tuple[str, str, str]:
+        """(exact key, fixed key, conversation text) of the call"""
+        if self.share_sub_scenarios:
+            kwargs = {key: value for key, value in kwargs.items() if key != "sub_scenario"}
+        fixed_key, conversation = split_prompt(kwargs)
+        exact_key = hashlib.sha1(f"{fixed_key}\n{conversation}".encode("utf-8")).hexdigest()
+        return exact_key, fixed_key, conversation
+
+    async def get(self, kwargs: dict[str, Any]) -> tuple[Any, tuple[str, str, str], Optional[np.ndarray]]:
+        """(cached answer or None, keys of the call, embedding of the conversation if it was needed)"""
+        keys = self.keys(kwargs)
+        exact_key, fixed_key, conversation = keys
+        response = self.responses.get(exact_key)
+        if response is not None:
+            self._count("exact_hit")
+            return response, keys, None
+
+        embedding = None
+        candidates = self.embeddings.get(fixed_key)
+        if self.similarity_threshold and conversation:
+            try:
+                embedding = (await self.embedding_client.embed([conversation]))[0]
+            except Exception as err:
+                logger.error(f"Error embedding prompt of scenario {self.scenario}: {err}")
+        if embedding is not None and candidates:
+            similar_key, similarity = max(
+                ((key, float(vector @ embedding)) for key, vector in candidates.items()), key=lambda item: item[1]
+            )
+            response = self.responses.get(similar_key) if similarity >= self.similarity_threshold else None
+            if response is not None:
+                logger.info(f"llm response of scenario {self.scenario} reused at similarity {similarity:.3f}")
+                self._count("similar_hit")
+                return response, keys, embedding
+        self._count("miss")
+        return None, keys, embedding
+
+    def set(self, keys: tuple[str, str, str], response: Any, embedding: Optional[np.ndarray]):
+        exact_key, fixed_key, _ = keys
+        self.responses.set(exact_key, response)
+        if embedding is None:
+            return
+        candidates = self.embeddings.setdefault(fixed_key, OrderedDict())
+        candidates[exact_key] = embedding
+        # drop embeddings of evicted or expired answers before they outnumber the answers
+        if sum(len(bucket) for bucket in self.embeddings.values()) > self.maxsize:
+            for bucket_key, bucket in list(self.embeddings.items()):
+                for key in [key for key in bucket if key not in self.responses.entries]:
+                    del bucket[key]
+                if not bucket:
+                    del self.embeddings[bucket_key]
+            while len(candidates) > self.maxsize:
+                candidates.popitem(last=False)
+
+
+class CachedChatModel:
+    """Answer achat from the scenario response cache, the model is only called on a miss."""
+
+    def __init__(self, chat_model, cache: ScenarioResponseCache):
+        self.chat_model = chat_model
+        self.cache = cache
+
+    async def achat(self, *args, **kwargs):
+        if args:
+            return await self.chat_model.achat(*args, **kwargs)
+        response, keys, embedding = await self.cache.get(kwargs)
+        if response is not None:
+            return response
+        response = await self.chat_model.achat(**kwargs)
+        if response is not None:
+            self.cache.set(keys, response, embedding)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.chat_model, name)
+
+
+class LLMResponseCache:
+    """The response caches of the configured scenarios, shared by all scenario model registries."""
+
+    def __init__(self, config: dict[str, Any]):
+        defaults = {key: config[key] for key in ("ttl", "maxsize") if key in config}
+        self.caches = {
+            scenario: ScenarioResponseCache(scenario, **{**defaults, **(settings or {})})
+            for scenario, settings in (config.get("scenarios") or {}).items()
+        }
+
+    @classmethod
+    def from_yaml(cls, path: str) -> "LLMResponseCache":
+        with open(path, "r", encoding="utf-8") as file:
+            return cls(yaml.safe_load(file) or {})
+
+    def wrap(self, chat_model, scenario: str):
+        cache = self.caches.get(scenario)
+        return CachedChatModel(chat_model, cache) if cache else chat_model
+
+
+_llm_response_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_response_cache() -> Optional[LLMResponseCache]:
+    global _llm_response_cache
+    if llm_response_cache_feature_toggle and _llm_response_cache is None:
+        _llm_response_cache = LLMResponseCache.from_yaml(llm_response_cache_config_path)
+    return _llm_response_cache
@@ -0,0 +1,22 @@
+from typing import AsyncIterator
+
+from loguru import logger
+
+
+async def astream_chat(chat_model, **chat_params) -> AsyncIterator[str]:
+    """
+    Yield the answer of a scenario chat model piece by piece.
+
+    Models that do not expose ``astream_chat`` are called with ``achat`` and the whole answer is yielded once,
+    so callers can always consume the answer as a stream.
+    """
+    stream_chat = getattr(chat_model, "astream_chat", None)
+    if stream_chat is None:
+        logger.debug("chat model does not support streaming, fallback to achat")
+        yield (await chat_model.achat(**chat_params)).response
+        return
+
+    async for chunk in stream_chat(**chat_params):
+        delta = chunk.response if hasattr(chunk, "response") else chunk
+        if delta:
+            yield delta
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import os
+from typing import Optional
+
+import aiohttp
+import numpy as np
+
+from caches.lru import LRUTTLCache
+from metrics.base import metrics_registry
+from utils.http_client import get_http_session
+
+embedding_url = os.getenv("EMBEDDING_URL", "http://localhost:6008/v1/embeddings")
+embedding_model_name = os.getenv("EMBEDDING_MODEL", "m3e-base")
+embedding_cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", 10000))
+embedding_cache_ttl = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", 24 * 3600))
+embedding_pinned_cache_size = int(os.getenv("EMBEDDING_PINNED_CACHE_SIZE", 20000))
+
+
+class EmbeddingClient:
+    """
+    Async client of the embedding service, same request format as models.embedding_model.embedding.Embedding.
+
+    Texts embedded by concurrent callers within batch_window seconds are sent in one request of at most
+    max_batch_size texts, over the pooled session of utils.http_client. Vectors are remembered by the hash of their
+    text in an LRU cache, pinned texts such as system prompts are kept apart in a second, larger one, so queries never
+    evict them. Templated prompts differ per conversation, the pinned cache is bounded as well. With normalize
+    the vectors are L2 normalized, without it they are the raw vectors of the service, as Embedding.encode returns them.
+    """
+
+    def __init__(
+        self,
+        url: str = embedding_url,
+        model: str = embedding_model_name,
+        timeout: float = 30,
+        batch_window: float = 0.002,
+        max_batch_size: int = 64,
+        cache_size: int = embedding_cache_size,
+        cache_ttl: float = embedding_cache_ttl,
+        pinned_cache_size: int = embedding_pinned_cache_size,
+        normalize: bool = True,
+    ):
+        self.url = url
+        self.model = model
+        self.normalize = normalize
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.cache = LRUTTLCache("embedding", cache_size, cache_ttl) if cache_size > 0 else None
+        self.pinned = LRUTTLCache("embedding_pinned", pinned_cache_size, cache_ttl) if pinned_cache_size > 0 else None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.pending: list[tuple[str, asyncio.Future]] = []
+        # one request per text at a time, callers asking for a text being embedded wait for the same future
+        self.in_flight: dict[str, asyncio.Future] = {}
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.sending_tasks: set[asyncio.Task] = set()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model}\n{text}".encode("utf-8")).hexdigest()
+
+    async def embed(self, texts: list[str], pin: bool = False) -> np.ndarray:
+        """return a (len(texts), dim) float32 matrix of embeddings, L2 normalized with normalize"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        vectors: dict[str, np.ndarray] = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            key = self._key(text)
+            vector = self.pinned.get(key) if self.pinned is not None else None
+            if vector is None and self.cache is not None:
+                vector = self.cache.get(key)
+                if vector is not None and pin and self.pinned is not None:
+                    self.pinned.set(key, vector)
+            if vector is None:
+                missing.append(text)
+            else:
+                vectors[text] = vector
+        if missing:
+            for text, vector in zip(missing, await asyncio.gather(*(self._enqueue(text) for text in missing))):
+                vectors[text] = vector
+                self._remember(text, vector, pin)
+        return np.vstack([vectors[text] for text in texts])
+
+    def _remember(self, text: str, vector: np.ndarray, pin: bool):
+        key = self._key(text)
+        if pin and self.pinned is not None:
+            self.pinned.set(key, vector)
+        elif self.cache is not None and (self.pinned is None or key not in self.pinned):
+            self.cache.set(key, vector)
+
+    def _enqueue(self, text: str) -> asyncio.Future:
+        """future of the embedding, shielded as callers of the same text share it"""
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            # futures belong to the loop they were created in
+            self.loop, self.pending, self.in_flight, self.flush_handle = loop, [], {}, None
+        key = self._key(text)
+        if key in self.in_flight:
+            return asyncio.shield(self.in_flight[key])
+        future = loop.create_future()
+        self.in_flight[key] = future
+        self.pending.append((text, future))
+        if len(self.pending) >= self.max_batch_size:
+            self._flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.batch_window, self._flush)
+        return asyncio.shield(future)
+
+    def _flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self.sending_tasks.add(task)
+            task.add_done_callback(self.sending_tasks.discard)
+
+    async def _send(self, batch: list[tuple[str, asyncio.Future]]):
+        metrics_registry.histogram("embedding_batch_size", "texts per embedding request").observe(len(batch))
+        try:
+            matrix = await self._post([text for text, _ in batch])
+        except Exception as err:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(err)
+            return
+        finally:
+            for text, _ in batch:
+                self.in_flight.pop(self._key(text), None)
+        for (_, future), vector in zip(batch, matrix):
+            if not future.done():
+                vector.flags.writeable = False
+                future.set_result(vector)
+
+    async def _post(self, texts: list[str]) -> np.ndarray:
+        payload = {"model": self.model, "query": texts, "normalize_embeddings": self.normalize}
+        async with get_http_session("embedding").post(self.url, json=payload, timeout=self.timeout) as response:
+            response.raise_for_status()
+            embeddings = (await response.json())["embeddings"]
+        if len(embeddings) != len(texts):
+            raise ValueError(f"expected {len(texts)} embeddings, got {len(embeddings)}")
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        return normalize_rows(matrix) if self.normalize else matrix
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
@@ -4,23 +4,26 @@ from src.utils.common import init_logger
 
 class Embedding:
     logger = init_logger(__name__)
+    model = "m3e-base"
 
     def __init__(self, endpoint) -> None:
         self.logger.debug("Init embedding")
         self.endpoint = endpoint
+        # keep the connection alive between calls, models.embedding_model.client.EmbeddingClient is the async client
+        self.session = requests.Session()
 
-    def encode(self, query, model="m3e-base", normalize_embeddings=False):
+    def encode(self, query, model=None, normalize_embeddings=False):
         headers = {"Content-Type": "application/json", "accept": "application/json"}
 
         body = {
-            "model": model,
+            "model": model or self.model,
             "query": query,
             "normalize_embeddings": normalize_embeddings,
         }
 
         try:
             self.logger.debug("Encode query with embedding")
-            response = requests.post(url=self.endpoint, json=body, headers=headers, timeout=30)
+            response = self.session.post(url=self.endpoint, json=body, headers=headers, timeout=30)
             return response.json()["embeddings"]
         except Exception as e:
             self.logger.error("Embedding Error: %s", str(e), exc_info=True)
@@ -1,10 +1,15 @@
+import asyncio
 import configparser
+from typing import Optional
 
+import aiohttp
 import requests
 from fastapi import HTTPException
 from loguru import logger
 from pydantic import BaseModel
 
+from metrics.base import metrics_registry
+from utils.http_client import get_http_session
 from utils.common import get_config_path
 
 
@@ -13,6 +18,10 @@ class IntentClassificationModelResponse(BaseModel):
     confidence: float
 
 
+def to_response(data: dict) -> IntentClassificationModelResponse:
+    return IntentClassificationModelResponse(intent=data.get("intent_label"), confidence=data.get("intent_confidence"))
+
+
 class IntentClassificationModel:
     def predict(self, text):
         return IntentClassificationModelResponse(intent="greet", confidence=0.9)
@@ -22,6 +31,8 @@ config = configparser.ConfigParser()
 config.read(get_config_path())
 
 MODEL_URL = config["JointBert"]["base_url"]
+# takes {"input_texts": [...]} and answers {"predictions": [...]}, one prediction per text in the format of MODEL_URL
+BATCH_MODEL_URL = config["JointBert"].get("batch_url", fallback=MODEL_URL.rstrip("/") + "/batch")
 
 
 class JoinBertIntentClassificationModel(IntentClassificationModel):
@@ -33,9 +44,89 @@ class JoinBertIntentClassificationModel(IntentClassificationModel):
         payload = {"input_text": text}
         response = requests.post(self.model_url, json=payload)
         if response.status_code == 200:
-            data = response.json()
-            name = data.get("intent_label")
-            confidence = data.get("intent_confidence")
-            return IntentClassificationModelResponse(intent=name, confidence=confidence)
+            return to_response(response.json())
         else:
             raise HTTPException(status_code=response.status_code, detail={response.text})
+
+
+class AsyncJointBertIntentClassificationModel(IntentClassificationModel):
+    """
+    Non blocking JointBert client, predictions requested within batch_window seconds are sent in one batch request.
+
+    A batch is sent early once it has max_batch_size texts, a single text goes to the single text endpoint. When the
+    batch request fails, e.g. where the service has no batch endpoint, its texts are predicted one by one. The
+    requests share the pooled session of utils.http_client.
+    """
+
+    def __init__(
+        self,
+        model_url: str = MODEL_URL,
+        batch_url: str = BATCH_MODEL_URL,
+        batch_window: float = 0.005,
+        max_batch_size: int = 32,
+        timeout: float = 10,
+    ):
+        self.model_url = model_url
+        self.batch_url = batch_url
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.pending: list[tuple[str, asyncio.Future]] = []
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        # strong references of the running batches, the event loop only keeps weak ones
+        self.sending_tasks: set[asyncio.Task] = set()
+
+    async def predict(self, text) -> IntentClassificationModelResponse:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((text, future))
+        if len(self.pending) >= self.max_batch_size:
+            self._flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self.sending_tasks.add(task)
+            task.add_done_callback(self.sending_tasks.discard)
+
+    async def _send(self, batch: list[tuple[str, asyncio.Future]]):
+        metrics_registry.histogram("jointbert_batch_size", "texts per JointBert request").observe(len(batch))
+        texts = [text for text, _ in batch]
+        if len(texts) == 1:
+            results = await asyncio.gather(self._post_one(texts[0]), return_exceptions=True)
+        else:
+            try:
+                results = await self._post_batch(texts)
+            except Exception as err:
+                logger.warning(f"JointBert batch prediction of {len(texts)} texts failed, predicting one by one: {err}")
+                results = await asyncio.gather(*(self._post_one(text) for text in texts), return_exceptions=True)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                logger.error(f"JointBert prediction failed: {result}")
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _post_one(self, text: str) -> IntentClassificationModelResponse:
+        return to_response(await self._post(self.model_url, {"input_text": text}))
+
+    async def _post_batch(self, texts: list[str]) -> list[IntentClassificationModelResponse]:
+        predictions = (await self._post(self.batch_url, {"input_texts": texts}))["predictions"]
+        if len(predictions) != len(texts):
+            raise ValueError(f"expected {len(texts)} predictions, got {len(predictions)}")
+        return [to_response(prediction) for prediction in predictions]
+
+    async def _post(self, url: str, payload: dict) -> dict:
+        async with get_http_session("jointbert").post(url, json=payload, timeout=self.timeout) as response:
+            if response.status != 200:
+                raise HTTPException(status_code=response.status, detail={await response.text()})
+            return await response.json()
@@ -33,6 +33,8 @@ class Form(HashableBaseModel):
 class FormStore:
     def __init__(self, intent_list_config):
         self.intent_list_config = intent_list_config
+        # built on first use, the intent list config never changes
+        self.forms: dict[str, Form] = {}
 
     @staticmethod
     def _valid_slot(slot):
@@ -49,11 +51,17 @@ class FormStore:
     def get_form_from_intent(self, intent: Intent) -> Optional[Form]:
         if not intent:
             return None
+        return self.get_form(intent.name)
 
-        intent_config = self.intent_list_config.get_intent(intent.name)
-        if intent_config is None:
-            return None
+    def get_form(self, intent_name: str) -> Optional[Form]:
+        if intent_name not in self.forms:
+            intent_config = self.intent_list_config.get_intent(intent_name)
+            if intent_config is None:
+                return None
+            self.forms[intent_name] = self._build_form(intent_config)
+        return self.forms[intent_name]
 
+    def _build_form(self, intent_config) -> Form:
         slots, slot_required = self._filter_and_process_slots(intent_config.slots)
 
         return Form(
@@ -1,4 +1,8 @@
+import hashlib
+import json
 import os
+from functools import cached_property
+from typing import Optional
 
 import yaml
 
@@ -54,9 +58,17 @@ class IntentConfig:
 
 
 class IntentListConfig:
+    """
+    The intents of all scenes, indexed by name, full name and parent intent when loaded.
+
+    The intents are not supposed to change after the config is created, the indexes and the rendered intent lists
+    would be stale otherwise.
+    """
+
     def __init__(self, intents: list[IntentConfig]):
         self.intents = intents
         self._initialize_fixed_intents()
+        self._build_indexes()
 
     def _initialize_fixed_intents(self):
         fixed_intents = [
@@ -69,25 +81,124 @@ class IntentListConfig:
             intent = IntentConfig(name, description, business, action, slots, disabled)
             self.intents.append(intent)
 
-    def get_intent_list(self) -> list[IntentConfig]:
-        return self.intents
-
-    def get_intent_name_list_by_their_parent_intent(self, parent_intent: str = None):
-        # read resources/intent.yaml file and get intent list
-        return [
-            intent.name
+    def _build_indexes(self):
+        self.intents_by_name: dict[str, IntentConfig] = {}
+        self.intents_by_full_name: dict[str, IntentConfig] = {}
+        self.intents_by_parent: dict[str, list[IntentConfig]] = {}
+        for intent in self.intents:
+            # the first one wins for duplicated names, same as the former linear search
+            self.intents_by_name.setdefault(intent.name, intent)
+            self.intents_by_full_name.setdefault(intent.get_full_intent_name(), intent)
+            self.intents_by_parent.setdefault(intent.full_name_of_parent_intent, []).append(intent)
+        self.intent_names_by_parent: dict[str, list[str]] = {
+            parent: [intent.name for intent in children if intent.name != "unknown"]
+            for parent, children in self.intents_by_parent.items()
+        }
+        self.descendants_by_full_name: dict[str, list[IntentConfig]] = {
+            intent.get_full_intent_name(): [other for other in self.intents if intent.is_ancestor_of(other)]
             for intent in self.intents
-            if intent.name != "unknown" and intent.full_name_of_parent_intent == parent_intent
-        ]
+            if intent.has_children
+        }
+        self._leaf_intents_by_parent: dict[str, list[IntentConfig]] = {}
+        self._intent_list_items: dict[tuple[str, str], list[dict]] = {}
+        self._intent_list_payloads: dict[tuple[str, str], str] = {}
 
-    def get_children_intents(self, current_intent: IntentConfig):
-        children_intents = []
-        if current_intent.has_children:
-            children_intents = [intent for intent in self.intents if current_intent.is_ancestor_of(intent)]
-        return children_intents
+    @cached_property
+    def config_hash(self) -> str:
+        """fingerprint of the loaded scenes, results derived from the config are invalid once it changes"""
+        content = json.dumps([intent.__dict__ for intent in self.intents], sort_keys=True, default=str)
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    def get_intent_list(self) -> list[IntentConfig]:
+        return self.intents
 
-    def get_intent(self, intent_name):
-        return next((intent for intent in self.intents if intent.name == intent_name), None)
+    def get_intent_name_list_by_their_parent_intent(self, parent_intent: str = None) -> list[str]:
+        return self.intent_names_by_parent.get(parent_intent, [])
+
+    def get_children_intents(self, current_intent: IntentConfig) -> list[IntentConfig]:
+        """all descendants of the intent, not only the direct children"""
+        if not current_intent.has_children:
+            return []
+        descendants = self.descendants_by_full_name.get(current_intent.get_full_intent_name())
+        if descendants is None:
+            descendants = [intent for intent in self.intents if current_intent.is_ancestor_of(intent)]
+        return descendants
+
+    def get_intent(self, intent_name) -> IntentConfig:
+        return self.intents_by_name.get(intent_name)
+
+    def get_intent_by_full_name(self, full_intent_name: str) -> IntentConfig:
+        return self.intents_by_full_name.get(full_intent_name)
+
+    def get_leaf_intents(self, full_name_of_parent_intent: str = None) -> list[IntentConfig]:
+        """intents without children under the parent intent, all of them if parent intent is None"""
+        leaf_intents = self._leaf_intents_by_parent.get(full_name_of_parent_intent)
+        if leaf_intents is None:
+            leaf_intents = [
+                intent
+                for intent in self.intents
+                if not intent.has_children
+                and intent.name != "unknown"
+                and (
+                    full_name_of_parent_intent is None
+                    or intent.full_name_of_parent_intent == full_name_of_parent_intent
+                    or (intent.full_name_of_parent_intent or "").startswith(full_name_of_parent_intent + ".")
+                )
+            ]
+            self._leaf_intents_by_parent[full_name_of_parent_intent] = leaf_intents
+        return leaf_intents
+
+    def get_intent_list_payload(self, full_name_of_parent_intent: str = None, intent_names: set[str] = None) -> str:
+        """
+        json list of the intents directly under the parent intent, described together with their descendants
+
+        with intent_names only these intents are listed.
+        """
+        key = ("layer", full_name_of_parent_intent)
+        if key not in self._intent_list_items:
+            self._intent_list_items[key] = [
+                {
+                    "name": intent.name,
+                    "description": [intent.description]
+                    + [child.description for child in self.get_children_intents(intent)],
+                }
+                for intent in self.intents_by_parent.get(full_name_of_parent_intent, [])
+            ]
+        return self._dump_intent_list(key, intent_names)
+
+    def get_leaf_intent_list_payload(
+        self, full_name_of_parent_intent: str = None, intent_names: set[str] = None
+    ) -> str:
+        """
+        json list of the leaf intents under the parent intent by full name, described with their ancestors
+
+        with intent_names, full intent names, only these intents are listed.
+        """
+        key = ("leaf", full_name_of_parent_intent)
+        if key not in self._intent_list_items:
+            self._intent_list_items[key] = [
+                {
+                    "name": intent.get_full_intent_name(),
+                    "description": [intent.description]
+                    + [ancestor.description for ancestor in self.get_ancestor_intents(intent) if ancestor],
+                }
+                for intent in self.get_leaf_intents(full_name_of_parent_intent)
+            ]
+        return self._dump_intent_list(key, intent_names)
+
+    def _dump_intent_list(self, key: tuple[str, str], intent_names: Optional[set[str]]) -> str:
+        if intent_names is not None:
+            return json.dumps([item for item in self._intent_list_items[key] if item["name"] in intent_names])
+        if key not in self._intent_list_payloads:
+            self._intent_list_payloads[key] = json.dumps(self._intent_list_items[key])
+        return self._intent_list_payloads[key]
+
+    def get_ancestor_intents(self, intent: IntentConfig) -> list[IntentConfig]:
+        """ancestors of the intent, from the root to its parent"""
+        if not intent.full_name_of_parent_intent:
+            return []
+        names = intent.full_name_of_parent_intent.split(".")
+        return [self.get_intent_by_full_name(".".join(names[: index + 1])) for index in range(len(names))]
 
     def get_intent_and_attrs(self):
         return [
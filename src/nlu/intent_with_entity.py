@@ -66,6 +66,8 @@ class Slot(HashableBaseModel):
     optional: bool = True
     priority: int = 0
     hidden: bool = False
+    # regex or a name of nlu.rule.entity.NAMED_PATTERNS, lets the value be read without the llm
+    pattern: Optional[str] = None
 
     def __hash__(self):
         return hash((self.name,))
@@ -88,6 +90,7 @@ class Slot(HashableBaseModel):
             optional=parse_str_to_bool(slot_dict.get("optional", True), True),
             slot_type=SlotType(slot_dict["slotType"]),
             hidden=slot_dict.get("hidden", False),
+            pattern=slot_dict.get("pattern"),
         )
 
 
@@ -1,16 +1,24 @@
+import json
+import os
 from typing import List
 
 from gluon_meson_sdk.models.abstract_models.chat_message_preparation import ChatMessagePreparation
 from gluon_meson_sdk.models.chat_model import ChatModel
-from gluon_meson_sdk.models.scenario_model_registry.base import DefaultScenarioModelRegistryCenter
+from models.chat_model.registry import ScenarioModelRegistryCenter
 from loguru import logger
 
+from metrics.base import metrics_registry
 from nlu.base import EntityExtractor
 from nlu.forms import FormStore, Form
 from nlu.intent_with_entity import Entity, SlotType, Slot, Intent
+from nlu.rule.entity import RuleBasedEntityExtractor
+from policy.slot_filling.slot_checker import SlotChecker
 from prompt_manager.base import PromptManager
 from tracker.context import ConversationContext
 from utils.common import parse_str_to_bool
+from utils.token_counter import default_history_token_budget
+
+incremental_slot_extraction_feature_toggle = os.getenv("INCREMENTAL_SLOT_EXTRACTION_FEATURE_TOGGLE", "False") == "True"
 
 system_template = """
 ## Role & Task
@@ -34,16 +42,64 @@ class LLMEntityExtractor(EntityExtractor):
         chat_model: ChatModel,
         model_type: str,
         prompt_manager: PromptManager,
+        history_token_budget: int = default_history_token_budget,
+        incremental: bool = incremental_slot_extraction_feature_toggle,
+        rule_based_entity_extractor: RuleBasedEntityExtractor = None,
     ):
         self.form_store = form_store
+        self.incremental = incremental
+        self.rule_based_entity_extractor = rule_based_entity_extractor
+        self.history_token_budget = history_token_budget
         self.model = chat_model
         self.model_type = model_type
         self.prompt_manager = prompt_manager
         self.slot_extraction_prompt = prompt_manager.load("slot_extraction")
+        self.incremental_slot_extraction_prompt = prompt_manager.load("incremental_slot_extraction")
         self.examples = self.prepare_examples()
-        self.scenario_model_registry = DefaultScenarioModelRegistryCenter()
+        self.scenario_model_registry = ScenarioModelRegistryCenter()
         self.scenario_model = "llm_entity_extractor"
 
+    @staticmethod
+    def entities_from_values(form: Form, entities: dict) -> List[Entity]:
+        """entities of the form's slots from the slot values answered by the llm"""
+        bool_slots_entities = {
+            slot.name: parse_str_to_bool(entities.get(slot.name) if entities else False)
+            for slot in form.slots
+            if slot.slot_type == SlotType.BOOLEAN
+        }
+        logger.debug(f"bool entities: {bool_slots_entities}")
+
+        merged_entities = {**entities, **bool_slots_entities} if entities else bool_slots_entities
+
+        logger.debug(f"final entities: {merged_entities}")
+
+        slot_name_to_slot = {slot.name: slot for slot in form.slots}
+        entity_list = [tup for tup in merged_entities.items() if tup[0] in slot_name_to_slot] if merged_entities else []
+        if not entity_list:
+            return []
+
+        def get_slot(name, value):
+            if slot_name_to_slot:
+                if name in slot_name_to_slot:
+                    origin_slot = slot_name_to_slot[name]
+                    slot = origin_slot.copy(
+                        update={
+                            "value": value,
+                        }
+                    )
+                    slot.confidence = 1
+                    return slot
+            return None
+
+        def check_slot_value_valid(value) -> bool:
+            return value is not None and (isinstance(value, int) or len(str(value)) > 0)
+
+        slots: list[Slot] = [get_slot(name, value) for name, value in entity_list]
+        available_slots = [slot for slot in slots if check_slot_value_valid(slot.value)]
+
+        logger.debug(f"extracted slots: {available_slots}")
+        return [Entity(type=s.name, value=s.value, possible_slot=s) for s in available_slots]
+
     def construct_messages(
         self,
         intent: Intent,
@@ -55,7 +111,7 @@ class LLMEntityExtractor(EntityExtractor):
             self.slot_extraction_prompt.template,
             intent.name,
             form,
-            conversation_context.get_history().format_string_with_file_name(),
+            conversation_context.get_history().format_string_with_file_name(self.history_token_budget),
             conversation_context.get_file_name(),
             preparation,
         )
@@ -115,7 +171,23 @@ class LLMEntityExtractor(EntityExtractor):
         if not form.slots:
             conversation_context.current_intent_slots = []
             return []
-        conversation_context.current_intent_slots = form.slots
+        incremental = self.should_extract_incrementally(conversation_context, form)
+        conversation_context.current_intent_slots = list(form.slots)
+        rule_based_entities = (
+            self.rule_based_entity_extractor.extract(form, conversation_context.current_user_input)
+            if self.rule_based_entity_extractor
+            else []
+        )
+        trusted_entities = [entity for entity in rule_based_entities if RuleBasedEntityExtractor.is_trusted(entity)]
+        if incremental:
+            extracted_entities = conversation_context.get_extracted_entities()
+            if self.all_required_slots_filled(form, self.merge(extracted_entities, trusted_entities)):
+                return self.skip_llm(self.merge_rule_based(extracted_entities, rule_based_entities))
+            entities = await self.extract_unfilled_entities(intent, form, conversation_context, chat_model)
+            return self.merge_rule_based(entities, rule_based_entities)
+        if trusted_entities and self.all_required_slots_filled(form, trusted_entities):
+            return self.skip_llm(rule_based_entities)
+
         self.construct_messages(intent, form, conversation_context, chat_message_preparation)
         chat_message_preparation.log(logger)
         entities = (
@@ -123,40 +195,72 @@ class LLMEntityExtractor(EntityExtractor):
         ).get_json_response()
         logger.debug(f"extract entities: {entities}")
 
-        bool_slots_entities = {
-            slot.name: parse_str_to_bool(entities.get(slot.name) if entities else False)
-            for slot in form.slots
-            if slot.slot_type == SlotType.BOOLEAN
-        }
-        logger.debug(f"bool entities: {bool_slots_entities}")
+        return self.merge_rule_based(self.entities_from_values(form, entities), rule_based_entities)
 
-        merged_entities = {**entities, **bool_slots_entities} if entities else bool_slots_entities
+    @staticmethod
+    def merge(entities: List[Entity], overriding_entities: List[Entity]) -> List[Entity]:
+        merged = {entity.type: entity for entity in entities}
+        merged.update({entity.type: entity for entity in overriding_entities})
+        return list(merged.values())
 
-        logger.debug(f"final entities: {merged_entities}")
+    @classmethod
+    def merge_rule_based(cls, entities: List[Entity], rule_based_entities: List[Entity]) -> List[Entity]:
+        """values of declared patterns override, values inferred from the slot type only fill the missing slots"""
+        inferred = [entity for entity in rule_based_entities if RuleBasedEntityExtractor.is_inferred(entity)]
+        matched = [entity for entity in rule_based_entities if not RuleBasedEntityExtractor.is_inferred(entity)]
+        return cls.merge(cls.merge(inferred, entities), matched)
 
-        slot_name_to_slot = {slot.name: slot for slot in form.slots}
-        entity_list = [tup for tup in merged_entities.items() if tup[0] in slot_name_to_slot] if merged_entities else []
-        if not entity_list:
-            return []
+    @staticmethod
+    def all_required_slots_filled(form: Form, entities: List[Entity]) -> bool:
+        """a form without required slots only counts as filled when all of its slots are"""
+        slot_names = [entity.type for entity in entities]
+        if not SlotChecker(form, []).slot_is_missing():
+            return all(slot.name in slot_names for slot in form.slots)
+        return not SlotChecker(form, slot_names).slot_is_missing()
 
-        def get_slot(name, value):
-            if slot_name_to_slot:
-                if name in slot_name_to_slot:
-                    origin_slot = slot_name_to_slot[name]
-                    slot = origin_slot.copy(
-                        update={
-                            "value": value,
-                        }
-                    )
-                    slot.confidence = 1
-                    return slot
-            return None
+    @staticmethod
+    def skip_llm(entities: List[Entity]) -> List[Entity]:
+        metrics_registry.counter("llm_entity_extraction_skipped_total", "slots all filled without the llm").inc()
+        logger.info("all required slots are filled without the llm")
+        return entities
 
-        def check_slot_value_valid(value) -> bool:
-            return value is not None and (isinstance(value, int) or len(str(value)) > 0)
+    def should_extract_incrementally(self, conversation_context: ConversationContext, form: Form) -> bool:
+        """the user answers the slot question of the form asked last round, the slots filled before are kept"""
+        return (
+            self.incremental
+            and self.incremental_slot_extraction_prompt is not None
+            and not conversation_context.start_new_question
+            and conversation_context.state.split(":")[0] in ["slot_filling", "slot_confirm"]
+            and conversation_context.get_current_intent_slot_names() == [slot.name for slot in form.slots]
+        )
 
-        slots: list[Slot] = [get_slot(name, value) for name, value in entity_list]
-        available_slots = [slot for slot in slots if check_slot_value_valid(slot.value)]
+    async def extract_unfilled_entities(
+        self, intent: Intent, form: Form, conversation_context: ConversationContext, chat_model
+    ) -> List[Entity]:
+        """only send the latest user input and ask for the unfilled slots, the prompt does not grow with the history"""
+        filled_entities = conversation_context.get_extracted_entities()
+        unfilled_form = form.model_copy(update={"slots": conversation_context.get_unfilled_slots()})
+        if not unfilled_form.slots:
+            return filled_entities
 
-        logger.debug(f"extracted slots: {available_slots}")
-        return [Entity(type=s.name, value=s.value, possible_slot=s) for s in available_slots]
+        chat_message_preparation = ChatMessagePreparation()
+        chat_message_preparation.add_message(
+            "system",
+            self.incremental_slot_extraction_prompt.template,
+            user_intent=intent.name,
+            intent_description=form.intent_description,
+            filled_entities=json.dumps({entity.type: entity.value for entity in filled_entities}, ensure_ascii=False),
+            entity_list=unfilled_form.get_slot_name_list(),
+            entity_types_and_values=unfilled_form.get_available_slots_str(),
+            file_names=conversation_context.get_file_name(),
+            latest_user_input=conversation_context.current_user_input,
+        )
+        chat_message_preparation.log(logger)
+        entities = (
+            await chat_model.achat(
+                **chat_message_preparation.to_chat_params(), sub_scenario="incremental", max_length=512, jsonable=True
+            )
+        ).get_json_response()
+        logger.debug(f"extract unfilled entities: {entities}")
+
+        return filled_entities + self.entities_from_values(unfilled_form, entities)
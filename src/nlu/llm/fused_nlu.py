@@ -0,0 +1,168 @@
+import json
+import os
+from typing import Any, Optional
+
+from gluon_meson_sdk.models.abstract_models.chat_message_preparation import ChatMessagePreparation
+from loguru import logger
+from pydantic import BaseModel, ValidationError
+
+from metrics.base import metrics_registry
+from metrics.tracing import trace_span
+from models.chat_model.registry import ScenarioModelRegistryCenter
+from nlu.base import Nlu
+from nlu.forms import FormStore
+from nlu.intent_config import IntentConfig, IntentListConfig
+from nlu.intent_with_entity import Intent, IntentWithEntity
+from nlu.llm.entity import LLMEntityExtractor
+from prompt_manager.base import PromptManager
+from tracker.context import ConversationContext
+from utils.token_counter import default_history_token_budget
+
+fused_nlu_feature_toggle = os.getenv("FUSED_NLU_FEATURE_TOGGLE", "False") == "True"
+# answered when no leaf intent fits, the multi-step classifier finds no intent then as well
+UNKNOWN_INTENT = "unknown"
+# answers to the current intent's questions, handle_intent keeps the current intent and so its entities
+CURRENT_INTENT_ANSWERS = ["slot_filling", "negative", "positive"]
+
+
+class FusedNluResponse(BaseModel):
+    start_new_topic: bool = True
+    new_request: Optional[str] = None
+    intent: str
+    confidence: float = 1.0
+    entities: dict[str, Any] = {}
+
+
+class FusedNluValidationError(Exception):
+    pass
+
+
+class FusedNLU(Nlu):
+    """
+    Same topic check, intent classification and slot extraction of one turn in one llm call.
+
+    The answer is validated against the leaf intents and their slots, any invalid answer or failed call, and any
+    turn resolving confused intents, goes through the fallback nlu instead. Confirmations and answers on the same
+    topic keep the slots filled before.
+    """
+
+    def __init__(
+        self,
+        intent_list_config: IntentListConfig,
+        form_store: FormStore,
+        prompt_manager: PromptManager,
+        fallback: Nlu,
+        history_token_budget: int = default_history_token_budget,
+    ):
+        self.intent_list_config = intent_list_config
+        self.form_store = form_store
+        self.fallback = fallback
+        self.history_token_budget = history_token_budget
+        self.template = prompt_manager.load("fused_nlu")
+        self.scenario_model_registry = ScenarioModelRegistryCenter()
+        self.scenario_model = "fused_nlu"
+        self.intents = {intent.get_full_intent_name(): intent for intent in intent_list_config.get_leaf_intents()}
+        # the intents do not change for the lifetime of the config, neither does their description
+        self.intent_list = json.dumps([self._describe(intent) for intent in self.intents.values()])
+
+    def _describe(self, intent: IntentConfig) -> dict:
+        form = self.form_store.get_form(intent.name)
+        return {
+            "name": intent.get_full_intent_name(),
+            "description": intent.description,
+            "entities": [
+                {"name": slot.name, "description": slot.description, "type": slot.slot_type}
+                for slot in (form.slots if form else [])
+            ],
+        }
+
+    async def extract_intents_and_entities(self, conversation: ConversationContext) -> IntentWithEntity:
+        if conversation.is_confused_with_intents() or self.template is None:
+            return await self.fallback.extract_intents_and_entities(conversation)
+
+        conversation.set_status("analyzing user's intent")
+        try:
+            with trace_span("nlu.fused"):
+                answer = await self.call(conversation)
+            response = self.validate(answer, conversation)
+        except (ValidationError, FusedNluValidationError) as err:
+            logger.warning(f"session {conversation.session_id}, invalid fused nlu answer, fall back: {err}")
+            return await self.fall_back(conversation, "invalid_answer")
+        except Exception as err:
+            # model, network and json errors, the fallback nlu can still answer the turn
+            logger.error(f"session {conversation.session_id}, fused nlu call failed, fall back: {err}")
+            return await self.fall_back(conversation, "error")
+        return self.apply(response, conversation)
+
+    async def fall_back(self, conversation: ConversationContext, reason: str) -> IntentWithEntity:
+        metrics_registry.counter(
+            "fused_nlu_fallback_total", "turns the fused nlu left to the fallback", reason=reason
+        ).inc()
+        return await self.fallback.extract_intents_and_entities(conversation)
+
+    async def call(self, conversation: ConversationContext) -> Any:
+        chat_model = await self.scenario_model_registry.get_model(self.scenario_model, conversation.session_id)
+        previous_intent = conversation.current_intent
+        chat_message_preparation = ChatMessagePreparation()
+        chat_message_preparation.add_message(
+            "system",
+            self.template.template,
+            previous_intent=previous_intent.get_full_intent_name() if previous_intent else "none",
+            intent_list=self.intent_list,
+            file_names=conversation.get_file_name(),
+            chat_history=conversation.get_history().format_string_with_file_name(self.history_token_budget),
+        )
+        chat_message_preparation.log(logger)
+        return (
+            await chat_model.achat(**chat_message_preparation.to_chat_params(), max_length=1024, jsonable=True)
+        ).get_json_response()
+
+    def validate(self, answer: Any, conversation: ConversationContext) -> FusedNluResponse:
+        response = FusedNluResponse.model_validate(answer)
+        if response.intent != UNKNOWN_INTENT and response.intent not in self.intents:
+            raise FusedNluValidationError(f"intent {response.intent} is not a leaf intent")
+        previous_intent = conversation.current_intent
+        if (
+            self.is_following_up(conversation)
+            and not response.start_new_topic
+            and response.intent != previous_intent.get_full_intent_name()
+            and response.intent not in CURRENT_INTENT_ANSWERS
+        ):
+            raise FusedNluValidationError(f"intent {response.intent} changed without a new topic")
+        intent_config = self.intents.get(response.intent)
+        form = self.form_store.get_form(intent_config.name) if intent_config else None
+        slot_names = {slot.name for slot in form.slots} if form else set()
+        if unknown_slots := set(response.entities) - slot_names:
+            raise FusedNluValidationError(f"entities {unknown_slots} are not slots of intent {response.intent}")
+        return response
+
+    @staticmethod
+    def is_following_up(conversation: ConversationContext) -> bool:
+        # same condition as the same topic check of LLMIntentClassifier
+        return conversation.current_intent is not None and len(conversation.get_history().rounds) > 1
+
+    def apply(self, response: FusedNluResponse, conversation: ConversationContext) -> IntentWithEntity:
+        if len(conversation.get_history().rounds) > 1 and response.start_new_topic:
+            conversation.current_new_request = response.new_request
+        if response.intent == UNKNOWN_INTENT:
+            logger.info("No intent found")
+            return IntentWithEntity(intent=None, entities=[], action="")
+
+        intent_config = self.intents[response.intent]
+        intent = Intent.from_intent_config(intent_config.name, response.confidence, intent_config)
+        conversation.handle_intent(intent)
+        logger.info(f"Current intent: {conversation.current_intent}")
+
+        form = self.form_store.get_form_from_intent(conversation.current_intent)
+        conversation.current_intent_slots = list(form.slots) if form else []
+        entities = LLMEntityExtractor.entities_from_values(form, response.entities) if form else []
+        if intent_config.name in CURRENT_INTENT_ANSWERS or not response.start_new_topic:
+            # the answer only holds the values of this turn, keep the slots filled before
+            answered_entities = [entity for entity in entities if entity.type in response.entities]
+            entities = LLMEntityExtractor.merge(conversation.get_extracted_entities(), answered_entities)
+        conversation.flush_entities()
+        conversation.add_entity(entities)
+        logger.info(
+            f"Session {conversation.session_id}, entities: {[(entity.type, entity.value) for entity in entities]}"
+        )
+        return IntentWithEntity(intent=conversation.current_intent, entities=entities, action="")
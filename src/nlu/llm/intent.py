@@ -1,4 +1,5 @@
 import json
+import os
 from typing import Any, Optional
 
 from gluon_meson_sdk.dbs.milvus.milvus_for_langchain import MilvusForLangchain
@@ -7,11 +8,16 @@ from langchain.schema import Document
 from loguru import logger
 from pymilvus import FieldSchema, DataType
 
+from metrics.base import metrics_registry
+from metrics.tracing import trace_span
 from nlu.base import IntentClassifier
-from nlu.intent_config import IntentListConfig
+from nlu.intent_config import IntentConfig, IntentListConfig
 from nlu.intent_with_entity import Intent
+from nlu.llm.intent_cache import IntentClassificationCache
 from nlu.llm.intent_call import IntentCall
+from nlu.llm.intent_example_index import IntentExampleIndex, local_intent_example_index_feature_toggle
 from nlu.llm.intent_choosing_confirmer import IntentChoosingConfirmer
+from nlu.llm.intent_shortlist import IntentShortlist, intent_shortlist_feature_toggle
 from nlu.llm.same_topic_checker import SameTopicChecker
 from prompt_manager.base import PromptManager
 from third_system.search_entity import SearchResponse, SearchParam, SearchParamFilter
@@ -41,6 +47,8 @@ system_template_without_example = """
 """
 
 topic = "hsbc_topic_for_intent"
+# layered: one example search and intent call per layer of the intent tree, flat: one call choosing among leaf intents
+intent_classification_mode = os.getenv("INTENT_CLASSIFICATION_MODE", "layered")
 
 
 async def get_intent_examples(user_input: str, parent_intent_name: str = None) -> list[dict[str, Any]]:
@@ -79,7 +87,11 @@ class LLMIntentClassifier(IntentClassifier):
         intent_list_config: IntentListConfig,
         model_type: str,
         prompt_manager: PromptManager,
+        classification_mode: str = intent_classification_mode,
     ):
+        if classification_mode not in ("layered", "flat"):
+            raise ValueError(f"unknown intent classification mode: {classification_mode}")
+        self.classification_mode = classification_mode
         self.embedding = embedding_model
         self.milvus_for_langchain = milvus_for_langchain
         self.retrieval_counts = 4
@@ -96,6 +108,9 @@ class LLMIntentClassifier(IntentClassifier):
             prompt_manager.load(name="intent_choosing_confirm").template
         )
         self.same_topic_checker = SameTopicChecker()
+        self.intent_classification_cache = IntentClassificationCache()
+        self.intent_example_index = IntentExampleIndex() if local_intent_example_index_feature_toggle else None
+        self.intent_shortlist = IntentShortlist() if intent_shortlist_feature_toggle else None
 
     def train(self):
         # recreate topic
@@ -119,6 +134,50 @@ class LLMIntentClassifier(IntentClassifier):
                 docs.append(doc)
         self.milvus_for_langchain.add_documents(topic, docs, embedding_type=self.embedding_type)
 
+    async def get_intent_examples(self, user_input: str, parent_intent_name: str = None) -> list[dict[str, Any]]:
+        if self.intent_example_index is None:
+            return await get_intent_examples(user_input, parent_intent_name)
+        if not self.intent_example_index.is_fresh(self.intent_list_config):
+            metrics_registry.counter("intent_example_index_fallback_total", "searches sent to unified search").inc()
+            self.intent_example_index.refresh_in_background(self.intent_list_config)
+            return await get_intent_examples(user_input, parent_intent_name)
+        try:
+            response = await self.intent_example_index.search(user_input, parent_intent_name, size=3)
+        except Exception as err:
+            logger.error(f"Error searching local intent example index: {err}")
+            return await get_intent_examples(user_input, parent_intent_name)
+        return extract_examples_from_response_text(response)
+
+    async def shortlist_intent_names(
+        self,
+        conversation: ConversationContext,
+        user_input: str,
+        candidates: list[IntentConfig],
+        full_intent_names_of_examples: list[str],
+        leaf: bool = False,
+    ) -> Optional[set[str]]:
+        """names of the candidates to offer in the prompt, full names for leaf intents, None to offer all"""
+        if self.intent_shortlist is None:
+            return None
+        previous_intent = conversation.current_intent
+        # the examples are in the prompt as well, their intents must stay selectable
+        keep = [previous_intent.get_full_intent_name() if previous_intent else None] + full_intent_names_of_examples
+        try:
+            shortlisted = await self.intent_shortlist.shortlist(user_input, candidates, self.intent_list_config, keep)
+        except Exception as err:
+            logger.error(f"Error shortlisting intents: {err}")
+            return None
+        if shortlisted is None:
+            return None
+        logger.info(f"session {conversation.session_id}, shortlisted {len(shortlisted)} of {len(candidates)} intents")
+        return {intent.get_full_intent_name() if leaf else intent.name for intent in shortlisted}
+
+    def previous_intent_name_for_cache(self, conversation: ConversationContext) -> Optional[str]:
+        """the shortlist always offers the previous intent, so a decision only holds for the same previous intent"""
+        if self.intent_shortlist is None or conversation.current_intent is None:
+            return None
+        return conversation.current_intent.get_full_intent_name()
+
     @classmethod
     def get_mapped_intent_of_current_layer(cls, intent_example, parent_intent_of_current_layer) -> str:
         name_of_intent_example = json.loads(intent_example["intent"])["intent"]
@@ -155,7 +214,9 @@ class LLMIntentClassifier(IntentClassifier):
     async def check_is_providing_more_info(self, conversation: ConversationContext) -> bool:
         if not conversation.start_new_question:
             result = await self.same_topic_checker.check_is_providing_more_info(
-                conversation.get_history().format_messages(), conversation.session_id, conversation.get_unfilled_slots()
+                conversation.get_history().format_messages(self.same_topic_checker.history_token_budget),
+                conversation.session_id,
+                conversation.get_unfilled_slots(),
             )
             return result[0]
         return False
@@ -172,14 +233,15 @@ class LLMIntentClassifier(IntentClassifier):
                 return await self.classify_intent_until_leaf_or_confused(conversation, current_intent)
 
         # same topic check
-        chat_history = conversation.get_history().format_messages()
+        chat_history = conversation.get_history().format_messages(self.same_topic_checker.history_token_budget)
         previous_intent = conversation.current_intent
 
         new_request = None
-        if len(chat_history) > 1:
-            start_new_topic, new_request = await self.same_topic_checker.check_same_topic(
-                chat_history, conversation.session_id
-            )
+        if len(conversation.get_history().rounds) > 1:
+            with trace_span("nlu.same_topic_check"):
+                start_new_topic, new_request = await self.same_topic_checker.check_same_topic(
+                    chat_history, conversation.session_id
+                )
             if previous_intent and not start_new_topic:
                 return previous_intent
             else:
@@ -190,6 +252,8 @@ class LLMIntentClassifier(IntentClassifier):
     async def classify_intent_until_leaf_or_confused(
         self, conversation: ConversationContext, start_intent: Optional[Intent], new_request: str = None
     ) -> Optional[Intent]:
+        if self.classification_mode == "flat":
+            return await self.classify_leaf_intent_or_confused(conversation, start_intent, new_request)
         current_intent = start_intent
         while current_intent is None or self.intent_list_config.get_intent(current_intent.name).has_children:
             current_intent, unique_intent_from_examples = await self.classify_single_layer_intent(
@@ -207,6 +271,91 @@ class LLMIntentClassifier(IntentClassifier):
                 break
         return current_intent
 
+    async def classify_leaf_intent_or_confused(
+        self, conversation: ConversationContext, start_intent: Optional[Intent], new_request: str = None
+    ) -> Optional[Intent]:
+        if start_intent and not self.intent_list_config.get_intent(start_intent.name).has_children:
+            return start_intent
+        user_input = new_request or conversation.current_user_input
+        parent_intent_name = start_intent.get_full_intent_name() if start_intent else None
+
+        previous_intent_name = self.previous_intent_name_for_cache(conversation)
+        cached_leaf = self.intent_classification_cache.get(
+            user_input, parent_intent_name, self.intent_list_config, "leaf", previous_intent_name
+        )
+        if cached_leaf is not None:
+            logger.info(f"session {conversation.session_id}, intent from cache: {cached_leaf[0]}")
+            intent, unique_intent_from_examples = cached_leaf
+        else:
+            intent, unique_intent_from_examples = await self.classify_leaf_intent(
+                conversation, user_input, parent_intent_name
+            )
+            self.intent_classification_cache.set(
+                user_input,
+                parent_intent_name,
+                self.intent_list_config,
+                intent,
+                unique_intent_from_examples,
+                "leaf",
+                previous_intent_name,
+            )
+
+        # intent confuse check
+        if intent and unique_intent_from_examples and intent.name != unique_intent_from_examples.name:
+            conversation.set_confused_intents([intent, unique_intent_from_examples])
+        return intent
+
+    async def classify_leaf_intent(
+        self, conversation: ConversationContext, user_input: str, parent_intent_name: Optional[str]
+    ) -> tuple[Optional[Intent], Optional[Intent]]:
+        with trace_span("nlu.intent_examples", layer="leaf"):
+            intent_examples = await self.get_intent_examples(user_input, parent_intent_name)
+        leaf_intents = {
+            intent.name: intent for intent in self.intent_list_config.get_leaf_intents(parent_intent_name)
+        }
+        # present the examples with the full name of their intent, same as the leaf intents in the prompt
+        leaf_intent_examples = []
+        for intent_example in intent_examples:
+            intent_result = json.loads(intent_example["intent"])
+            if intent_result["intent"] not in leaf_intents:
+                continue
+            intent_result["intent"] = leaf_intents[intent_result["intent"]].get_full_intent_name()
+            leaf_intent_examples.append({**intent_example, "intent": json.dumps(intent_result)})
+        intent_examples = leaf_intent_examples
+        logger.info(f"intent_examples{intent_examples}")
+
+        unique_intent_from_examples = None
+        unique_full_intent_name = self.get_same_intent(intent_examples)
+        if unique_full_intent_name:
+            intent_config = self.intent_list_config.get_intent_by_full_name(unique_full_intent_name)
+            unique_intent_from_examples = Intent.from_intent_config(intent_config.name, 1.0, intent_config)
+
+        intent_names = await self.shortlist_intent_names(
+            conversation,
+            user_input,
+            list(leaf_intents.values()),
+            [json.loads(intent_example["intent"])["intent"] for intent_example in intent_examples],
+            leaf=True,
+        )
+        with trace_span("nlu.intent_call", layer="leaf"):
+            intent = await self.intent_call.classify_leaf_intent(
+                user_input, intent_examples, conversation.session_id, parent_intent_name, intent_names
+            )
+
+        # the model may answer the short name of the leaf intent instead of its full name
+        intent_config = self.intent_list_config.get_intent_by_full_name(intent.intent) or leaf_intents.get(
+            intent.intent
+        )
+        if intent_config and intent_config.name in leaf_intents:
+            logger.info(f"session {conversation.session_id}, intent: {intent_config.get_full_intent_name()}")
+            return (
+                Intent.from_intent_config(intent_config.name, intent.confidence, intent_config),
+                unique_intent_from_examples,
+            )
+
+        logger.info(f"intent: {intent.intent} is not a leaf intent")
+        return None, unique_intent_from_examples
+
     async def classify_single_layer_intent(
         self, conversation: ConversationContext, parent_intent: Intent = None, new_request: str = None
     ) -> tuple[Optional[Intent], Optional[Intent]]:
@@ -215,7 +364,35 @@ class LLMIntentClassifier(IntentClassifier):
         else:
             user_input = conversation.current_user_input
         parent_intent_name_of_current_layer: str = parent_intent.get_full_intent_name() if parent_intent else None
-        intent_examples = await get_intent_examples(user_input, parent_intent_name_of_current_layer)
+
+        previous_intent_name = self.previous_intent_name_for_cache(conversation)
+        cached_layer = self.intent_classification_cache.get(
+            user_input, parent_intent_name_of_current_layer, self.intent_list_config, "layer", previous_intent_name
+        )
+        if cached_layer is not None:
+            logger.info(f"session {conversation.session_id}, intent from cache: {cached_layer[0]}")
+            return cached_layer
+
+        intent, unique_intent_from_examples = await self.classify_single_layer_intent_without_cache(
+            conversation, user_input, parent_intent_name_of_current_layer
+        )
+        self.intent_classification_cache.set(
+            user_input,
+            parent_intent_name_of_current_layer,
+            self.intent_list_config,
+            intent,
+            unique_intent_from_examples,
+            "layer",
+            previous_intent_name,
+        )
+        return intent, unique_intent_from_examples
+
+    async def classify_single_layer_intent_without_cache(
+        self, conversation: ConversationContext, user_input: str, parent_intent_name_of_current_layer: Optional[str]
+    ) -> tuple[Optional[Intent], Optional[Intent]]:
+        layer = parent_intent_name_of_current_layer or "root"
+        with trace_span("nlu.intent_examples", layer=layer):
+            intent_examples = await self.get_intent_examples(user_input, parent_intent_name_of_current_layer)
         logger.info(f'intent_examples{intent_examples}')
         for intent_example in intent_examples:
             intent_result = json.loads(intent_example["intent"])
@@ -230,9 +407,20 @@ class LLMIntentClassifier(IntentClassifier):
                 unique_intent_name_in_examples.name, 1.0, unique_intent_name_in_examples
             )
 
-        intent = await self.intent_call.classify_intent(
-            user_input, intent_examples, conversation.session_id, parent_intent_name_of_current_layer
+        full_intent_names_of_examples = [
+            ".".join(filter(None, [parent_intent_name_of_current_layer, json.loads(example["intent"])["intent"]]))
+            for example in intent_examples
+        ]
+        intent_names = await self.shortlist_intent_names(
+            conversation,
+            user_input,
+            self.intent_list_config.intents_by_parent.get(parent_intent_name_of_current_layer, []),
+            full_intent_names_of_examples,
         )
+        with trace_span("nlu.intent_call", layer=layer):
+            intent = await self.intent_call.classify_intent(
+                user_input, intent_examples, conversation.session_id, parent_intent_name_of_current_layer, intent_names
+            )
 
         if intent.intent in self.intent_list_config.get_intent_name_list_by_their_parent_intent(
             parent_intent_name_of_current_layer
@@ -0,0 +1,101 @@
+import os
+import unicodedata
+from typing import Optional
+
+from caches.lru import LRUTTLCache
+from nlu.intent_config import IntentListConfig
+from nlu.intent_with_entity import Intent
+
+intent_classification_cache_size = int(os.getenv("INTENT_CLASSIFICATION_CACHE_SIZE", 10000))
+intent_classification_cache_ttl = int(os.getenv("INTENT_CLASSIFICATION_CACHE_TTL_SECONDS", 3600))
+intent_classification_cache_path = os.getenv("INTENT_CLASSIFICATION_CACHE_PATH")
+
+
+def normalize_user_input(user_input: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", user_input).lower().split())
+
+
+class IntentClassificationCache:
+    """
+    Remember the decision of one classification layer, so repeated questions skip the example search and the llm call.
+
+    The key contains the hash of the loaded scenes, entries of an old config are never hit after the config changes.
+    With the intent shortlist the prompt depends on the previous intent as well, which is then part of the key. Turns
+    without an intent are not remembered, a one-off miss should not repeat. A maxsize of 0 disables the cache.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = intent_classification_cache_size,
+        ttl: int = intent_classification_cache_ttl,
+        persist_path: Optional[str] = intent_classification_cache_path,
+    ):
+        self.cache = LRUTTLCache("intent_classification", maxsize, ttl, persist_path) if maxsize > 0 else None
+
+    @staticmethod
+    def key(
+        user_input: str,
+        parent_intent_name: Optional[str],
+        intent_list_config: IntentListConfig,
+        mode: str,
+        previous_intent_name: Optional[str],
+    ) -> tuple:
+        return (
+            normalize_user_input(user_input),
+            parent_intent_name or "",
+            intent_list_config.config_hash,
+            mode,
+            previous_intent_name or "",
+        )
+
+    def get(
+        self,
+        user_input: str,
+        parent_intent_name: Optional[str],
+        intent_list_config: IntentListConfig,
+        mode: str = "layer",
+        previous_intent_name: Optional[str] = None,
+    ) -> Optional[tuple[Optional[Intent], Optional[Intent]]]:
+        """mode tells apart decisions of one layer and decisions among all leaf intents under the parent intent"""
+        if self.cache is None:
+            return None
+        layer = self.cache.get(self.key(user_input, parent_intent_name, intent_list_config, mode, previous_intent_name))
+        if layer is None:
+            return None
+
+        # leaf names are not unique across parents, decisions are stored by full intent name
+        names = [layer["intent"], layer["unique_intent"]]
+        intent_configs = [intent_list_config.get_intent_by_full_name(name) if name else None for name in names]
+        if any(name and intent_config is None for name, intent_config in zip(names, intent_configs)):
+            # stored by short name before
+            return None
+
+        def to_intent(intent_config, confidence: float) -> Optional[Intent]:
+            if intent_config is None:
+                return None
+            return Intent.from_intent_config(intent_config.name, confidence, intent_config)
+
+        return to_intent(intent_configs[0], layer["confidence"]), to_intent(intent_configs[1], 1.0)
+
+    def set(
+        self,
+        user_input: str,
+        parent_intent_name: Optional[str],
+        intent_list_config: IntentListConfig,
+        intent: Optional[Intent],
+        unique_intent_from_examples: Optional[Intent],
+        mode: str = "layer",
+        previous_intent_name: Optional[str] = None,
+    ):
+        if self.cache is None or intent is None:
+            return
+        self.cache.set(
+            self.key(user_input, parent_intent_name, intent_list_config, mode, previous_intent_name),
+            {
+                "intent": intent.get_full_intent_name(),
+                "confidence": intent.confidence,
+                "unique_intent": (
+                    unique_intent_from_examples.get_full_intent_name() if unique_intent_from_examples else None
+                ),
+            },
+        )
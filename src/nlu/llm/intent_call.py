@@ -1,4 +1,3 @@
-import json
 from json import JSONDecodeError
 
 from gluon_meson_sdk.models.abstract_models.chat_message_preparation import ChatMessagePreparation
@@ -6,7 +5,7 @@ from loguru import logger
 from pydantic import BaseModel
 
 from nlu.intent_config import IntentListConfig
-from gluon_meson_sdk.models.scenario_model_registry.base import DefaultScenarioModelRegistryCenter
+from models.chat_model.registry import ScenarioModelRegistryCenter
 
 from prompt_manager.base import PromptWrapper
 
@@ -24,31 +23,49 @@ class IntentCall:
     ):
         self.intent_list_config = intent_list_config
         self.template = template
-        self.scenario_model_registry = DefaultScenarioModelRegistryCenter()
+        self.scenario_model_registry = ScenarioModelRegistryCenter()
         self.scenario_model = "intent_call"
 
     def construct_system_prompt(
-        self, chat_message_preparation: ChatMessagePreparation, full_name_of_parent_intent: str = None
+        self,
+        chat_message_preparation: ChatMessagePreparation,
+        full_name_of_parent_intent: str = None,
+        intent_names: set[str] = None,
     ):
-        intent_list = []
-        for intent in self.intent_list_config.intents:
-            if intent.full_name_of_parent_intent == full_name_of_parent_intent:
-                descriptions = [intent.description]
-                children_intents = self.intent_list_config.get_children_intents(intent)
-                descriptions.extend([intent.description for intent in children_intents])
-                intent_list.append({"name": intent.name, "description": descriptions})
+        intent_list = self.intent_list_config.get_intent_list_payload(full_name_of_parent_intent, intent_names)
+        chat_message_preparation.add_message("system", self.template.template, intent_list=intent_list)
 
-        chat_message_preparation.add_message("system", self.template.template, intent_list=json.dumps(intent_list))
+    def construct_leaf_system_prompt(
+        self,
+        chat_message_preparation: ChatMessagePreparation,
+        full_name_of_parent_intent: str = None,
+        intent_names: set[str] = None,
+    ):
+        intent_list = self.intent_list_config.get_leaf_intent_list_payload(full_name_of_parent_intent, intent_names)
+        chat_message_preparation.add_message("system", self.template.template, intent_list=intent_list)
 
     async def classify_intent(
-        self, query: str, examples, session_id, full_name_of_parent_intent: str = None
+        self, query: str, examples, session_id, full_name_of_parent_intent: str = None, intent_names: set[str] = None
     ) -> IntentClassificationResponse:
-        # TODO: drop history if it is too long
-        chat_model = await self.scenario_model_registry.get_model(self.scenario_model, session_id)
+        """intent_names limit the intents offered to the model, all intents under the parent intent if None"""
+        chat_message_preparation = ChatMessagePreparation()
+        self.construct_system_prompt(chat_message_preparation, full_name_of_parent_intent, intent_names)
+        return await self.call(chat_message_preparation, query, examples, session_id, full_name_of_parent_intent)
 
+    async def classify_leaf_intent(
+        self, query: str, examples, session_id, full_name_of_parent_intent: str = None, intent_names: set[str] = None
+    ) -> IntentClassificationResponse:
+        """choose among all leaf intents under the parent intent at once, the intent is returned with its full name"""
         chat_message_preparation = ChatMessagePreparation()
+        self.construct_leaf_system_prompt(chat_message_preparation, full_name_of_parent_intent, intent_names)
+        return await self.call(chat_message_preparation, query, examples, session_id, "leaf")
+
+    async def call(
+        self, chat_message_preparation: ChatMessagePreparation, query: str, examples, session_id, sub_scenario: str
+    ) -> IntentClassificationResponse:
+        # TODO: drop history if it is too long
+        chat_model = await self.scenario_model_registry.get_model(self.scenario_model, session_id)
 
-        self.construct_system_prompt(chat_message_preparation, full_name_of_parent_intent)
         logger.debug(examples)
 
         for example in examples:
@@ -63,7 +80,7 @@ class IntentCall:
                 **chat_message_preparation.to_chat_params(),
                 max_length=64,
                 jsonable=True,
-                sub_scenario=full_name_of_parent_intent,
+                sub_scenario=sub_scenario,
             )
         ).get_json_response()
         logger.debug(intent)
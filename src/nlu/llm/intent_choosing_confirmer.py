@@ -1,22 +1,23 @@
 from typing import Optional
 
 from gluon_meson_sdk.models.abstract_models.chat_message_preparation import ChatMessagePreparation
-from gluon_meson_sdk.models.scenario_model_registry.base import (
-    DefaultScenarioModelRegistryCenter,
-    BaseScenarioModelRegistryCenter,
-)
+from gluon_meson_sdk.models.scenario_model_registry.base import BaseScenarioModelRegistryCenter
 from loguru import logger
 
+from models.chat_model.registry import ScenarioModelRegistryCenter
 from tracker.context import ConversationContext
+from utils.token_counter import default_history_token_budget
 
 
 class IntentChoosingConfirmer:
     def __init__(
         self,
         intent_choosing_template: str,
-        model_registry: BaseScenarioModelRegistryCenter = DefaultScenarioModelRegistryCenter(),
+        model_registry: BaseScenarioModelRegistryCenter = ScenarioModelRegistryCenter(),
+        history_token_budget: int = default_history_token_budget,
     ):
         self.scenario_model_registry = model_registry
+        self.history_token_budget = history_token_budget
         self.scenario_model = "intent_choosing_confirm"
         self.intent_choosing_template = intent_choosing_template
 
@@ -28,7 +29,7 @@ class IntentChoosingConfirmer:
         chat_message_preparation.add_message(
             "system",
             self.intent_choosing_template,
-            history=conversation.get_history().format_string(),
+            history=conversation.get_history().format_string(token_budget=self.history_token_budget),
             intent_list=[intent.minimal_info() for intent in conversation.confused_intents],
         )
         chat_message_preparation.log(logger)
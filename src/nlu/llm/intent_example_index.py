@@ -0,0 +1,155 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+from metrics.base import metrics_registry
+from models.embedding_model.client import EmbeddingClient
+from nlu.intent_config import IntentListConfig
+from third_system.search_entity import SearchItem, SearchItemReference, SearchResponse
+from utils.common import batches, intent_example_sync_batch_size
+
+local_intent_example_index_feature_toggle = os.getenv("LOCAL_INTENT_EXAMPLE_INDEX_FEATURE_TOGGLE", "False") == "True"
+intent_example_index_path = os.getenv("INTENT_EXAMPLE_INDEX_PATH")
+
+
+def collect_intent_examples(intent_list_config: IntentListConfig) -> list[dict[str, str]]:
+    """same examples as nlu.llm.intent_examples uploads to the unified search service"""
+    return [
+        {"intent": intent.name, "example": example, "full_intent_name": intent.get_full_intent_name()}
+        for intent in intent_list_config.get_intent_list()
+        for example in (intent.examples or []) + (intent.display_examples or [])
+    ]
+
+
+def fingerprint_examples(examples: list[dict[str, str]], model: str) -> str:
+    content = json.dumps([model, examples], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+class IntentExampleIndex:
+    """
+    Embedding matrix of all intent examples, answering the top k cosine query of one hierarchy layer locally.
+
+    The rows are sorted by full intent name, so the examples under a parent intent are one contiguous slice.
+    The index is stale until it is built from the current IntentListConfig, callers should use the unified
+    search service meanwhile. With snapshot_path the matrix is saved after building and memory mapped on the next
+    start if the examples did not change.
+    """
+
+    def __init__(
+        self, embedding_client: EmbeddingClient = None, snapshot_path: Optional[str] = intent_example_index_path
+    ):
+        self.embedding_client = embedding_client or EmbeddingClient()
+        self.snapshot_path = snapshot_path
+        # hash of the IntentListConfig the index was built from
+        self.config_hash: Optional[str] = None
+        self.examples: list[dict[str, str]] = []
+        self.matrix: np.ndarray = np.zeros((0, 0), dtype=np.float32)
+        self.full_intent_names: list[str] = []
+        self.building_task: Optional[asyncio.Task] = None
+
+    def is_fresh(self, intent_list_config: IntentListConfig) -> bool:
+        return self.config_hash is not None and self.config_hash == intent_list_config.config_hash
+
+    def refresh_in_background(self, intent_list_config: IntentListConfig):
+        if self.building_task is None or self.building_task.done():
+            self.building_task = asyncio.create_task(self._build_safely(intent_list_config))
+
+    async def _build_safely(self, intent_list_config: IntentListConfig):
+        try:
+            await self.build(intent_list_config)
+        except Exception as err:
+            logger.error(f"Error building intent example index: {err}")
+
+    async def build(self, intent_list_config: IntentListConfig):
+        examples = sorted(collect_intent_examples(intent_list_config), key=lambda example: example["full_intent_name"])
+        fingerprint = fingerprint_examples(examples, self.embedding_client.model)
+        matrix = self._load_snapshot(fingerprint)
+        if matrix is None:
+            matrix = await self._embed_reusing_rows(examples)
+            self._save_snapshot(fingerprint, matrix)
+        self._install(examples, matrix, intent_list_config.config_hash)
+
+    async def _embed_reusing_rows(self, examples: list[dict[str, str]]) -> np.ndarray:
+        """embed only the texts the installed index does not have, in batches"""
+        known_rows = {example["example"]: row for row, example in enumerate(self.examples)}
+        missing = list(dict.fromkeys(example["example"] for example in examples))
+        missing = [text for text in missing if text not in known_rows]
+        logger.info(f"embedding {len(missing)} of {len(examples)} intent examples")
+        embedded = [
+            await self.embedding_client.embed(texts) for texts in batches(missing, intent_example_sync_batch_size)
+        ]
+        new_rows = {text: row for row, text in enumerate(missing)}
+        new_matrix = np.vstack(embedded) if embedded else None
+        rows = [
+            self.matrix[known_rows[example["example"]]]
+            if example["example"] in known_rows
+            else new_matrix[new_rows[example["example"]]]
+            for example in examples
+        ]
+        return np.vstack(rows).astype(np.float32) if rows else np.zeros((0, 0), dtype=np.float32)
+
+    def _install(self, examples: list[dict[str, str]], matrix: np.ndarray, config_hash: str):
+        # replace all attributes without awaiting in between, searches never see a half built index
+        self.examples = examples
+        self.full_intent_names = [example["full_intent_name"] for example in examples]
+        self.matrix = matrix
+        self.config_hash = config_hash
+        metrics_registry.gauge("intent_example_index_size", "examples in the local intent example index").set(
+            len(examples)
+        )
+
+    def _load_snapshot(self, fingerprint: str) -> Optional[np.ndarray]:
+        if not self.snapshot_path or not os.path.exists(f"{self.snapshot_path}.json"):
+            return None
+        with open(f"{self.snapshot_path}.json", encoding="utf-8") as file:
+            if json.load(file).get("fingerprint") != fingerprint:
+                return None
+        logger.info(f"load intent example index from {self.snapshot_path}")
+        return np.load(f"{self.snapshot_path}.npy", mmap_mode="r")
+
+    def _save_snapshot(self, fingerprint: str, matrix: np.ndarray):
+        if not self.snapshot_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.snapshot_path)), exist_ok=True)
+        np.save(f"{self.snapshot_path}.npy", matrix)
+        with open(f"{self.snapshot_path}.json", "w", encoding="utf-8") as file:
+            json.dump({"fingerprint": fingerprint}, file)
+
+    def _rows_under(self, parent_intent_name: Optional[str]) -> slice:
+        if not parent_intent_name:
+            return slice(0, len(self.examples))
+        # same examples as the "meta__full_parent_intent like parent%" filter of the unified search service
+        start = bisect.bisect_left(self.full_intent_names, parent_intent_name)
+        end = bisect.bisect_left(self.full_intent_names, parent_intent_name + "\uffff")
+        return slice(start, end)
+
+    def search_by_embedding(self, query: np.ndarray, parent_intent_name: Optional[str], size: int) -> SearchResponse:
+        rows = self._rows_under(parent_intent_name)
+        if rows.stop <= rows.start:
+            return SearchResponse()
+        scores = self.matrix[rows] @ query
+        top_k = min(size, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        items = [self._to_search_item(rows.start + int(index), float(scores[index])) for index in best]
+        return SearchResponse(page=1, pages=1, size=len(items), total=len(items), items=items)
+
+    def _to_search_item(self, row: int, score: float) -> SearchItem:
+        example = self.examples[row]
+        reference = SearchItemReference(
+            meta__source_type="intent_example",
+            meta__source_name=example["full_intent_name"],
+            meta__intent_result=json.dumps({"intent": example["intent"]}),
+        )
+        return SearchItem(meta__score=score, meta__reference=reference, text=example["example"])
+
+    async def search(self, user_input: str, parent_intent_name: Optional[str] = None, size: int = 3) -> SearchResponse:
+        query = (await self.embedding_client.embed([user_input]))[0]
+        return self.search_by_embedding(query, parent_intent_name, size)
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+from collections import defaultdict
+from typing import Optional
+
+from loguru import logger
+
+from third_system.unified_search import UnifiedSearch
+from utils.common import batches, generate_tmp_dir, intent_example_sync_batch_size
+
+# written by every sync, so not inside the package
+intent_example_sync_manifest_dir = os.getenv("INTENT_EXAMPLE_SYNC_MANIFEST_DIR", generate_tmp_dir("intent_examples"))
+
+
+def default_manifest_path(table: str) -> str:
+    return os.path.join(intent_example_sync_manifest_dir, f"{table}_examples_manifest.json")
+
+
+def example_id(example: dict) -> str:
+    """content hash of the example, an edited example is a removed one plus an added one, only kept in the manifest"""
+    content = json.dumps([example["full_parent_intent"], example["intent"], example["example"]], ensure_ascii=False)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+class IntentExampleDiff:
+    """examples to upload and to delete so that the synced examples become the current ones, keyed by example id"""
+
+    def __init__(self, added: dict[str, dict], removed: dict[str, dict]):
+        self.added = added
+        self.removed = removed
+
+    @classmethod
+    def between(cls, synced: dict[str, dict], current: list[dict]) -> "IntentExampleDiff":
+        current_by_id = {example_id(example): example for example in current}
+        return cls(
+            added={id_: example for id_, example in current_by_id.items() if id_ not in synced},
+            removed={id_: example for id_, example in synced.items() if id_ not in current_by_id},
+        )
+
+    def is_empty(self) -> bool:
+        return not self.added and not self.removed
+
+    def changes_by_intent(self) -> dict[str, dict[str, int]]:
+        changes = defaultdict(lambda: {"added": 0, "removed": 0})
+        for example in self.added.values():
+            changes[example["full_parent_intent"]]["added"] += 1
+        for example in self.removed.values():
+            changes[example["full_parent_intent"]]["removed"] += 1
+        return dict(sorted(changes.items()))
+
+    def report(self) -> str:
+        if self.is_empty():
+            return "intent examples are up to date"
+        lines = [f"{len(self.added)} intent examples to add, {len(self.removed)} to remove"]
+        for intent, change in self.changes_by_intent().items():
+            state = "changed" if change["added"] and change["removed"] else ("added" if change["added"] else "removed")
+            lines.append(f"  {intent}: {state}, +{change['added']} -{change['removed']}")
+        return "\n".join(lines)
+
+
+class IntentExampleSynchronizer:
+    """
+    Keep the intent examples of a unified search table in sync with the scenes, only uploading what changed.
+
+    The synced examples are recorded by id in a manifest file. The service can only append examples or recreate the
+    table, so without a manifest, or when examples were removed, the table is recreated with all current examples.
+    Otherwise only the added examples are appended in batches, so the service only embeds those. The manifest is
+    saved after every batch, a failed sync resumes where it stopped.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        manifest_path: str = None,
+        unified_search: UnifiedSearch = None,
+        batch_size: int = intent_example_sync_batch_size,
+    ):
+        self.table = table
+        self.manifest_path = manifest_path or default_manifest_path(table)
+        self.unified_search = unified_search or UnifiedSearch()
+        self.batch_size = batch_size
+
+    def load_manifest(self) -> Optional[dict[str, dict]]:
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path, encoding="utf-8") as file:
+            return json.load(file)
+
+    def save_manifest(self, synced: dict[str, dict]):
+        os.makedirs(os.path.dirname(os.path.abspath(self.manifest_path)), exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(synced, file, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    async def sync(self, intent_examples: list[dict], dry_run: bool = False, full: bool = False) -> IntentExampleDiff:
+        """upload the changes of intent_examples, full recreates the table with all of them"""
+        synced = None if full else self.load_manifest()
+        diff = IntentExampleDiff.between(synced or {}, intent_examples)
+        logger.info(diff.report())
+        if dry_run:
+            return diff
+
+        if synced is None or diff.removed:
+            await self._recreate({example_id(example): example for example in intent_examples})
+        else:
+            await self._append(synced, diff)
+        return diff
+
+    async def _recreate(self, examples: dict[str, dict]):
+        logger.info(f"recreate table {self.table} with {len(examples)} intent examples")
+        await self.unified_search.add_intents_examples(self.table, list(examples.values()), recreate=True)
+        self.save_manifest(examples)
+
+    async def _append(self, synced: dict[str, dict], diff: IntentExampleDiff):
+        for ids in batches(list(diff.added), self.batch_size):
+            await self.unified_search.add_intents_examples(self.table, [diff.added[id_] for id_ in ids])
+            synced.update({id_: diff.added[id_] for id_ in ids})
+            self.save_manifest(synced)
@@ -1,3 +1,4 @@
+import argparse
 import asyncio
 import json
 import os
@@ -6,6 +7,7 @@ import uuid
 import yaml
 
 from nlu.llm.intent import topic
+from nlu.llm.intent_example_sync import IntentExampleSynchronizer
 from resources.util import get_resources
 from third_system.unified_search import UnifiedSearch
 
@@ -60,16 +62,20 @@ async def vectorize_examples(intent_examples):
     return response
 
 
-async def main():
+async def main(dry_run: bool = False, full: bool = False):
     intent_examples = retrieve_intent_examples_from_intent_yaml(intent_yaml_file_folder)
-    print(intent_examples)
     if len(intent_examples) == 0:
         print("No examples")
         return
 
-    responses = await vectorize_examples(intent_examples)
-    print(responses)
+    synchronizer = IntentExampleSynchronizer(topic)
+    diff = await synchronizer.sync(intent_examples, dry_run=dry_run, full=full)
+    print(diff.report())
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="upload the changed intent examples to the unified search service")
+    parser.add_argument("--dry-run", action="store_true", help="only report the examples that would change")
+    parser.add_argument("--full", action="store_true", help="recreate the table with all examples")
+    args = parser.parse_args()
+    asyncio.run(main(args.dry_run, args.full))
@@ -0,0 +1,128 @@
+import asyncio
+import os
+from typing import Iterable, Optional
+
+import numpy as np
+from loguru import logger
+
+from metrics.base import metrics_registry
+from models.embedding_model.client import EmbeddingClient
+from nlu.intent_config import IntentConfig, IntentListConfig
+from utils.common import batches, intent_example_sync_batch_size
+
+intent_shortlist_feature_toggle = os.getenv("INTENT_SHORTLIST_FEATURE_TOGGLE", "False") == "True"
+intent_shortlist_size = int(os.getenv("INTENT_SHORTLIST_SIZE", 8))
+# intents offered to the llm whatever their similarity, comma separated full intent names
+intent_shortlist_always_include = [
+    name.strip()
+    for name in os.getenv("INTENT_SHORTLIST_ALWAYS_INCLUDE", "positive,negative").split(",")
+    if name.strip()
+]
+
+
+def collect_intent_texts(intent_list_config: IntentListConfig) -> list[tuple[str, str]]:
+    """(full intent name, text) of the description and the examples of every intent"""
+    return [
+        (intent.get_full_intent_name(), text)
+        for intent in intent_list_config.get_intent_list()
+        for text in [intent.description] + (intent.examples or []) + (intent.display_examples or [])
+        if text
+    ]
+
+
+def is_same_or_ancestor(full_intent_name: str, other_full_intent_name: Optional[str]) -> bool:
+    return bool(other_full_intent_name) and (
+        other_full_intent_name == full_intent_name or other_full_intent_name.startswith(full_intent_name + ".")
+    )
+
+
+class IntentShortlist:
+    """
+    Keep only the candidate intents closest to the user request in the intent classification prompt.
+
+    An intent scores the best cosine similarity between the request and the description or an example of the
+    intent or of any of its descendants. The top size candidates are kept, together with the always included
+    intents and the intents the caller asks for, such as the previous intent. Like IntentExampleIndex the texts are
+    embedded in the background, all candidates are kept until the embeddings match the current IntentListConfig.
+    """
+
+    def __init__(
+        self,
+        embedding_client: EmbeddingClient = None,
+        size: int = intent_shortlist_size,
+        always_include: Iterable[str] = tuple(intent_shortlist_always_include),
+    ):
+        self.embedding_client = embedding_client or EmbeddingClient()
+        self.size = size
+        self.always_include = set(always_include)
+        self.config_hash: Optional[str] = None
+        self.matrix: np.ndarray = np.zeros((0, 0), dtype=np.float32)
+        # rows of the intent and of its descendants by full intent name
+        self.rows_by_intent: dict[str, np.ndarray] = {}
+        self.building_task: Optional[asyncio.Task] = None
+
+    def is_fresh(self, intent_list_config: IntentListConfig) -> bool:
+        return self.config_hash is not None and self.config_hash == intent_list_config.config_hash
+
+    def refresh_in_background(self, intent_list_config: IntentListConfig):
+        if self.building_task is None or self.building_task.done():
+            self.building_task = asyncio.create_task(self._build_safely(intent_list_config))
+
+    async def _build_safely(self, intent_list_config: IntentListConfig):
+        try:
+            await self.build(intent_list_config)
+        except Exception as err:
+            logger.error(f"Error building intent shortlist: {err}")
+
+    async def build(self, intent_list_config: IntentListConfig):
+        intent_texts = collect_intent_texts(intent_list_config)
+        embedded = [
+            await self.embedding_client.embed([text for _, text in chunk])
+            for chunk in batches(intent_texts, intent_example_sync_batch_size)
+        ]
+        rows_by_intent: dict[str, list[int]] = {}
+        for row, (full_intent_name, _) in enumerate(intent_texts):
+            names = full_intent_name.split(".")
+            for depth in range(1, len(names) + 1):
+                rows_by_intent.setdefault(".".join(names[:depth]), []).append(row)
+        # replace all attributes without awaiting in between, same as IntentExampleIndex
+        self.matrix = np.vstack(embedded) if embedded else np.zeros((0, 0), dtype=np.float32)
+        self.rows_by_intent = {name: np.asarray(rows) for name, rows in rows_by_intent.items()}
+        self.config_hash = intent_list_config.config_hash
+
+    async def shortlist(
+        self,
+        user_input: str,
+        candidates: list[IntentConfig],
+        intent_list_config: IntentListConfig,
+        keep: Iterable[Optional[str]] = (),
+    ) -> Optional[list[IntentConfig]]:
+        """
+        candidates worth offering to the llm in their original order, None to offer all of them
+
+        keep are full intent names, a candidate is kept if it is one of them or one of their ancestors.
+        """
+        if len(candidates) <= self.size:
+            return None
+        if not self.is_fresh(intent_list_config):
+            self.refresh_in_background(intent_list_config)
+            return None
+        query = (await self.embedding_client.embed([user_input]))[0]
+        scores = self.matrix @ query
+
+        def score(intent: IntentConfig) -> float:
+            rows = self.rows_by_intent.get(intent.get_full_intent_name())
+            return float(scores[rows].max()) if rows is not None and len(rows) else float("-inf")
+
+        kept = {intent.get_full_intent_name() for intent in sorted(candidates, key=score, reverse=True)[: self.size]}
+        keep = [name for name in keep if name] + list(self.always_include)
+        shortlisted = [
+            intent
+            for intent in candidates
+            if intent.get_full_intent_name() in kept
+            or any(is_same_or_ancestor(intent.get_full_intent_name(), name) for name in keep)
+        ]
+        metrics_registry.counter(
+            "intent_shortlist_pruned_intents_total", "candidate intents left out of the intent classification prompt"
+        ).inc(len(candidates) - len(shortlisted))
+        return shortlisted
@@ -1,8 +1,9 @@
-from gluon_meson_sdk.models.scenario_model_registry.base import DefaultScenarioModelRegistryCenter
+from models.chat_model.registry import ScenarioModelRegistryCenter
 from gluon_meson_sdk.models.abstract_models.chat_message_preparation import ChatMessagePreparation
 from loguru import logger
 
 from nlu.intent_with_entity import Slot
+from utils.token_counter import default_history_token_budget
 
 same_topic_prompt = """## ROLE
 you are a helpful assistant
@@ -182,9 +183,11 @@ User: country is xxx and product is yyy
 
 
 class SameTopicChecker:
-    def __init__(self):
-        self.scenario_model_registry = DefaultScenarioModelRegistryCenter()
+    def __init__(self, history_token_budget: int = default_history_token_budget):
+        self.scenario_model_registry = ScenarioModelRegistryCenter()
         self.scenario_model = "same_topic_check"
+        # callers pass the history cut to this budget, see ConversationContext.get_history().format_messages
+        self.history_token_budget = history_token_budget
 
     def format_history(
         self,
@@ -1,4 +1,6 @@
+import asyncio
 import configparser
+import inspect
 
 from loguru import logger
 
@@ -30,7 +32,7 @@ class MLMIntentClassifier(IntentClassifier):
         self.intent_model = intent_model
         self.use_cache = use_cache
 
-    def classify_intent(self, conversation: ConversationContext) -> Intent:
+    async def classify_intent(self, conversation: ConversationContext) -> Intent:
         intent = None
         try:
             if self.use_cache:
@@ -38,11 +40,17 @@ class MLMIntentClassifier(IntentClassifier):
         except Exception as e:
             logger.error(f"Failed to retrieve intent from cache: {e}")
         if not intent:
-            intent = self.get_intent_without_cache(conversation)
+            intent = await self.get_intent_without_cache(conversation)
         return intent
 
-    def get_intent_without_cache(self, conversation: ConversationContext) -> Intent:
-        intent = self.intent_model.predict(conversation.current_user_input)
+    async def predict(self, text: str):
+        if inspect.iscoroutinefunction(self.intent_model.predict):
+            return await self.intent_model.predict(text)
+        # blocking models must not hold up the event loop
+        return await asyncio.to_thread(self.intent_model.predict, text)
+
+    async def get_intent_without_cache(self, conversation: ConversationContext) -> Intent:
+        intent = await self.predict(conversation.current_user_input)
         name = intent.intent
         confidence = intent.confidence
         intent = self.intent_list_config.get_intent(name)
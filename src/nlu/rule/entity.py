@@ -0,0 +1,114 @@
+import os
+import re
+from typing import Optional
+
+import dateparser
+from loguru import logger
+
+from nlu.forms import Form
+from nlu.intent_with_entity import Entity, Slot, SlotType
+
+rule_based_slot_extraction_feature_toggle = os.getenv("RULE_BASED_SLOT_EXTRACTION_FEATURE_TOGGLE", "False") == "True"
+
+MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+DATE_PATTERN = re.compile(
+    r"\d{4}[-/.]\d{1,2}[-/.]\d{1,2}"
+    r"|\d{4}年\d{1,2}月\d{1,2}[日号]?"
+    r"|\d{1,2}[-/.]\d{1,2}[-/.]\d{4}"
+    rf"|\d{{1,2}}\s+{MONTH}\s+\d{{4}}"
+    rf"|{MONTH}\s+\d{{1,2}}(?:st|nd|rd|th)?,?\s+\d{{4}}",
+    re.IGNORECASE,
+)
+# explicit digits only, not inside words like Q3, ranges like 10-20 or percentages, "1,000.5" is one number
+NUMBER_PATTERN = re.compile(r"(?<![\w.,-])(\d+(?:,\d{3})*(?:\.\d+)?)(?![\w%-]|[.,]\d)", re.ASCII)
+NUMBER_SLOT_TYPES = [SlotType.INTEGER, SlotType.FLOAT]
+# patterns a slot can refer to by name with "pattern: <name>" in the scene, any other value is used as the regex
+NAMED_PATTERNS = {
+    "bic": r"\b[A-Z]{4}[A-Z]{2}[A-Z0-9]{2}(?:[A-Z0-9]{3})?\b",
+    "email": r"[\w.+-]+@[\w-]+\.[\w.-]+",
+    "percentage": r"(\d+(?:\.\d+)?)\s*%",
+    "yes_no": r"^\s*(yes|no|true|false|是|否)\W*$",
+}
+
+
+def parse_date(text: str) -> Optional[str]:
+    normalized = re.sub(r"[年月]", "-", text).rstrip("日号")
+    parsed = dateparser.parse(normalized)
+    return parsed.date().isoformat() if parsed else None
+
+
+def unique(values: list) -> Optional[object]:
+    distinct = list(dict.fromkeys(values))
+    return distinct[0] if len(distinct) == 1 else None
+
+
+class RuleBasedEntityExtractor:
+    """
+    Fill the slots whose value can be read from the user input without the llm.
+
+    Slots with a pattern take its only match, the first group if the pattern has one. A date slot takes the only
+    date of the input, an integer or float slot the only number written in digits, if the form has no other date,
+    respectively number, slot without a pattern. Anything ambiguous is left to the llm, and values inferred from the
+    slot type never override the llm, see is_inferred. Matches of declared patterns and the only explicit date of the
+    input are reliable enough to fill a slot without asking the llm at all, see is_trusted.
+    """
+
+    def extract(self, form: Form, user_input: str) -> list[Entity]:
+        if not user_input:
+            return []
+        dates = DATE_PATTERN.findall(user_input)
+        # the digits of a date are not numbers
+        numbers = [number.replace(",", "") for number in NUMBER_PATTERN.findall(DATE_PATTERN.sub(" ", user_input))]
+        date_slots = [slot for slot in form.slots if not slot.pattern and slot.slot_type == SlotType.DATE]
+        # a number fills at most one slot
+        number_slots = [slot for slot in form.slots if not slot.pattern and slot.slot_type in NUMBER_SLOT_TYPES]
+
+        entities = []
+        for slot in form.slots:
+            if slot.pattern:
+                value = self.match_pattern(slot, user_input)
+            elif slot in date_slots and len(date_slots) == 1:
+                value = unique([parse_date(date) for date in dates])
+            elif slot in number_slots and len(number_slots) == 1:
+                value = self.number_value(slot, numbers)
+            else:
+                value = None
+            if value is not None:
+                entities.append(self.to_entity(slot, value))
+        if entities:
+            logger.info(f"rule based entities: {[(entity.type, entity.value) for entity in entities]}")
+        return entities
+
+    @staticmethod
+    def number_value(slot: Slot, numbers: list[str]):
+        value = unique([float(number) for number in numbers])
+        if slot.slot_type == SlotType.INTEGER:
+            return int(value) if value is not None and value.is_integer() else None
+        return value
+
+    @staticmethod
+    def is_inferred(entity: Entity) -> bool:
+        """the value was read by the slot type and not by a pattern declared in the scene"""
+        return not (entity.possible_slot and entity.possible_slot.pattern)
+
+    @classmethod
+    def is_trusted(cls, entity: Entity) -> bool:
+        """the value can fill its slot without the llm, numbers in digits may still mean something else"""
+        return not cls.is_inferred(entity) or entity.possible_slot.slot_type == SlotType.DATE
+
+    @staticmethod
+    def match_pattern(slot: Slot, user_input: str):
+        pattern = NAMED_PATTERNS.get(slot.pattern, slot.pattern)
+        matches = [
+            match.group(1) if match.groups() else match.group(0)
+            for match in re.finditer(pattern, user_input, re.IGNORECASE if slot.pattern == "yes_no" else 0)
+        ]
+        value = unique(matches)
+        if value is not None and slot.slot_type == SlotType.BOOLEAN:
+            return value.lower() in ["yes", "true", "是"]
+        return value
+
+    @staticmethod
+    def to_entity(slot: Slot, value) -> Entity:
+        possible_slot = slot.model_copy(update={"value": value, "confidence": 1.0})
+        return Entity(type=slot.name, value=value, confidence=1.0, possible_slot=possible_slot)
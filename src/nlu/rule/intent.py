@@ -0,0 +1,129 @@
+import math
+import os
+from collections import Counter, defaultdict
+from typing import Optional
+
+from loguru import logger
+
+from metrics.base import metrics_registry
+from nlu.base import IntentClassifier
+from nlu.intent_config import IntentListConfig
+from nlu.intent_with_entity import Intent
+from nlu.llm.intent_cache import normalize_user_input
+from tracker.context import ConversationContext
+
+intent_fast_path_feature_toggle = os.getenv("INTENT_FAST_PATH_FEATURE_TOGGLE", "False") == "True"
+intent_fast_path_threshold = float(os.getenv("INTENT_FAST_PATH_THRESHOLD", 0.85))
+
+GREETING_INTENT = "chitchat"
+LEXICON = {
+    "positive": [
+        "yes", "y", "yep", "yeah", "yes please", "ok", "okay", "sure", "correct", "right", "confirm", "that's right",
+        "是", "是的", "好", "好的", "对", "对的", "嗯", "可以", "没问题", "确认",
+    ],
+    "negative": [
+        "no", "n", "nope", "no thanks", "no thank you", "not really", "wrong", "cancel", "incorrect",
+        "不", "不是", "不用", "不要", "不对", "不用了", "算了", "取消",
+    ],
+    GREETING_INTENT: [
+        "hi", "hello", "hey", "good morning", "good afternoon", "good evening",
+        "你好", "您好", "嗨",
+    ],
+}
+# longer input is left to the llm, the fast path is meant for short replies
+MAX_FAST_PATH_LENGTH = 24
+FAST_PATH_METRIC = "intent_fast_path_total"
+
+
+def character_ngrams(text: str, sizes: tuple[int, ...] = (2, 3)) -> dict[str, float]:
+    """l2 normalized counts of the character n-grams, the text is padded so that word boundaries count"""
+    padded = f" {text} "
+    counts = Counter(padded[start : start + size] for size in sizes for start in range(len(padded) - size + 1))
+    norm = math.sqrt(sum(count * count for count in counts.values())) or 1.0
+    return {ngram: count / norm for ngram, count in counts.items()}
+
+
+class CharacterNgramModel:
+    """nearest labelled phrase by cosine similarity of character n-grams, through an inverted index of n-grams"""
+
+    def __init__(self, labelled_phrases: list[tuple[str, str]]):
+        self.labels: list[str] = []
+        self.postings: dict[str, list[tuple[int, float]]] = defaultdict(list)
+        for row, (phrase, label) in enumerate(labelled_phrases):
+            self.labels.append(label)
+            for ngram, weight in character_ngrams(phrase).items():
+                self.postings[ngram].append((row, weight))
+
+    def predict(self, text: str) -> tuple[Optional[str], float]:
+        """label of the nearest phrase, its similarity lowered by the square of the best similarity of another label"""
+        scores = defaultdict(float)
+        for ngram, weight in character_ngrams(text).items():
+            for row, phrase_weight in self.postings.get(ngram, ()):
+                scores[row] += weight * phrase_weight
+        best_by_label = {}
+        for row, score in scores.items():
+            label = self.labels[row]
+            best_by_label[label] = max(best_by_label.get(label, 0.0), score)
+        if not best_by_label:
+            return None, 0.0
+        ranked = sorted(best_by_label.items(), key=lambda item: item[1], reverse=True)
+        best_label, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        return best_label, best_score - runner_up**2
+
+
+class FastPathIntentClassifier(IntentClassifier):
+    """
+    Resolve confirmations, denials and greetings locally and defer everything else to the wrapped classifier.
+
+    Short input is looked up in the lexicon first, then in a character n-gram model of the lexicon and the scene
+    examples. Only answers at or above the threshold are taken.
+    """
+
+    def __init__(
+        self,
+        intent_classifier: IntentClassifier,
+        intent_list_config: IntentListConfig,
+        threshold: float = intent_fast_path_threshold,
+    ):
+        self.intent_classifier = intent_classifier
+        self.intent_list_config = intent_list_config
+        self.threshold = threshold
+        # labelled with full intent names, names of leaf intents are not unique across parents
+        self.lexicon = {
+            normalize_user_input(phrase): intent_name
+            for intent_name, phrases in LEXICON.items()
+            if intent_list_config.get_intent_by_full_name(intent_name)
+            for phrase in phrases
+        }
+        examples = [
+            (normalize_user_input(example), intent.get_full_intent_name())
+            for intent in intent_list_config.get_leaf_intents()
+            for example in (intent.examples or []) + (intent.display_examples or [])
+        ]
+        self.model = CharacterNgramModel(list(self.lexicon.items()) + examples)
+
+    def classify_locally(self, user_input: str) -> tuple[Optional[str], float]:
+        text = normalize_user_input(user_input or "").strip(" .!?,。！？，~")
+        if not text or len(text) > MAX_FAST_PATH_LENGTH:
+            return None, 0.0
+        if text in self.lexicon:
+            return self.lexicon[text], 1.0
+        return self.model.predict(text)
+
+    async def classify_intent(self, conversation: ConversationContext) -> Optional[Intent]:
+        if conversation.is_confused_with_intents():
+            return await self.intent_classifier.classify_intent(conversation)
+
+        full_intent_name, confidence = self.classify_locally(conversation.current_user_input)
+        if full_intent_name is None or confidence < self.threshold:
+            metrics_registry.counter(FAST_PATH_METRIC, "intents resolved without the llm", result="deferred").inc()
+            return await self.intent_classifier.classify_intent(conversation)
+
+        metrics_registry.counter(FAST_PATH_METRIC, "intents resolved without the llm", result="hit").inc()
+        logger.info(f"session {conversation.session_id}, intent from fast path: {full_intent_name} ({confidence:.2f})")
+        intent_config = self.intent_list_config.get_intent_by_full_name(full_intent_name)
+        return Intent.from_intent_config(intent_config.name, confidence, intent_config)
+
+    async def check_is_providing_more_info(self, conversation: ConversationContext) -> bool:
+        return await self.intent_classifier.check_is_providing_more_info(conversation)
@@ -1,5 +1,5 @@
 from gluon_meson_sdk.models.abstract_models.chat_message_preparation import ChatMessagePreparation
-from gluon_meson_sdk.models.scenario_model_registry.base import DefaultScenarioModelRegistryCenter
+from models.chat_model.registry import ScenarioModelRegistryCenter
 from loguru import logger
 
 from action.base import ActionResponse
@@ -45,7 +45,7 @@ TB Guru"""
 
 class EmailOutputAdapter(OutputAdapter):
     def __init__(self):
-        self.scenario_model_registry = DefaultScenarioModelRegistryCenter()
+        self.scenario_model_registry = ScenarioModelRegistryCenter()
         self.scenario_model = self.get_name() + "_output_adapter"
 
     def get_name(self) -> str:
@@ -1,4 +1,5 @@
 import ast
+from functools import lru_cache
 from typing import Sequence
 
 from policy.slot_filling.base_slot_checker import BaseSlotChecker, SlotCheckResult
@@ -13,10 +14,7 @@ class ExpressionSlotSequenceChecker(BaseSlotChecker):
 
     @classmethod
     def parse_expression(cls, expression) -> list[list[str]]:
-        expression_ast = ast.parse(expression)
-        visitor = SlotExpressionVisitor()
-        visitor.visit(expression_ast)
-        return visitor.new_items[0][0]
+        return [list(slot_sequence) for slot_sequence in compile_slot_expression(expression)]
 
     def check_slot_missing(self, real_slots: Sequence[str]) -> bool:
         return self.slot_sequences_checker.check_slot_missing(real_slots)
@@ -26,3 +24,12 @@ class ExpressionSlotSequenceChecker(BaseSlotChecker):
 
     def get_unsorted_missed_slots(self, real_slots: Sequence[str]) -> Sequence[SlotCheckResult]:
         return self.slot_sequences_checker.get_unsorted_missed_slots(real_slots)
+
+
+@lru_cache(maxsize=1024)
+def compile_slot_expression(expression: str) -> tuple[tuple[str, ...], ...]:
+    """slot sequences of the expression, parsed once per expression"""
+    expression_ast = ast.parse(expression)
+    visitor = SlotExpressionVisitor()
+    visitor.visit(expression_ast)
+    return tuple(tuple(slot_sequence) for slot_sequence in visitor.new_items[0][0])
@@ -42,3 +42,26 @@ class BasePromptManager(PromptManager):
             logger.warning(f"Prompt {name} not found")
             return None
         return PromptWrapper(prompt)
+
+
+class PreloadedPromptManager(PromptManager):
+    """all templates of the folder read once, later changes of the files are not seen"""
+
+    def __init__(self, prompt_template_folder) -> None:
+        super().__init__()
+        self.templates: dict[str, str] = {}
+        for file_name in sorted(os.listdir(prompt_template_folder)):
+            file_path = os.path.join(prompt_template_folder, file_name)
+            if file_name.endswith(".txt") and os.path.isfile(file_path):
+                with open(file_path, "r", encoding="utf-8") as file:
+                    self.templates[file_name[: -len(".txt")]] = file.read()
+
+    def load(self, name, domain=None) -> PromptWrapper:
+        if domain is not None:
+            name = domain + "_" + name
+
+        prompt = self.templates.get(name)
+        if prompt is None:
+            logger.warning(f"Prompt {name} not found")
+            return None
+        return PromptWrapper(prompt)
@@ -1,4 +1,5 @@
 from action.base import Action
+from metrics.tracing import trace_span
 from nlu.base import Nlu
 from policy.base import PolicyManager
 from reasoner.base import Plan, Reasoner
@@ -16,7 +17,9 @@ class LlmReasoner(Reasoner):
 
     async def think(self, conversation: ConversationContext) -> Plan:
         conversation.set_status("reasoning")
-        intent_with_entities = await self.nlu.extract_intents_and_entities(conversation)
-        action = self.policy_manager.get_action(intent_with_entities, conversation, self.model_type)
+        with trace_span("nlu"):
+            intent_with_entities = await self.nlu.extract_intents_and_entities(conversation)
+        with trace_span("policy"):
+            action = self.policy_manager.get_action(intent_with_entities, conversation, self.model_type)
 
         return Plan(intent_with_entities, "", action, [])
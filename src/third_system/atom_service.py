@@ -5,10 +5,13 @@ import json
 import os
 import uuid
 
-import aiohttp
 import dotenv
 from loguru import logger
 
+from utils.http_client import get_http_session, http_client_registry
+
+HTTP_SESSION_NAME = "atom"
+
 
 def get_current_user(user_id="email_user"):
     user_info = {"sub": user_id, "realm_access": {"roles": ["user"]}}
@@ -52,24 +55,23 @@ class AtomService:
         message: str = None,
         prompt_message: dict = None,
     ):
-        async with aiohttp.ClientSession() as session:
-            try:
-                data = {
-                    "message": message,
-                    "message_type": message_type.value,
-                    "message_from": message_from.value,
-                    "prompt_message": prompt_message,
-                }
-                async with session.post(
-                    f"{self.api_url}/apps/{self.app_id}/conversations/{conversation_id}/downstream_message",
-                    headers={"x-userinfo": get_current_user(user_id), "Content-Type": "application/json"},
-                    json=data,
-                ) as response:
-                    response.raise_for_status()
-                    return await response.json()
-            except Exception as err:
-                logger.error(f"Error to create atom message: {err}")
-                return None
+        try:
+            data = {
+                "message": message,
+                "message_type": message_type.value,
+                "message_from": message_from.value,
+                "prompt_message": prompt_message,
+            }
+            async with get_http_session(HTTP_SESSION_NAME).post(
+                f"{self.api_url}/apps/{self.app_id}/conversations/{conversation_id}/downstream_message",
+                headers={"x-userinfo": get_current_user(user_id), "Content-Type": "application/json"},
+                json=data,
+            ) as response:
+                response.raise_for_status()
+                return await response.json()
+        except Exception as err:
+            logger.error(f"Error to create atom message: {err}")
+            return None
 
     async def create_human_message(
         self, conversation_id: str, user_id: str, message: str = None, prompt_message: dict = None
@@ -106,6 +108,7 @@ async def main():
     answer = "How are you today?"
     ai_msg = await atom_service.create_ai_message(conversation_id, "test_email_user", answer, {"answer": answer})
     print("AI message:", ai_msg)
+    await http_client_registry.close()
 
 
 if __name__ == "__main__":
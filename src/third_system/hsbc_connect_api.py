@@ -5,6 +5,7 @@ import requests
 from loguru import logger
 
 from action.base import Attachment
+from utils.http_client import get_http_session
 
 
 def mock_validate_res():
@@ -28,14 +29,13 @@ class HsbcConnectApi:
             filename=file.name,
             content_type=file.content_type,
         )
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(self.base_url, data=data, ssl=False) as response:
-                    response.raise_for_status()
-                    return await response.text()
-            except Exception as err:
-                logger.error(f"Error to validate file by HSBC api: {err}")
-                raise err
+        try:
+            async with get_http_session("hsbc_connect").post(self.base_url, data=data, ssl=False) as response:
+                response.raise_for_status()
+                return await response.text()
+        except Exception as err:
+            logger.error(f"Error to validate file by HSBC api: {err}")
+            raise err
 
     async def validate_file(self, file: Attachment) -> str:
         if file and file.contents:
@@ -4,7 +4,6 @@ import os
 import urllib.parse
 from typing import Union
 
-import aiohttp
 from aiohttp import ClientResponseError
 from loguru import logger
 from tenacity import retry, wait_random_exponential, stop_after_attempt
@@ -12,6 +11,9 @@ from tenacity import retry, wait_random_exponential, stop_after_attempt
 from action.base import Attachment
 from models.email_model.model import Email, EmailBody, EmailSender
 from utils.common import get_value_or_default_from_dict, async_parse_json_response
+from utils.http_client import get_http_session
+
+HTTP_SESSION_NAME = "microsoft_graph"
 
 
 def parse_email(value: dict) -> Email:
@@ -79,20 +81,19 @@ class Graph:
             "client_secret": self.config["client_secret"],
             "scope": "https://graph.microsoft.com/.default",
         }
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    f'{self.login_endpoint}/{self.config["tenant_id"]}/oauth2/v2.0/token',
-                    data=data,
-                    headers={"Content-Type": "application/x-www-form-urlencoded"},
-                ) as response:
-                    response.raise_for_status()
-                    logger.info(f"Get access token response: {response}")
-                    result = await async_parse_json_response(response)
-                    return result["access_token"] if result and "access_token" in result else ""
-            except Exception as err:
-                logger.error(f"Other error occurred: {err}")
-                raise EmailHandlingFailedException(str(err), "GET_TOKEN_FAILED")
+        try:
+            async with get_http_session(HTTP_SESSION_NAME).post(
+                f'{self.login_endpoint}/{self.config["tenant_id"]}/oauth2/v2.0/token',
+                data=data,
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+            ) as response:
+                response.raise_for_status()
+                logger.info(f"Get access token response: {response}")
+                result = await async_parse_json_response(response)
+                return result["access_token"] if result and "access_token" in result else ""
+        except Exception as err:
+            logger.error(f"Other error occurred: {err}")
+            raise EmailHandlingFailedException(str(err), "GET_TOKEN_FAILED")
 
     async def refresh_access_token(self):
         logger.info("Refresh access token.")
@@ -103,24 +104,24 @@ class Graph:
         headers = {"Authorization": "Bearer " + self.access_token}
         extra_headers = kwargs.get("extra_headers", {})
         headers.update(extra_headers)
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(endpoint, headers=headers, json=data) if method == "POST" else session.get(
-                    endpoint, headers=headers
-                ) as response:
-                    response.raise_for_status()
-                    data = await async_parse_json_response(response) if response.status in [200, 201] else {}
-                    return data["value"] if data and "value" in data else data
-            except ClientResponseError as http_err:
-                if http_err.status == 401:
-                    await self.refresh_access_token()
-                    raise TokenExpiredException()
-                else:
-                    logger.error(f"HTTP error occurred: {http_err}")
-                    raise EmailHandlingFailedException(http_err.message, "CALL_API_FAILED")
-            except Exception as err:
-                logger.error(f"Other error occurred: {err}")
-                raise EmailHandlingFailedException(str(err), "CALL_API_FAILED")
+        session = get_http_session(HTTP_SESSION_NAME)
+        try:
+            async with session.post(endpoint, headers=headers, json=data) if method == "POST" else session.get(
+                endpoint, headers=headers
+            ) as response:
+                response.raise_for_status()
+                data = await async_parse_json_response(response) if response.status in [200, 201] else {}
+                return data["value"] if data and "value" in data else data
+        except ClientResponseError as http_err:
+            if http_err.status == 401:
+                await self.refresh_access_token()
+                raise TokenExpiredException()
+            else:
+                logger.error(f"HTTP error occurred: {http_err}")
+                raise EmailHandlingFailedException(http_err.message, "CALL_API_FAILED")
+        except Exception as err:
+            logger.error(f"Other error occurred: {err}")
+            raise EmailHandlingFailedException(str(err), "CALL_API_FAILED")
 
     async def list_folders(self):
         logger.info("List folders.")
@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import json
+import os
+from typing import Awaitable, Callable, Optional
+
+from caches.lru import LRUTTLCache
+from metrics.base import metrics_registry
+from third_system.search_entity import SearchParam, SearchResponse
+
+unified_search_cache_feature_toggle = os.getenv("UNIFIED_SEARCH_CACHE_FEATURE_TOGGLE", "False") == "True"
+unified_search_cache_size = int(os.getenv("UNIFIED_SEARCH_CACHE_SIZE", 2000))
+unified_search_cache_ttl = float(os.getenv("UNIFIED_SEARCH_CACHE_TTL_SECONDS", 600))
+
+SEARCH_COALESCED_METRIC = "unified_search_coalesced_total"
+# table of UnifiedSearch.search, which searches all the knowledge tables
+KNOWLEDGE_TABLE = "knowledge"
+
+
+def canonicalize_search_param(search_param: SearchParam) -> str:
+    """json of the param where equivalent searches agree: collapsed whitespace, no empty fields, sorted filters"""
+    param = search_param.model_dump(mode="json", exclude_none=True)
+    param["query"] = " ".join(search_param.query.split())
+    if not param.get("tags"):
+        param.pop("tags", None)
+    if param.get("filters"):
+        param["filters"] = sorted(param["filters"], key=lambda item: json.dumps(item, sort_keys=True))
+    return json.dumps(param, sort_keys=True, ensure_ascii=False)
+
+
+class SearchResultCache:
+    """
+    Results of UnifiedSearch remembered by table and canonical search param for ttl seconds.
+
+    Concurrent identical searches share one backend call. Only results of successful calls are remembered, fetch
+    raises on errors. invalidate(table) drops the results of a table, e.g. after its documents were updated.
+    """
+
+    def __init__(self, maxsize: int = unified_search_cache_size, ttl: float = unified_search_cache_ttl):
+        self.results = LRUTTLCache("unified_search", maxsize, ttl)
+        # bumped on invalidation, results of older generations are never read again and age out of the lru
+        self.generations: dict[str, int] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.in_flight: dict[tuple, asyncio.Task] = {}
+
+    def key(self, table: str, search_param: SearchParam) -> tuple:
+        digest = hashlib.sha1(canonicalize_search_param(search_param).encode("utf-8")).hexdigest()
+        return table, self.generations.get(table, 0), digest
+
+    def invalidate(self, table: Optional[str] = None):
+        """drop the results of the table, of all tables without one"""
+        if table is None:
+            self.results.clear()
+            self.generations.clear()
+        else:
+            self.generations[table] = self.generations.get(table, 0) + 1
+
+    def get(self, table: str, search_param: SearchParam) -> Optional[list[SearchResponse]]:
+        result = self.results.get(self.key(table, search_param))
+        return None if result is None else list(result)
+
+    def set(self, table: str, search_param: SearchParam, result: list[SearchResponse]):
+        self.results.set(self.key(table, search_param), result)
+
+    async def get_or_fetch(
+        self, table: str, search_param: SearchParam, fetch: Callable[[], Awaitable[list[SearchResponse]]]
+    ) -> list[SearchResponse]:
+        key = self.key(table, search_param)
+        result = self.results.get(key)
+        if result is not None:
+            return list(result)
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            # tasks belong to the loop they were created in
+            self.loop, self.in_flight = loop, {}
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, fetch))
+            self.in_flight[key] = task
+        else:
+            metrics_registry.counter(SEARCH_COALESCED_METRIC, "searches sharing a call in flight", table=table).inc()
+        # a cancelled caller must not cancel the call the others wait for
+        return list(await asyncio.shield(task))
+
+    async def _fetch(self, key: tuple, fetch: Callable[[], Awaitable[list[SearchResponse]]]) -> list[SearchResponse]:
+        try:
+            result = await fetch()
+            self.results.set(key, result)
+            return result
+        finally:
+            self.in_flight.pop(key, None)
+
+
+search_result_cache = SearchResultCache()
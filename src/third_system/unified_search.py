@@ -3,30 +3,41 @@ import mimetypes
 import os
 import re
 import urllib.parse
-from typing import Union
+from typing import Optional, Union
 
 import aiohttp
 from loguru import logger
 
 from action.base import Attachment, UploadFileContentType
+from third_system.search_cache import (
+    KNOWLEDGE_TABLE,
+    SearchResultCache,
+    canonicalize_search_param,
+    search_result_cache,
+    unified_search_cache_feature_toggle,
+)
 from third_system.search_entity import SearchParam, SearchResponse
+from utils.http_client import get_http_session, http_client_registry
 
 unified_search_url = os.environ.get("UNIFIED_SEARCH_URL", "http://localhost:8000")
+HTTP_SESSION_NAME = "unified_search"
+# search params per request of UnifiedSearch.bulk_search
+unified_search_bulk_chunk_size = int(os.getenv("UNIFIED_SEARCH_BULK_CHUNK_SIZE", 20))
 
 SPLIT_FILE_TOKEN_SiZE = 2000
 
 
 async def call_search_api(method: str, endpoint: str, payload: dict) -> SearchResponse:
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.post(endpoint, json=payload) if method == "POST" else session.get(
-                endpoint, params=payload
-            ) as response:
-                response.raise_for_status()
-                return SearchResponse.model_validate(await response.json())
-        except Exception as err:
-            logger.error(f"Error fetch url {endpoint}: {err}")
-            return SearchResponse()
+    session = get_http_session(HTTP_SESSION_NAME)
+    try:
+        async with session.post(endpoint, json=payload) if method == "POST" else session.get(
+            endpoint, params=payload
+        ) as response:
+            response.raise_for_status()
+            return SearchResponse.model_validate(await response.json())
+    except Exception as err:
+        logger.error(f"Error fetch url {endpoint}: {err}")
+        return SearchResponse()
 
 
 def extract_filename_from_header(header_value) -> str:
@@ -44,53 +55,146 @@ def get_content_type(file: Attachment) -> str:
 
 
 class UnifiedSearch:
-    def __init__(self):
+    def __init__(self, cache: Optional[SearchResultCache] = None):
         self.base_url = unified_search_url
+        self.cache = cache or (search_result_cache if unified_search_cache_feature_toggle else None)
 
     async def search(self, search_param: SearchParam, conversation_id) -> list[SearchResponse]:
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    f"{self.base_url}/search",
-                    json=search_param.model_dump(),
-                    headers={"conversation-id": conversation_id},
-                ) as response:
-                    response.raise_for_status()
-                    result = await response.json()
-                    return [SearchResponse.model_validate(item) for item in result]
-            except Exception as err:
-                logger.error(f"Error search {search_param}: {err}")
-                return []
+        try:
+            if self.cache is None:
+                return await self._search(search_param, conversation_id)
+            # the conversation id only traces the call, the results do not depend on it
+            return await self.cache.get_or_fetch(
+                KNOWLEDGE_TABLE, search_param, lambda: self._search(search_param, conversation_id)
+            )
+        except Exception as err:
+            logger.error(f"Error search {search_param}: {err}")
+            return []
+
+    async def _search(self, search_param: SearchParam, conversation_id) -> list[SearchResponse]:
+        async with get_http_session(HTTP_SESSION_NAME).post(
+            f"{self.base_url}/search",
+            json=search_param.model_dump(),
+            headers={"conversation-id": conversation_id},
+        ) as response:
+            response.raise_for_status()
+            result = await response.json()
+            return [SearchResponse.model_validate(item) for item in result]
+
+    async def bulk_search(
+        self, search_params: list[SearchParam], conversation_id, chunk_size: int = unified_search_bulk_chunk_size
+    ) -> list[list[SearchResponse]]:
+        """
+        results of every search param in order, like search() one by one.
+
+        Identical params are searched once, the others chunk_size params per request with the chunks sent
+        concurrently. A chunk the bulk endpoint fails on is searched one param at a time.
+        """
+        unique_params = {canonicalize_search_param(search_param): search_param for search_param in search_params}
+        results: dict[str, list[SearchResponse]] = {}
+        missing = []
+        for key, search_param in unique_params.items():
+            cached = self.cache.get(KNOWLEDGE_TABLE, search_param) if self.cache is not None else None
+            if cached is None:
+                missing.append((key, search_param))
+            else:
+                results[key] = cached
+        chunks = [missing[start : start + chunk_size] for start in range(0, len(missing), max(chunk_size, 1))]
+        chunk_results = await asyncio.gather(
+            *(self._bulk_search_chunk([search_param for _, search_param in chunk], conversation_id) for chunk in chunks)
+        )
+        for chunk, one_chunk_results in zip(chunks, chunk_results):
+            for (key, _), result in zip(chunk, one_chunk_results):
+                results[key] = result
+        return [results[canonicalize_search_param(search_param)] for search_param in search_params]
+
+    async def _bulk_search_chunk(self, search_params: list[SearchParam], conversation_id) -> list[list[SearchResponse]]:
+        try:
+            async with get_http_session(HTTP_SESSION_NAME).post(
+                f"{self.base_url}/search/bulk",
+                json={"searches": [search_param.model_dump() for search_param in search_params]},
+                headers={"conversation-id": conversation_id},
+            ) as response:
+                response.raise_for_status()
+                results = [
+                    [SearchResponse.model_validate(item) for item in result]
+                    for result in (await response.json())["results"]
+                ]
+            if len(results) != len(search_params):
+                raise ValueError(f"expected {len(search_params)} results, got {len(results)}")
+        except Exception as err:
+            logger.warning(f"Error bulk search of {len(search_params)} params, searching one by one: {err}")
+            return list(await asyncio.gather(*(self.search(param, conversation_id) for param in search_params)))
+        if self.cache is not None:
+            for search_param, result in zip(search_params, results):
+                self.cache.set(KNOWLEDGE_TABLE, search_param, result)
+        return results
 
     async def vector_search(self, search_param: SearchParam, table) -> list[SearchResponse]:
-        result = await call_search_api("POST", f"{self.base_url}/vector/{table}/search/", search_param.model_dump())
-        return [result] if result.items else []
+        try:
+            if self.cache is None:
+                return await self._vector_search(search_param, table)
+            return await self.cache.get_or_fetch(table, search_param, lambda: self._vector_search(search_param, table))
+        except Exception as err:
+            logger.error(f"Error vector search {search_param} in {table}: {err}")
+            return []
+
+    async def _vector_search(self, search_param: SearchParam, table) -> list[SearchResponse]:
+        async with get_http_session(HTTP_SESSION_NAME).post(
+            f"{self.base_url}/vector/{table}/search/", json=search_param.model_dump()
+        ) as response:
+            response.raise_for_status()
+            result = SearchResponse.model_validate(await response.json())
+            return [result] if result.items else []
 
     async def upload_intents_examples(self, table, intent_examples):
-        return await call_search_api(
-            "POST", f"{self.base_url}/vector/{table}/intent_examples?recreate=True", intent_examples
-        )
+        try:
+            return await call_search_api(
+                "POST", f"{self.base_url}/vector/{table}/intent_examples?recreate=True", intent_examples
+            )
+        finally:
+            self._invalidate(table)
+
+    async def add_intents_examples(self, table, intent_examples: list[dict], recreate: bool = False):
+        """append the examples to the table, recreate replaces all examples of the table with them"""
+        try:
+            await self._post_intent_examples(
+                f"{self.base_url}/vector/{table}/intent_examples?recreate={recreate}", intent_examples
+            )
+        finally:
+            self._invalidate(table)
+
+    def _invalidate(self, table):
+        """after writing, searches started during the write may have seen the old documents"""
+        if self.cache is not None:
+            self.cache.invalidate(table)
+
+    @staticmethod
+    async def _post_intent_examples(endpoint: str, payload):
+        # errors are raised, a sync has to stop before recording examples the service did not store
+        async with get_http_session(HTTP_SESSION_NAME).post(endpoint, json=payload) as response:
+            response.raise_for_status()
 
     async def search_for_intent_examples(self, table, user_input):
         return await call_search_api("POST", f"{self.base_url}/vector/{table}/search", {"query": user_input})
 
     async def download_raw_file_from_minio(self, file_url: str) -> Union[Attachment, None]:
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(f"{self.base_url}/file/download_raw", params={"file_url": file_url}) as resp:
-                    resp.raise_for_status()
-                    filename = extract_filename_from_header(resp.headers.get("Content-Disposition", ""))
-                    content = await resp.content.read()
-                    return Attachment(
-                        path="",
-                        url=file_url,
-                        name=filename,
-                        contents=content,
-                        content_type=resp.headers.get("Content-Type", "").split(";")[0],
-                    )
-            except Exception as err:
-                logger.error(f"Error download {file_url}: {err}")
-                return None
+        session = get_http_session(HTTP_SESSION_NAME)
+        try:
+            async with session.get(f"{self.base_url}/file/download_raw", params={"file_url": file_url}) as resp:
+                resp.raise_for_status()
+                filename = extract_filename_from_header(resp.headers.get("Content-Disposition", ""))
+                content = await resp.content.read()
+                return Attachment(
+                    path="",
+                    url=file_url,
+                    name=filename,
+                    contents=content,
+                    content_type=resp.headers.get("Content-Type", "").split(";")[0],
+                )
+        except Exception as err:
+            logger.error(f"Error download {file_url}: {err}")
+            return None
 
     async def download_file_from_minio(
         self, file_url: str, chunk_size: int = SPLIT_FILE_TOKEN_SiZE, chunk_overlap: int = 0
@@ -115,10 +219,9 @@ class UnifiedSearch:
                     content_type=get_content_type(f),
                 )
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(f"{self.base_url}/file", data=data) as response:
-                    response.raise_for_status()
-                    return await response.json()
+            async with get_http_session(HTTP_SESSION_NAME).post(f"{self.base_url}/file", data=data) as response:
+                response.raise_for_status()
+                return await response.json()
         except Exception as err:
             logger.error(f"Error upload files: {err}")
             return []
@@ -135,24 +238,22 @@ class UnifiedSearch:
                 content_type=get_content_type(file),
             )
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(f"{self.base_url}/file/new", data=data) as response:
-                    response.raise_for_status()
-                    return await response.json()
+            async with get_http_session(HTTP_SESSION_NAME).post(f"{self.base_url}/file/new", data=data) as response:
+                response.raise_for_status()
+                return await response.json()
         except Exception as err:
             logger.error(f"Error upload files: {err}")
             return ""
 
     async def generate_file_link(self, filename: str) -> str:
         endpoint = f"{self.base_url}/file/link"
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(endpoint, params={"filename": filename}) as response:
-                    response.raise_for_status()
-                    return await response.json()
-            except Exception as err:
-                logger.error(f"Error fetch url {endpoint}: {err}")
-                return ""
+        try:
+            async with get_http_session(HTTP_SESSION_NAME).get(endpoint, params={"filename": filename}) as response:
+                response.raise_for_status()
+                return await response.json()
+        except Exception as err:
+            logger.error(f"Error fetch url {endpoint}: {err}")
+            return ""
 
 
 async def main():
@@ -174,6 +275,7 @@ async def main():
     )
     result = await UnifiedSearch().generate_new_file(new_file)
     print(result)
+    await http_client_registry.close()
 
     # search_result = await UnifiedSearch().download_file_from_minio(
     #     "http://47.106.182.247:19000/rlin-test/BR MASKED 6.docx"
@@ -1,14 +1,19 @@
+import asyncio
 import os
 from typing import List
 
-from gluon_meson_sdk.models.scenario_model_registry.base import DefaultScenarioModelRegistryCenter
 from gluon_meson_sdk.models.abstract_models.chat_message_preparation import ChatMessagePreparation
 from loguru import logger
 
+from metrics.base import metrics_registry
+from metrics.tracing import trace_span
+from models.chat_model.registry import ScenarioModelRegistryCenter
+from tracker.base import ConversationTracker
 from tracker.context import ConversationContext
+from tracker.session_lock import SessionLockManager
 
 
-summarize_history_count = os.getenv("SUMMARIZE_HISTORY_COUNT", 6)
+summarize_history_count = int(os.getenv("SUMMARIZE_HISTORY_COUNT", 6))
 
 prompt = """## ROLE
 you are a helpful chatbot, extract all the session names from this discussion:
@@ -20,17 +25,18 @@ you are a helpful chatbot, extract all the session names from this discussion:
 
 class HistorySummarizer:
     def __init__(self):
-        self.scenario_model_registry = DefaultScenarioModelRegistryCenter()
+        self.scenario_model_registry = ScenarioModelRegistryCenter()
         self.scenario_model = "summarize_history"
 
     async def summarize_history(self, conversation: ConversationContext):
         history = conversation.get_unsummarized_history()
         if len(history) >= summarize_history_count:
+            messages = [one_round.to_message() for one_round in history]
             if conversation.summarized_history_context:
-                history.insert(0, {"role": "system", "content": conversation.summarized_history_context})
-            summarized_history = await self.summarize(history, conversation.session_id)
-            conversation.summarized_history_context = summarized_history
-            conversation.history.flag_history_summarized(len(history))
+                messages.insert(0, {"role": "system", "content": conversation.summarized_history_context})
+            summarized_history = await self.summarize(messages, conversation.session_id)
+            # no await between setting the summary and flagging the rounds, readers always see both or neither
+            conversation.install_summarized_history(summarized_history, history)
         return conversation
 
     async def summarize(self, history: List[dict], session_id: str):
@@ -45,3 +51,56 @@ class HistorySummarizer:
         ).response
         logger.info(f"chat result: {result}")
         return result
+
+
+class HistorySummarizationWorker:
+    """
+    Summarize history in background tasks, so the summarizer call is not part of the response latency.
+
+    At most one summarization runs per session, requests scheduled meanwhile are coalesced into one more run.
+    """
+
+    def __init__(
+        self,
+        history_summarizer: HistorySummarizer,
+        conversation_tracker: ConversationTracker = None,
+        session_lock_manager: SessionLockManager = None,
+    ):
+        self.history_summarizer = history_summarizer
+        self.conversation_tracker = conversation_tracker
+        self.session_lock_manager = session_lock_manager or SessionLockManager()
+        self.running_tasks: dict[str, asyncio.Task] = {}
+        self.pending_conversations: dict[str, ConversationContext] = {}
+
+    def schedule(self, conversation: ConversationContext):
+        session_id = conversation.session_id
+        if session_id in self.pending_conversations:
+            metrics_registry.counter(
+                "history_summarization_coalesced_total", "summarizations merged into a pending one"
+            ).inc()
+        self.pending_conversations[session_id] = conversation
+        if session_id not in self.running_tasks:
+            self.running_tasks[session_id] = asyncio.create_task(self._summarize_pending(session_id))
+
+    async def _summarize_pending(self, session_id: str):
+        try:
+            while session_id in self.pending_conversations:
+                conversation = self.pending_conversations.pop(session_id)
+                try:
+                    with trace_span("history_summarizer"):
+                        await self.history_summarizer.summarize_history(conversation)
+                    if self.conversation_tracker is not None:
+                        # write back between two requests of the session, so they don't see a version conflict
+                        async with self.session_lock_manager.lock(session_id):
+                            await self.conversation_tracker.asave_summarized_history(conversation)
+                except Exception as err:
+                    metrics_registry.counter("history_summarization_failed_total", "failed summarizations").inc()
+                    logger.error(f"Error summarizing history for session {session_id}: {err}")
+        finally:
+            self.running_tasks.pop(session_id, None)
+
+    async def shutdown(self):
+        tasks = list(self.running_tasks.values())
+        if tasks:
+            logger.info(f"waiting for {len(tasks)} history summarizations")
+            await asyncio.gather(*tasks, return_exceptions=True)
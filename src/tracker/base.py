@@ -1,14 +1,32 @@
+import asyncio
+import os
 # import threading
 import time
 from datetime import datetime, timedelta
+from typing import Optional
+
 from loguru import logger
 
 import schedule
 
+from metrics.base import metrics_registry
 from tracker.context import ConversationContext
+from tracker.expiry_index import ExpiryIndex
+
+inactive_conversation_sweep_interval = int(os.getenv("INACTIVE_CONVERSATION_SWEEP_INTERVAL_SECONDS", 600))
+
+
+class ConversationVersionConflictException(Exception):
+    def __init__(self, session_id: str, version: int):
+        self.session_id = session_id
+        self.version = version
+        super().__init__(f"session {session_id} was updated by another request after version {version} was loaded")
 
 
 class ConversationTracker:
+    sweep_interval: int = inactive_conversation_sweep_interval
+    sweeper_task: Optional[asyncio.Task] = None
+
     def save_conversation(
         self, session_id: str, conversation_context: ConversationContext
     ):
@@ -20,6 +38,44 @@ class ConversationTracker:
     def clear_inactive_conversations(self):
         raise NotImplementedError
 
+    async def sweep_inactive_conversations(self):
+        raise NotImplementedError
+
+    def save_summarized_history(self, conversation_context: ConversationContext):
+        """persist the summary installed by the history summarizer after the conversation was saved"""
+        pass
+
+    # used on the event loop, trackers doing blocking io move it off the loop
+    async def aload_conversation(self, session_id: str) -> ConversationContext:
+        return self.load_conversation(session_id)
+
+    async def asave_conversation(self, session_id: str, conversation_context: ConversationContext):
+        self.save_conversation(session_id, conversation_context)
+
+    async def asave_summarized_history(self, conversation_context: ConversationContext):
+        self.save_summarized_history(conversation_context)
+
+    async def _sweep_periodically(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep_inactive_conversations()
+            except Exception as err:
+                logger.error(f"Error clearing inactive conversations: {err}")
+
+    def start(self):
+        if self.sweeper_task is None:
+            self.sweeper_task = asyncio.create_task(self._sweep_periodically())
+
+    async def shutdown(self):
+        if self.sweeper_task is not None:
+            self.sweeper_task.cancel()
+            try:
+                await self.sweeper_task
+            except asyncio.CancelledError:
+                pass
+            self.sweeper_task = None
+
 
 def start_schedule():
     # 无限循环，直到程序手动停止
@@ -29,8 +85,15 @@ def start_schedule():
 
 
 class BaseConversationTracker(ConversationTracker):
-    def __init__(self):
+    def __init__(
+        self,
+        inactive_timeout: timedelta = timedelta(hours=24),
+        sweep_interval: int = inactive_conversation_sweep_interval,
+    ):
         self.conversation_caches = {}
+        self.inactive_timeout = inactive_timeout
+        self.sweep_interval = sweep_interval
+        self.expiry_index = ExpiryIndex()
         # 每天固定时间执行clear_inactive_conversations函数
         # schedule.every().day.at("00:00").do(self.clear_inactive_conversations)
 
@@ -42,6 +105,8 @@ class BaseConversationTracker(ConversationTracker):
         self, session_id: str, conversation_context: ConversationContext
     ):
         self.conversation_caches[session_id] = conversation_context
+        conversation_context.updated_at_listener = self.expiry_index.touch
+        self.expiry_index.touch(session_id, conversation_context.updated_at)
 
     def load_conversation(self, session_id: str) -> ConversationContext:
         if session_id and session_id in self.conversation_caches:
@@ -51,15 +116,32 @@ class BaseConversationTracker(ConversationTracker):
             return conversation
         return ConversationContext(current_user_input="", session_id=session_id)
 
-    def clear_inactive_conversations(self):
-        current_time = datetime.now()
-        inactive_conversations = [
-            session_id
-            for session_id, conversation in self.conversation_caches.items()
-            if (current_time - conversation.updated_at) > timedelta(hours=24)
-        ]
-        for session_id in inactive_conversations:
+    def pop_inactive_conversations(self) -> list[ConversationContext]:
+        cutoff = datetime.now() - self.inactive_timeout
+        inactive_conversations = []
+        for session_id in self.expiry_index.candidates(cutoff):
+            conversation = self.conversation_caches.get(session_id)
+            if conversation is not None and conversation.updated_at > cutoff:
+                continue
             logger.info(f"clear history for {session_id}")
-            conversation = self.conversation_caches[session_id]
+            self.expiry_index.remove(session_id)
+            if conversation is not None:
+                del self.conversation_caches[session_id]
+                conversation.updated_at_listener = None
+                inactive_conversations.append(conversation)
+        return inactive_conversations
+
+    def clear_inactive_conversations(self):
+        for conversation in self.pop_inactive_conversations():
             conversation.delete_files()
-            del self.conversation_caches[session_id]
+
+    async def sweep_inactive_conversations(self):
+        inactive_conversations = self.pop_inactive_conversations()
+        if inactive_conversations:
+            metrics_registry.counter(
+                "inactive_conversations_cleared_total", "conversations cleared by the sweeper"
+            ).inc(len(inactive_conversations))
+            await asyncio.to_thread(lambda: [conversation.delete_files() for conversation in inactive_conversations])
+        metrics_registry.gauge("active_conversations", "conversations kept in memory").set(
+            len(self.conversation_caches)
+        )
@@ -2,11 +2,13 @@ import os
 import shutil
 import uuid
 from datetime import datetime
-from typing import List, Any, Optional, Sequence
+from itertools import islice
+from typing import List, Any, Optional, Sequence, Callable, Union
 from fastapi import UploadFile
 
 from nlu.intent_with_entity import Entity, Intent, Slot
-from collections import deque
+from tracker.ring_buffer import RingBuffer
+from utils.token_counter import ROUND_OVERHEAD_TOKENS, count_tokens, truncate_to_tokens
 
 from loguru import logger
 
@@ -28,15 +30,93 @@ def prepare_response_content(answer):
         return ""
 
 
+class HistoryRound:
+    """one message of the history, also readable like the dict it used to be, e.g. one_round["content"]"""
+
+    __slots__ = ("role", "content", "file_name", "summarized", "_token_count")
+
+    def __init__(self, role: str, content: str, file_name: str = None, summarized: bool = False):
+        self.role = role
+        self.content = content
+        self.file_name = file_name
+        self.summarized = summarized
+        self._token_count: Optional[int] = None
+
+    @property
+    def token_count(self) -> int:
+        # rounds never change their content, so they are tokenized once
+        if self._token_count is None:
+            self._token_count = count_tokens(str(self.content))
+        return self._token_count
+
+    def truncated(self, max_tokens: int) -> "HistoryRound":
+        content = truncate_to_tokens(str(self.content), max_tokens)
+        return HistoryRound(self.role, content, self.file_name, self.summarized)
+
+    @classmethod
+    def from_dict(cls, one_round: dict[str, Any]) -> "HistoryRound":
+        return cls(
+            one_round["role"], one_round["content"], one_round.get("file_name"), one_round.get("summarized", False)
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        one_round = {"role": self.role, "content": self.content, "file_name": self.file_name}
+        if self.summarized:
+            one_round["summarized"] = True
+        return one_round
+
+    def to_message(self) -> dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    def __eq__(self, other):
+        if not isinstance(other, HistoryRound):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"HistoryRound({self.to_dict()})"
+
+
 class History:
-    def __init__(self, rounds: List[dict[str, Any]], max_history: int = 9):
+    """
+    Ring buffer of the latest max_history rounds.
+
+    The formatted views are read by several stages in one turn, so they are cached until the rounds change.
+    """
+
+    __slots__ = ("max_history", "rounds", "_views")
+
+    def __init__(self, rounds: List[Union[dict[str, Any], HistoryRound]], max_history: int = 9):
         self.max_history = max_history
-        self.rounds = rounds[-self.max_history :]
+        self.rounds: RingBuffer[HistoryRound] = RingBuffer(
+            (
+                one_round if isinstance(one_round, HistoryRound) else HistoryRound.from_dict(one_round)
+                for one_round in rounds
+            ),
+            maxlen=max_history,
+        )
+        self._views: dict[Any, Any] = {}
+
+    def _changed(self):
+        self._views.clear()
+
+    def _cached_view(self, key, build: Callable[[], Any]):
+        if key not in self._views:
+            self._views[key] = build()
+        return self._views[key]
 
     def add_history(self, role: str, message: str, file_name: str = None):
-        if len(self.rounds) >= self.max_history:
-            self.rounds.pop(0)
-        self.rounds.append({"role": role, "content": message, "file_name": file_name})
+        self.rounds.append(HistoryRound(role, message, file_name))
+        self._changed()
 
     def delete_latest_conversation_history(self):
         round_to_delete = 2 if len(self.rounds) > 1 else len(self.rounds)
@@ -45,24 +125,77 @@ class History:
     def delete_n_round(self, n: int):
         for _ in range(n):
             self.rounds.pop()
+        self._changed()
 
     def keep_latest_n_rounds(self, n: int):
         if n <= 0:
             return
-        self.rounds = self.rounds[-n:]
+        while len(self.rounds) > n:
+            self.rounds.popleft()
+        self._changed()
 
     def flag_history_summarized(self, n: int):
         if n <= 0:
             return
-        last_n_history = self.rounds[-n:]
-        last_n_summarized_history = [{**history, "summarized": True} for history in last_n_history]
-        self.rounds = self.rounds[:-n] + last_n_summarized_history
-
-    def format_string(self, rename: dict = None):
+        for one_round in islice(reversed(self.rounds), n):
+            one_round.summarized = True
+
+    def flag_rounds_summarized(self, summarized_rounds: List[HistoryRound]):
+        # rounds may be appended or deleted while summarizing, flagging the round objects is safe either way
+        for one_round in summarized_rounds:
+            one_round.summarized = True
+
+    def flag_matching_rounds_summarized(self, summarized_rounds: List[HistoryRound]):
+        # used when the rounds were summarized on another copy of the history, match them in order by content
+        remaining_rounds = iter(summarized_rounds)
+        summarized_round = next(remaining_rounds, None)
+        for one_round in self.rounds:
+            if summarized_round is None:
+                break
+            if (one_round.role, one_round.content, one_round.file_name) == (
+                summarized_round.role,
+                summarized_round.content,
+                summarized_round.file_name,
+            ):
+                one_round.summarized = True
+                summarized_round = next(remaining_rounds, None)
+
+    def to_dicts(self) -> list[dict[str, Any]]:
+        return [one_round.to_dict() for one_round in self.rounds]
+
+    def latest_rounds_within(self, token_budget: Optional[int] = None) -> list[HistoryRound]:
+        """
+        the newest rounds fitting in token_budget, all rounds if it is None.
+        if even the newest round exceeds the budget, it is truncated to the budget.
+        """
+        if token_budget is None:
+            return list(self.rounds)
+        rounds = []
+        remaining_tokens = token_budget
+        for one_round in reversed(self.rounds):
+            round_tokens = one_round.token_count + ROUND_OVERHEAD_TOKENS
+            if round_tokens > remaining_tokens:
+                if not rounds:
+                    rounds.append(one_round.truncated(remaining_tokens - ROUND_OVERHEAD_TOKENS))
+                break
+            rounds.append(one_round)
+            remaining_tokens -= round_tokens
+        if len(rounds) < len(self.rounds):
+            logger.info(f"history is cut to {len(rounds)} of {len(self.rounds)} rounds by {token_budget} tokens")
+        rounds.reverse()
+        return rounds
+
+    def format_string(self, rename: dict = None, token_budget: int = None):
         if not rename:
             rename = {}
-        return "\n".join(
-            [f'### {rename.get(entry["role"], entry["role"])}:\n {entry["content"]}' for entry in self.rounds]
+        return self._cached_view(
+            ("format_string", tuple(rename.items()), token_budget),
+            lambda: "\n".join(
+                [
+                    f"### {rename.get(entry.role, entry.role)}:\n {entry.content}"
+                    for entry in self.latest_rounds_within(token_budget)
+                ]
+            ),
         )
 
     @classmethod
@@ -72,22 +205,38 @@ class History:
         else:
             return f'{one_round["role"]}: {one_round["content"]} '
 
-    def format_string_with_file_name(self):
-        return "\n".join([self.format_message_with_file_name(entry) for entry in self.rounds])
+    def format_string_with_file_name(self, token_budget: int = None):
+        return self._cached_view(
+            ("format_string_with_file_name", token_budget),
+            lambda: "\n".join(
+                [self.format_message_with_file_name(entry) for entry in self.latest_rounds_within(token_budget)]
+            ),
+        )
 
-    def format_messages(self):
-        return [{"role": entry["role"], "content": entry["content"]} for entry in self.rounds]
+    def format_messages(self, token_budget: int = None):
+        # copy the list, callers may append their own messages
+        return list(
+            self._cached_view(
+                ("format_messages", token_budget),
+                lambda: [entry.to_message() for entry in self.latest_rounds_within(token_budget)],
+            )
+        )
 
     def get_latest(self):
-        return self.rounds[-1]["content"] if len(self.rounds) > 0 else ""
+        return self.rounds[-1].content if len(self.rounds) > 0 else ""
 
 
 class ConversationFiles:
+    __slots__ = ("session_id", "filenames")
+
     def __init__(self, session_id: str):
         self.session_id = session_id
-        self.file_dir = os.path.join(os.path.dirname(__file__), "../tmp", self.session_id)
         self.filenames = []
 
+    @property
+    def file_dir(self) -> str:
+        return os.path.join(os.path.dirname(__file__), "../tmp", self.session_id)
+
     def add_files(self, files: list[UploadFile]):
         if files and len(files) > 0:
             if not os.path.exists(self.file_dir):
@@ -104,19 +253,49 @@ class ConversationFiles:
 
 
 class ConversationContext:
+    # thousands of conversations are kept alive, slots avoid a __dict__ per conversation
+    __slots__ = (
+        "updated_at_listener",
+        "is_email_request",
+        "current_user_input",
+        "current_new_request",
+        "session_id",
+        "current_intent",
+        "current_intent_slots",
+        "intent_queue",
+        "history",
+        "summarized_history_context",
+        "status",
+        "state",
+        "entities",
+        "created_at",
+        "_updated_at",
+        "inquiry_times",
+        "has_update",
+        "current_round",
+        "files",
+        "uploaded_file_urls",
+        "confused_intents",
+        "appended_history_count_in_one_chat",
+        "start_new_question",
+        "version",
+    )
+
     def __init__(
         self,
         current_user_input: str,
         session_id: str,
         current_user_intent: Intent = None,
     ):
+        # called with (session_id, updated_at) whenever updated_at changes, used by the tracker's expiry index
+        self.updated_at_listener: Optional[Callable[[str, datetime], None]] = None
         self.is_email_request = False
         self.current_user_input = current_user_input
         self.current_new_request = None
         self.session_id = session_id if session_id else str(uuid.uuid4())
         self.current_intent = current_user_intent
         self.current_intent_slots: List[Slot] = []
-        self.intent_queue = deque(maxlen=3)
+        self.intent_queue: RingBuffer[Intent] = RingBuffer(maxlen=3)
         self.history = History([])
         self.summarized_history_context = None
         # used for logging
@@ -135,6 +314,18 @@ class ConversationContext:
         self.confused_intents: list[Intent] = []
         self.appended_history_count_in_one_chat = 0
         self.start_new_question = False
+        # version of the persisted conversation, used by shared trackers to detect concurrent updates
+        self.version = 0
+
+    @property
+    def updated_at(self) -> datetime:
+        return self._updated_at
+
+    @updated_at.setter
+    def updated_at(self, updated_at: datetime):
+        self._updated_at = updated_at
+        if self.updated_at_listener:
+            self.updated_at_listener(self.session_id, updated_at)
 
     def start_one_chat(self):
         self.appended_history_count_in_one_chat = 0
@@ -148,8 +339,12 @@ class ConversationContext:
     def get_history(self) -> History:
         return self.history
 
-    def get_unsummarized_history(self) -> list[dict]:
-        return [history for history in self.history.rounds if history.get("summarized") is not True]
+    def get_unsummarized_history(self) -> list[HistoryRound]:
+        return [history for history in self.history.rounds if not history.summarized]
+
+    def install_summarized_history(self, summarized_history_context: str, summarized_rounds: list[HistoryRound]):
+        self.summarized_history_context = summarized_history_context
+        self.history.flag_rounds_summarized(summarized_rounds)
 
     def reset_history(self):
         self.history.delete_n_round(self.appended_history_count_in_one_chat)
@@ -310,7 +505,7 @@ class ConversationContext:
         self.is_email_request = is_email_request
 
     def get_file_name(self):
-        return self.history.rounds[-1]["file_name"]
+        return self.history.rounds[-1].file_name
 
     def set_start_new_question(self, start_new_question: bool):
         self.start_new_question = start_new_question
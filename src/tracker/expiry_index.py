@@ -0,0 +1,51 @@
+from datetime import datetime
+
+
+class ExpiryIndex:
+    """
+    Time-bucketed wheel of session ids keyed by their last update time.
+
+    Touching a session is O(1), a sweep only visits the buckets older than the cutoff.
+    """
+
+    def __init__(self, bucket_seconds: int = 300):
+        self.bucket_seconds = bucket_seconds
+        self.buckets: dict[int, set[str]] = {}
+        self.session_buckets: dict[str, int] = {}
+
+    def _bucket_of(self, time: datetime) -> int:
+        return int(time.timestamp() // self.bucket_seconds)
+
+    def touch(self, session_id: str, updated_at: datetime):
+        bucket = self._bucket_of(updated_at)
+        previous_bucket = self.session_buckets.get(session_id)
+        if previous_bucket == bucket:
+            return
+        if previous_bucket is not None:
+            self._discard_from_bucket(session_id, previous_bucket)
+        self.buckets.setdefault(bucket, set()).add(session_id)
+        self.session_buckets[session_id] = bucket
+
+    def remove(self, session_id: str):
+        bucket = self.session_buckets.pop(session_id, None)
+        if bucket is not None:
+            self._discard_from_bucket(session_id, bucket)
+
+    def _discard_from_bucket(self, session_id: str, bucket: int):
+        sessions = self.buckets.get(bucket)
+        if sessions is not None:
+            sessions.discard(session_id)
+            if not sessions:
+                del self.buckets[bucket]
+
+    def candidates(self, cutoff: datetime) -> list[str]:
+        """Sessions which may have not been updated since the cutoff, the caller should check the exact time."""
+        cutoff_bucket = self._bucket_of(cutoff)
+        return [
+            session_id
+            for bucket in sorted(bucket for bucket in self.buckets if bucket <= cutoff_bucket)
+            for session_id in self.buckets[bucket]
+        ]
+
+    def __len__(self):
+        return len(self.session_buckets)
@@ -0,0 +1,159 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from loguru import logger
+
+from metrics.base import metrics_registry
+from tracker.base import (
+    BaseConversationTracker,
+    ConversationTracker,
+    ConversationVersionConflictException,
+    inactive_conversation_sweep_interval,
+)
+from tracker.context import ConversationContext, ConversationFiles
+from tracker.serializer import deserialize_conversation, serialize_conversation
+from tracker.store import ConversationStore, RedisConversationStore, SqliteConversationStore
+
+conversation_tracker_backend = os.getenv("CONVERSATION_TRACKER_BACKEND", "memory")
+conversation_tracker_sqlite_path = os.getenv(
+    "CONVERSATION_TRACKER_SQLITE_PATH", os.path.join(os.path.dirname(__file__), "../tmp", "conversations.db")
+)
+conversation_tracker_redis_url = os.getenv("CONVERSATION_TRACKER_REDIS_URL", "redis://localhost:6379/0")
+
+
+class PersistentConversationTracker(ConversationTracker):
+    """
+    Keep conversations in a ConversationStore instead of the process memory, so that several workers can serve the
+    same session and conversations survive restarts.
+
+    A conversation is written back only if nobody saved it since it was loaded, otherwise
+    ConversationVersionConflictException is raised.
+    """
+
+    def __init__(
+        self,
+        store: ConversationStore,
+        inactive_timeout: timedelta = timedelta(hours=24),
+        sweep_interval: int = inactive_conversation_sweep_interval,
+    ):
+        self.store = store
+        self.inactive_timeout = inactive_timeout
+        self.sweep_interval = sweep_interval
+
+    def save_conversation(self, session_id: str, conversation_context: ConversationContext):
+        data = serialize_conversation(conversation_context)
+        saved = self.store.compare_and_set(
+            session_id, data, conversation_context.version, conversation_context.updated_at.timestamp()
+        )
+        self._after_save(session_id, conversation_context, saved)
+
+    async def asave_conversation(self, session_id: str, conversation_context: ConversationContext):
+        # serialized on the loop, other tasks may change the conversation while the store writes
+        data = serialize_conversation(conversation_context)
+        saved = await asyncio.to_thread(
+            self.store.compare_and_set,
+            session_id,
+            data,
+            conversation_context.version,
+            conversation_context.updated_at.timestamp(),
+        )
+        self._after_save(session_id, conversation_context, saved)
+
+    @staticmethod
+    def _after_save(session_id: str, conversation_context: ConversationContext, saved: bool):
+        if not saved:
+            metrics_registry.counter(
+                "conversation_version_conflict_total", "conversations updated concurrently by another request"
+            ).inc()
+            raise ConversationVersionConflictException(session_id, conversation_context.version)
+        conversation_context.version += 1
+
+    @staticmethod
+    def _from_record(record: Optional[tuple[bytes, int]]) -> Optional[ConversationContext]:
+        if record is None:
+            return None
+        data, version = record
+        conversation = deserialize_conversation(data)
+        conversation.version = version
+        return conversation
+
+    def _load_stored_conversation(self, session_id: str) -> Optional[ConversationContext]:
+        return self._from_record(self.store.load(session_id) if session_id else None)
+
+    async def _aload_stored_conversation(self, session_id: str) -> Optional[ConversationContext]:
+        return self._from_record(await asyncio.to_thread(self.store.load, session_id) if session_id else None)
+
+    @staticmethod
+    def _loaded(session_id: str, conversation: Optional[ConversationContext]) -> ConversationContext:
+        if conversation is None:
+            return ConversationContext(current_user_input="", session_id=session_id)
+        logger.info(f"session_id is {session_id}")
+        conversation.updated_at = datetime.now()
+        return conversation
+
+    def load_conversation(self, session_id: str) -> ConversationContext:
+        return self._loaded(session_id, self._load_stored_conversation(session_id))
+
+    async def aload_conversation(self, session_id: str) -> ConversationContext:
+        return self._loaded(session_id, await self._aload_stored_conversation(session_id))
+
+    @staticmethod
+    def _install_summary(stored_conversation: ConversationContext, conversation_context: ConversationContext):
+        stored_conversation.install_summarized_history(conversation_context.summarized_history_context, [])
+        stored_conversation.history.flag_matching_rounds_summarized(
+            [one_round for one_round in conversation_context.history.rounds if one_round.summarized]
+        )
+
+    def save_summarized_history(self, conversation_context: ConversationContext):
+        stored_conversation = self._load_stored_conversation(conversation_context.session_id)
+        if stored_conversation is None:
+            return
+        self._install_summary(stored_conversation, conversation_context)
+        self.save_conversation(stored_conversation.session_id, stored_conversation)
+
+    async def asave_summarized_history(self, conversation_context: ConversationContext):
+        stored_conversation = await self._aload_stored_conversation(conversation_context.session_id)
+        if stored_conversation is None:
+            return
+        self._install_summary(stored_conversation, conversation_context)
+        await self.asave_conversation(stored_conversation.session_id, stored_conversation)
+
+    def pop_inactive_session_ids(self) -> list[str]:
+        session_ids = self.store.pop_expired((datetime.now() - self.inactive_timeout).timestamp())
+        for session_id in session_ids:
+            logger.info(f"clear history for {session_id}")
+        return session_ids
+
+    def clear_inactive_conversations(self):
+        for session_id in self.pop_inactive_session_ids():
+            ConversationFiles(session_id).delete_files()
+
+    async def sweep_inactive_conversations(self):
+        session_ids = await asyncio.to_thread(self.pop_inactive_session_ids)
+        if session_ids:
+            metrics_registry.counter(
+                "inactive_conversations_cleared_total", "conversations cleared by the sweeper"
+            ).inc(len(session_ids))
+            await asyncio.to_thread(
+                lambda: [ConversationFiles(session_id).delete_files() for session_id in session_ids]
+            )
+        metrics_registry.gauge("active_conversations", "conversations kept in memory").set(
+            await asyncio.to_thread(self.store.count)
+        )
+
+    async def shutdown(self):
+        await super().shutdown()
+        self.store.close()
+
+
+def create_conversation_tracker(backend: str = conversation_tracker_backend) -> ConversationTracker:
+    if backend == "sqlite":
+        os.makedirs(os.path.dirname(os.path.abspath(conversation_tracker_sqlite_path)), exist_ok=True)
+        return PersistentConversationTracker(SqliteConversationStore(conversation_tracker_sqlite_path))
+    if backend == "redis":
+        return PersistentConversationTracker(RedisConversationStore.from_url(conversation_tracker_redis_url))
+    if backend != "memory":
+        raise ValueError(f"unknown conversation tracker backend: {backend}")
+    return BaseConversationTracker()
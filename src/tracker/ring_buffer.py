@@ -0,0 +1,79 @@
+from typing import Generic, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+class RingBuffer(Generic[T]):
+    """
+    Bounded sequence with O(1) append and eviction of the oldest item.
+
+    A deque allocates a block of 64 slots even for a few items, this keeps exactly maxlen slots, which matters when
+    thousands of conversations each keep a short history.
+    """
+
+    __slots__ = ("items", "start", "size")
+
+    def __init__(self, iterable: Iterable[T] = (), maxlen: int = 9):
+        if maxlen <= 0:
+            raise ValueError("maxlen should be positive")
+        self.items: list = [None] * maxlen
+        self.start = 0
+        self.size = 0
+        for item in iterable:
+            self.append(item)
+
+    @property
+    def maxlen(self) -> int:
+        return len(self.items)
+
+    def _index(self, index: int) -> int:
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("ring buffer index out of range")
+        return (self.start + index) % len(self.items)
+
+    def append(self, item: T):
+        capacity = len(self.items)
+        if self.size == capacity:
+            # full, overwrite the oldest item
+            self.items[self.start] = item
+            self.start = (self.start + 1) % capacity
+        else:
+            self.items[(self.start + self.size) % capacity] = item
+            self.size += 1
+
+    def pop(self) -> T:
+        index = self._index(-1)
+        item, self.items[index] = self.items[index], None
+        self.size -= 1
+        return item
+
+    def popleft(self) -> T:
+        index = self._index(0)
+        item, self.items[index] = self.items[index], None
+        self.start = (self.start + 1) % len(self.items)
+        self.size -= 1
+        return item
+
+    def __getitem__(self, index: int) -> T:
+        return self.items[self._index(index)]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[T]:
+        for index in range(self.size):
+            yield self.items[(self.start + index) % len(self.items)]
+
+    def __reversed__(self) -> Iterator[T]:
+        for index in range(self.size - 1, -1, -1):
+            yield self.items[(self.start + index) % len(self.items)]
+
+    def __eq__(self, other):
+        if not isinstance(other, RingBuffer):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return f"RingBuffer({list(self)}, maxlen={self.maxlen})"
@@ -0,0 +1,96 @@
+import json
+import zlib
+from datetime import datetime
+from typing import Any, Optional
+
+from nlu.intent_with_entity import Entity, Intent, Slot
+from tracker.context import ConversationContext, History
+from tracker.ring_buffer import RingBuffer
+
+SERIALIZATION_FORMAT_VERSION = 1
+# payloads smaller than this are stored as plain json, compressing them does not pay off
+COMPRESSION_THRESHOLD = 512
+PLAIN_PREFIX = b"j"
+COMPRESSED_PREFIX = b"z"
+
+
+def _dump_model(model) -> Optional[dict]:
+    return model.model_dump(mode="json", exclude_none=True) if model is not None else None
+
+
+def _load_model(model_class, data: Optional[dict]):
+    return model_class.model_validate(data) if data is not None else None
+
+
+def conversation_to_dict(conversation: ConversationContext) -> dict[str, Any]:
+    return {
+        "format": SERIALIZATION_FORMAT_VERSION,
+        "session_id": conversation.session_id,
+        "is_email_request": conversation.is_email_request,
+        "current_user_input": conversation.current_user_input,
+        "current_new_request": conversation.current_new_request,
+        "current_intent": _dump_model(conversation.current_intent),
+        "current_intent_slots": [_dump_model(slot) for slot in conversation.current_intent_slots],
+        "intent_queue": [_dump_model(intent) for intent in conversation.intent_queue],
+        "history": conversation.history.to_dicts(),
+        "max_history": conversation.history.max_history,
+        "summarized_history_context": conversation.summarized_history_context,
+        "status": conversation.status,
+        "state": conversation.state,
+        "entities": [_dump_model(entity) for entity in conversation.entities],
+        "created_at": conversation.created_at.timestamp(),
+        "updated_at": conversation.updated_at.timestamp(),
+        "inquiry_times": conversation.inquiry_times,
+        "has_update": conversation.has_update,
+        "current_round": conversation.current_round,
+        "filenames": conversation.files.filenames,
+        "uploaded_file_urls": conversation.uploaded_file_urls,
+        "confused_intents": [_dump_model(intent) for intent in conversation.confused_intents],
+        "appended_history_count_in_one_chat": conversation.appended_history_count_in_one_chat,
+        "start_new_question": conversation.start_new_question,
+    }
+
+
+def conversation_from_dict(data: dict[str, Any]) -> ConversationContext:
+    if data.get("format") != SERIALIZATION_FORMAT_VERSION:
+        raise ValueError(f"unsupported conversation format: {data.get('format')}")
+    conversation = ConversationContext(data["current_user_input"], data["session_id"])
+    conversation.is_email_request = data["is_email_request"]
+    conversation.current_new_request = data["current_new_request"]
+    conversation.current_intent = _load_model(Intent, data["current_intent"])
+    conversation.current_intent_slots = [_load_model(Slot, slot) for slot in data["current_intent_slots"]]
+    conversation.intent_queue = RingBuffer(
+        [_load_model(Intent, intent) for intent in data["intent_queue"]], maxlen=conversation.intent_queue.maxlen
+    )
+    conversation.history = History(data["history"], data["max_history"])
+    conversation.summarized_history_context = data["summarized_history_context"]
+    conversation.status = data["status"]
+    conversation.state = data["state"]
+    conversation.entities = [_load_model(Entity, entity) for entity in data["entities"]]
+    conversation.created_at = datetime.fromtimestamp(data["created_at"])
+    conversation.updated_at = datetime.fromtimestamp(data["updated_at"])
+    conversation.inquiry_times = data["inquiry_times"]
+    conversation.has_update = data["has_update"]
+    conversation.current_round = data["current_round"]
+    conversation.files.filenames = data["filenames"]
+    conversation.uploaded_file_urls = data["uploaded_file_urls"]
+    conversation.confused_intents = [_load_model(Intent, intent) for intent in data["confused_intents"]]
+    conversation.appended_history_count_in_one_chat = data["appended_history_count_in_one_chat"]
+    conversation.start_new_question = data["start_new_question"]
+    return conversation
+
+
+def serialize_conversation(conversation: ConversationContext) -> bytes:
+    payload = json.dumps(conversation_to_dict(conversation), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(payload) < COMPRESSION_THRESHOLD:
+        return PLAIN_PREFIX + payload
+    return COMPRESSED_PREFIX + zlib.compress(payload)
+
+
+def deserialize_conversation(data: bytes) -> ConversationContext:
+    prefix, payload = data[:1], data[1:]
+    if prefix == COMPRESSED_PREFIX:
+        payload = zlib.decompress(payload)
+    elif prefix != PLAIN_PREFIX:
+        raise ValueError(f"unknown conversation payload prefix: {prefix!r}")
+    return conversation_from_dict(json.loads(payload))
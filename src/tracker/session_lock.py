@@ -0,0 +1,90 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from loguru import logger
+
+from metrics.base import metrics_registry
+from metrics.tracing import trace_span
+
+session_lock_timeout = float(os.getenv("SESSION_LOCK_TIMEOUT_SECONDS", 120))
+
+
+class SessionBusyException(Exception):
+    def __init__(self, session_id: str, timeout: float):
+        self.session_id = session_id
+        self.timeout = timeout
+        super().__init__(f"session {session_id} is still busy after waiting {timeout} seconds")
+
+
+class _SessionLock:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # requests holding or waiting for the lock, the entry is dropped when it reaches 0
+        self.users = 0
+
+
+class SessionLockManager:
+    """
+    Serialize requests of the same session, requests of different sessions still run concurrently.
+
+    asyncio.Lock wakes up waiters in FIFO order, so requests of one session are handled in arrival order.
+    """
+
+    def __init__(self, timeout: float = session_lock_timeout):
+        self.timeout = timeout
+        self.locks: dict[str, _SessionLock] = {}
+
+    @asynccontextmanager
+    async def lock(self, session_id: str):
+        if not session_id:
+            # a new session, nobody else can use it yet
+            yield
+            return
+
+        session_lock = self.locks.setdefault(session_id, _SessionLock())
+        session_lock.users += 1
+        try:
+            if session_lock.lock.locked():
+                metrics_registry.counter(
+                    "session_lock_contention_total", "requests waiting for the same session"
+                ).inc()
+                logger.info(f"session {session_id} is busy, waiting for the previous request")
+            try:
+                with trace_span("session_lock_wait"):
+                    await self._acquire(session_lock.lock)
+            except asyncio.TimeoutError:
+                metrics_registry.counter("session_lock_timeout_total", "requests gave up waiting for the session").inc()
+                raise SessionBusyException(session_id, self.timeout)
+            try:
+                yield
+            finally:
+                session_lock.lock.release()
+        finally:
+            session_lock.users -= 1
+            if session_lock.users == 0:
+                self.locks.pop(session_id, None)
+
+    async def _acquire(self, lock: asyncio.Lock):
+        """
+        Acquire the lock within the timeout.
+
+        The acquire runs in its own task, when the wait is given up, on timeout or cancellation, the lock is released
+        again if the task got it anyway. wait_for before python 3.12 may lose a lock acquired as the timeout fires.
+        """
+        acquiring = asyncio.ensure_future(lock.acquire())
+        try:
+            await asyncio.wait_for(asyncio.shield(acquiring), self.timeout)
+        except BaseException:
+            acquiring.cancel()
+            acquiring.add_done_callback(lambda task: _release_if_acquired(lock, task))
+            raise
+
+    def active_requests(self, session_id: str) -> int:
+        session_lock = self.locks.get(session_id)
+        return session_lock.users if session_lock else 0
+
+
+def _release_if_acquired(lock: asyncio.Lock, acquiring: asyncio.Future):
+    if not acquiring.cancelled() and acquiring.exception() is None:
+        lock.release()
@@ -0,0 +1,148 @@
+import sqlite3
+import threading
+from typing import Optional
+
+from loguru import logger
+
+
+class ConversationStore:
+    """
+    Key value storage of serialized conversations shared by all workers.
+
+    Every record carries a version which is increased by each write, compare_and_set only writes when the stored
+    version still equals the version the conversation was loaded with.
+    """
+
+    def load(self, session_id: str) -> Optional[tuple[bytes, int]]:
+        raise NotImplementedError
+
+    def compare_and_set(self, session_id: str, data: bytes, expected_version: int, updated_at: float) -> bool:
+        raise NotImplementedError
+
+    def pop_expired(self, cutoff: float) -> list[str]:
+        """delete conversations not updated since cutoff and return their session ids"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SqliteConversationStore(ConversationStore):
+    def __init__(self, path: str, timeout: float = 30):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        # WAL lets the workers read while another worker writes
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "session_id TEXT PRIMARY KEY, data BLOB NOT NULL, version INTEGER NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations (updated_at)")
+
+    def load(self, session_id: str) -> Optional[tuple[bytes, int]]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT data, version FROM conversations WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return (bytes(row[0]), row[1]) if row else None
+
+    def compare_and_set(self, session_id: str, data: bytes, expected_version: int, updated_at: float) -> bool:
+        with self.lock:
+            if expected_version == 0:
+                cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO conversations (session_id, data, version, updated_at) VALUES (?, ?, 1, ?)",
+                    (session_id, data, updated_at),
+                )
+            else:
+                cursor = self.connection.execute(
+                    "UPDATE conversations SET data = ?, version = version + 1, updated_at = ? "
+                    "WHERE session_id = ? AND version = ?",
+                    (data, updated_at, session_id, expected_version),
+                )
+        return cursor.rowcount == 1
+
+    def pop_expired(self, cutoff: float) -> list[str]:
+        with self.lock:
+            rows = self.connection.execute(
+                "DELETE FROM conversations WHERE updated_at < ? RETURNING session_id", (cutoff,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def count(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class RedisConversationStore(ConversationStore):
+    """
+    Store conversations in any server speaking the redis protocol, the client should follow the redis-py api.
+
+    Writers claim the next version with SET NX before writing, so only one of the writers which loaded the same
+    version succeeds. The claim is deleted once written, a later claim of the same version then sees the stored
+    version and fails. A claim expires after claim_ttl seconds in case its writer dies before deleting it.
+    """
+
+    def __init__(self, client, key_prefix: str = "conversation", ttl: int = 24 * 60 * 60, claim_ttl: int = 60):
+        self.client = client
+        self.key_prefix = key_prefix
+        self.ttl = ttl
+        self.claim_ttl = claim_ttl
+        self.index_key = f"{key_prefix}:updated_at"
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisConversationStore":
+        # optional dependency, install the redis extra
+        import redis
+
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.key_prefix}:{session_id}"
+
+    def load(self, session_id: str) -> Optional[tuple[bytes, int]]:
+        value = self.client.get(self._key(session_id))
+        if value is None:
+            return None
+        version, data = value.split(b":", 1)
+        return data, int(version)
+
+    def compare_and_set(self, session_id: str, data: bytes, expected_version: int, updated_at: float) -> bool:
+        key = self._key(session_id)
+        new_version = expected_version + 1
+        claim_key = f"{key}:claim:{new_version}"
+        if not self.client.set(claim_key, 1, nx=True, ex=self.claim_ttl):
+            return False
+        try:
+            current = self.load(session_id)
+            if (current[1] if current else 0) != expected_version:
+                logger.warning(f"claimed version {new_version} of session {session_id} which was already written")
+                return False
+            self.client.set(key, str(new_version).encode() + b":" + data, ex=self.ttl)
+            self.client.zadd(self.index_key, {session_id: updated_at})
+            return True
+        finally:
+            self.client.delete(claim_key)
+
+    def pop_expired(self, cutoff: float) -> list[str]:
+        expired_session_ids = []
+        for session_id in self.client.zrangebyscore(self.index_key, "-inf", f"({cutoff}"):
+            session_id = session_id.decode() if isinstance(session_id, bytes) else session_id
+            # only the worker removing the index entry deletes the conversation
+            if self.client.zrem(self.index_key, session_id):
+                self.client.delete(self._key(session_id))
+                expired_session_ids.append(session_id)
+        return expired_session_ids
+
+    def count(self) -> int:
+        return self.client.zcard(self.index_key)
+
+    def close(self):
+        self.client.close()
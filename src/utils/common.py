@@ -9,6 +9,9 @@ from loguru import logger
 
 from third_system.search_entity import SearchResponse
 
+# texts of intent examples sent or embedded per request
+intent_example_sync_batch_size = int(os.getenv("INTENT_EXAMPLE_SYNC_BATCH_SIZE", 100))
+
 
 def get_value_or_default_from_dict(dictionary, key, default_value=None):
     return dictionary[key] if key in dictionary else default_value
@@ -113,6 +116,11 @@ def generate_tmp_dir(current_dir: str):
     return os.path.join(os.path.dirname(__file__), "../../", "tmp", current_dir)
 
 
+def batches(items: list, batch_size: int):
+    for start in range(0, len(items), batch_size):
+        yield items[start : start + batch_size]
+
+
 def get_config_path():
     return os.path.join(os.path.dirname(__file__), "../", "config.ini")
 
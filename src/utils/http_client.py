@@ -0,0 +1,69 @@
+import asyncio
+import os
+import weakref
+from typing import Optional
+
+import aiohttp
+from loguru import logger
+
+http_connection_limit = int(os.getenv("HTTP_CONNECTION_LIMIT", 256))
+http_connection_limit_per_host = int(os.getenv("HTTP_CONNECTION_LIMIT_PER_HOST", 32))
+http_dns_cache_ttl = int(os.getenv("HTTP_DNS_CACHE_TTL_SECONDS", 300))
+http_connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", 10))
+# between two reads of the response, a streamed answer may take long in total
+http_read_timeout = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", 300))
+
+
+class HttpClientRegistry:
+    """
+    Application lifetime aiohttp sessions, one per name and event loop, so connections and TLS sessions are reused.
+
+    Every session pools at most connection_limit_per_host connections per host and caches dns lookups. Requests may
+    still pass their own timeout. close() the registry on shutdown, see the lifespan of app.py.
+    """
+
+    def __init__(
+        self,
+        connection_limit: int = http_connection_limit,
+        connection_limit_per_host: int = http_connection_limit_per_host,
+        dns_cache_ttl: int = http_dns_cache_ttl,
+        connect_timeout: float = http_connect_timeout,
+        read_timeout: float = http_read_timeout,
+    ):
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = aiohttp.ClientTimeout(total=None, connect=connect_timeout, sock_read=read_timeout)
+        # sessions belong to the loop they were created in, the emailbot process and tests run their own loops
+        self.sessions: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, aiohttp.ClientSession]] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def get_session(self, name: str = "default") -> aiohttp.ClientSession:
+        sessions = self.sessions.setdefault(asyncio.get_running_loop(), {})
+        session: Optional[aiohttp.ClientSession] = sessions.get(name)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                limit_per_host=self.connection_limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+            )
+            session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            sessions[name] = session
+        return session
+
+    async def close(self):
+        """close the sessions of the running loop"""
+        sessions = self.sessions.pop(asyncio.get_running_loop(), {})
+        for name, session in sessions.items():
+            if not session.closed:
+                await session.close()
+        if sessions:
+            logger.info(f"closed http sessions: {list(sessions)}")
+
+
+http_client_registry = HttpClientRegistry()
+
+
+def get_http_session(name: str = "default") -> aiohttp.ClientSession:
+    return http_client_registry.get_session(name)
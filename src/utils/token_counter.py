@@ -0,0 +1,37 @@
+import os
+from functools import lru_cache
+
+from loguru import logger
+
+# the docker image sets it to the copied tiktoken_cache, fall back to the one in the repo so that no download happens
+os.environ.setdefault(
+    "TIKTOKEN_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "tiktoken_cache")
+)
+
+import tiktoken  # noqa: E402
+
+default_history_token_budget = int(os.getenv("HISTORY_TOKEN_BUDGET", 3000))
+# role and separators added around every round when the history is formatted
+ROUND_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=1)
+def get_encoding() -> tiktoken.Encoding:
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return len(get_encoding().encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """keep the beginning of text within max_tokens"""
+    if max_tokens <= 0:
+        return ""
+    tokens = get_encoding().encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    logger.info(f"truncate text from {len(tokens)} to {max_tokens} tokens")
+    return get_encoding().decode(tokens[:max_tokens])
@@ -0,0 +1,61 @@
+import json
+import sqlite3
+import time
+
+from caches.lru import CACHE_REQUESTS_METRIC, LRUTTLCache
+from metrics.base import metrics_registry
+
+
+def test_least_recently_used_entry_should_be_evicted():
+    cache = LRUTTLCache("test_lru", maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+
+def test_expired_entry_should_be_missed(mocker):
+    cache = LRUTTLCache("test_ttl", maxsize=2, ttl=10)
+    cache.set("a", 1)
+    mocker.patch("caches.lru.time.time", return_value=time.time() + 11)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_hits_and_misses_should_be_counted():
+    cache = LRUTTLCache("test_counter", maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+
+    assert metrics_registry.counter(CACHE_REQUESTS_METRIC, cache="test_counter", result="hit").value == 1
+    assert metrics_registry.counter(CACHE_REQUESTS_METRIC, cache="test_counter", result="miss").value == 1
+
+
+def persisted_keys(path) -> list:
+    with sqlite3.connect(path) as connection:
+        return sorted(json.loads(key) for key, in connection.execute("SELECT key FROM cache_entries"))
+
+
+def test_persisted_entries_should_be_written_in_batches_without_evicted_ones(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = LRUTTLCache("test_persisted", maxsize=2, ttl=60, persist_path=path, flush_interval=60)
+    cache.set("a", 1)
+    cache.flush()
+    cache.set("b", 2)
+    cache.set("c", 3)
+
+    assert persisted_keys(path) == ["a"]
+    cache.close()
+    assert persisted_keys(path) == ["b", "c"]
+
+    reloaded = LRUTTLCache("test_persisted", maxsize=2, ttl=60, persist_path=path)
+    assert (reloaded.get("a"), reloaded.get("b"), reloaded.get("c")) == (None, 2, 3)
+    reloaded.clear()
+    reloaded.close()
+    assert persisted_keys(path) == []
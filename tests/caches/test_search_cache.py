@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from third_system.search_cache import SearchResultCache, canonicalize_search_param
+from third_system.search_entity import SearchParam, SearchParamFilter
+from third_system.unified_search import UnifiedSearch
+from utils.http_client import http_client_registry
+
+
+@pytest.fixture
+async def search_service():
+    requests = []
+
+    async def search(request: web.Request) -> web.Response:
+        requests.append(await request.json())
+        await asyncio.sleep(0.01)
+        return web.json_response([{"items": [{"meta__score": 0.9, "text": f"result {len(requests)}"}]}])
+
+    async def vector_search(request: web.Request) -> web.Response:
+        requests.append(await request.json())
+        return web.json_response({"items": [{"meta__score": 0.8, "text": f"result {len(requests)}"}]})
+
+    async def bulk_search(request: web.Request) -> web.Response:
+        if request.headers["conversation-id"] == "before bulk search":
+            raise web.HTTPNotFound()
+        searches = (await request.json())["searches"]
+        requests.append(searches)
+        results = [[{"items": [{"meta__score": 0.9, "text": search["query"]}]}] for search in searches]
+        return web.json_response({"results": results})
+
+    async def intent_examples(request: web.Request) -> web.Response:
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post("/search", search)
+    app.router.add_post("/search/bulk", bulk_search)
+    app.router.add_post("/vector/{table}/search/", vector_search)
+    app.router.add_post("/vector/{table}/intent_examples", intent_examples)
+    server = TestServer(app)
+    await server.start_server()
+    unified_search = UnifiedSearch(SearchResultCache(maxsize=10, ttl=60))
+    unified_search.base_url = str(server.make_url("")).rstrip("/")
+    yield unified_search, requests
+    await http_client_registry.close()
+    await server.close()
+
+
+def test_equivalent_search_params_should_have_the_same_canonical_form():
+    first = SearchParam(
+        query="confirmation  price of crr",
+        filters=[SearchParamFilter(field="a", op="eq", value="1"), SearchParamFilter(field="b", op="eq", value="2")],
+    )
+    second = SearchParam(
+        query=" confirmation price of crr ",
+        tags=None,
+        filters=[SearchParamFilter(field="b", op="eq", value="2"), SearchParamFilter(field="a", op="eq", value="1")],
+    )
+
+    assert canonicalize_search_param(first) == canonicalize_search_param(second)
+    assert canonicalize_search_param(first) != canonicalize_search_param(SearchParam(query="confirmation price", k=2))
+
+
+async def test_concurrent_identical_searches_should_share_one_call(search_service):
+    unified_search, requests = search_service
+
+    results = await asyncio.gather(
+        *(unified_search.search(SearchParam(query="search the confirmation price crr"), f"c{i}") for i in range(5))
+    )
+    again = await unified_search.search(SearchParam(query="search the confirmation  price crr"), "c5")
+    other_tags = await unified_search.search(
+        SearchParam(query="search the confirmation price crr", tags={"product_line": "BR extension"}), "c6"
+    )
+
+    assert len(requests) == 2
+    assert all(result == results[0] for result in results + [again])
+    assert results[0][0].items[0].text == "result 1"
+    assert other_tags[0].items[0].text == "result 2"
+
+
+async def test_writing_examples_should_invalidate_only_their_table(search_service):
+    unified_search, requests = search_service
+    param = SearchParam(query="claim my money")
+
+    await unified_search.vector_search(param, "intent_examples")
+    await unified_search.vector_search(param, "training_doc")
+    await unified_search.add_intents_examples("intent_examples", [{"example": "claim my money"}])
+    refreshed = await unified_search.vector_search(param, "intent_examples")
+    cached = await unified_search.vector_search(param, "training_doc")
+
+    assert len(requests) == 3
+    assert refreshed[0].items[0].text == "result 3"
+    assert cached[0].items[0].text == "result 2"
+
+
+async def test_failed_searches_should_not_be_cached(search_service):
+    unified_search, requests = search_service
+    base_url = unified_search.base_url
+    unified_search.base_url = f"{base_url}/missing"
+
+    assert await unified_search.search(SearchParam(query="claim my money"), "c1") == []
+
+    unified_search.base_url = base_url
+    assert await unified_search.search(SearchParam(query="claim my money"), "c2") != []
+
+
+async def test_bulk_search_should_return_results_in_order_with_chunked_requests(search_service):
+    unified_search, requests = search_service
+    await unified_search.search(SearchParam(query="question 0"), "c1")
+
+    questions = ["question 1", "question 0", "question 2", "question 1", "question 3", "question 4"]
+    results = await unified_search.bulk_search([SearchParam(query=q) for q in questions], "c2", chunk_size=2)
+
+    assert [result[0].items[0].text for result in results] == ["question 1", "result 1"] + questions[2:]
+    # question 0 is cached and question 1 searched once
+    assert sorted(len(request) for request in requests[1:]) == [2, 2]
+    assert await unified_search.search(SearchParam(query="question 4"), "c3") == results[-1]
+    assert len(requests) == 3
+
+
+async def test_bulk_search_should_fall_back_to_single_searches(search_service):
+    unified_search, requests = search_service
+
+    results = await unified_search.bulk_search(
+        [SearchParam(query="a"), SearchParam(query="b")], "before bulk search", chunk_size=5
+    )
+
+    assert sorted(request["query"] for request in requests) == ["a", "b"]
+    assert all(result[0].items for result in results)
+    assert await unified_search.bulk_search([SearchParam(query="a")], "c1") == results[:1]
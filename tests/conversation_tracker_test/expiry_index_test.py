@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+from tracker.base import BaseConversationTracker
+from tracker.context import ConversationContext
+from tracker.expiry_index import ExpiryIndex
+
+
+def test_touch_should_move_session_to_latest_bucket():
+    index = ExpiryIndex(bucket_seconds=60)
+    now = datetime.now()
+    index.touch("session", now - timedelta(hours=2))
+    index.touch("session", now)
+
+    assert index.candidates(now - timedelta(hours=1)) == []
+    assert len(index.buckets) == 1
+
+
+def test_candidates_should_contain_sessions_older_than_cutoff():
+    index = ExpiryIndex(bucket_seconds=60)
+    now = datetime.now()
+    index.touch("old", now - timedelta(hours=2))
+    index.touch("new", now)
+
+    assert index.candidates(now - timedelta(hours=1)) == ["old"]
+    index.remove("old")
+    assert index.candidates(now - timedelta(hours=1)) == []
+    assert len(index) == 1
+
+
+async def test_sweep_should_only_clear_inactive_conversations():
+    tracker = BaseConversationTracker()
+    tracker.save_conversation("inactive", ConversationContext("Hi", "inactive"))
+    tracker.save_conversation("active", ConversationContext("Hi", "active"))
+    tracker.conversation_caches["inactive"].updated_at = datetime.now() - timedelta(hours=25)
+
+    await tracker.sweep_inactive_conversations()
+
+    assert list(tracker.conversation_caches) == ["active"]
+    assert len(tracker.expiry_index) == 1
@@ -0,0 +1,46 @@
+import asyncio
+
+from tracker.HistorySummarizer import HistorySummarizationWorker
+from tracker.context import ConversationContext
+
+
+class SlowSummarizer:
+    def __init__(self):
+        self.calls = 0
+
+    async def summarize_history(self, conversation: ConversationContext):
+        self.calls += 1
+        history = conversation.get_unsummarized_history()
+        await asyncio.sleep(0.01)
+        conversation.install_summarized_history(f"summary {self.calls}", history)
+        return conversation
+
+
+async def test_pending_summarizations_of_one_session_should_be_coalesced():
+    summarizer = SlowSummarizer()
+    worker = HistorySummarizationWorker(summarizer)
+    conversation = ConversationContext("", "session")
+    conversation.append_user_history("hello")
+
+    worker.schedule(conversation)
+    # let the first run start, the requests scheduled while it runs are merged into one trailing run
+    await asyncio.sleep(0)
+    for _ in range(4):
+        worker.schedule(conversation)
+    await worker.shutdown()
+
+    assert summarizer.calls == 2
+    assert conversation.summarized_history_context == "summary 2"
+    assert worker.running_tasks == {}
+
+
+def test_rounds_appended_while_summarizing_should_stay_unsummarized():
+    conversation = ConversationContext("", "session")
+    conversation.append_user_history("first")
+    history = conversation.get_unsummarized_history()
+    conversation.append_assistant_history(None)
+
+    conversation.install_summarized_history("summary", history)
+
+    assert conversation.summarized_history_context == "summary"
+    assert [one_round["content"] for one_round in conversation.get_unsummarized_history()] == ["Jump out"]
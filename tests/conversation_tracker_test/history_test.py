@@ -0,0 +1,98 @@
+import pytest
+
+from tracker.context import History, HistoryRound
+from tracker.ring_buffer import RingBuffer
+from utils.token_counter import count_tokens
+
+
+def test_ring_buffer_should_evict_oldest_item_when_full():
+    buffer = RingBuffer(range(5), maxlen=3)
+
+    assert list(buffer) == [2, 3, 4]
+    assert list(reversed(buffer)) == [4, 3, 2]
+    assert (buffer[0], buffer[-1]) == (2, 4)
+    assert buffer.pop() == 4
+    assert buffer.popleft() == 2
+    buffer.append(5)
+    assert list(buffer) == [3, 5]
+    with pytest.raises(IndexError):
+        buffer[2]
+
+
+def test_history_should_keep_latest_rounds():
+    history = History([{"role": "user", "content": str(index), "file_name": None} for index in range(12)])
+
+    history.add_history("assistant", "answer")
+
+    assert len(history.rounds) == 9
+    assert history.get_latest() == "answer"
+    assert history.rounds[0]["content"] == "4"
+    history.keep_latest_n_rounds(2)
+    assert [one_round.content for one_round in history.rounds] == ["11", "answer"]
+
+
+def test_history_views_should_be_refreshed_after_rounds_change():
+    history = History([])
+    history.add_history("user", "hi", "a.xlsx")
+
+    assert history.format_string() is history.format_string()
+    assert history.format_messages() == [{"role": "user", "content": "hi"}]
+    assert history.format_string({"user": "human"}) == "### human:\n hi"
+
+    history.add_history("assistant", "hello")
+    history.delete_n_round(1)
+    history.add_history("assistant", "welcome")
+
+    assert history.format_string() == "### user:\n hi\n### assistant:\n welcome"
+    assert history.format_string_with_file_name() == "user: hi (with file name :a.xlsx)\nassistant: welcome "
+
+
+def test_flag_history_summarized_should_only_flag_latest_rounds():
+    history = History([HistoryRound("user", "1"), HistoryRound("assistant", "2"), HistoryRound("user", "3")])
+
+    history.flag_history_summarized(2)
+
+    assert history.to_dicts() == [
+        {"role": "user", "content": "1", "file_name": None},
+        {"role": "assistant", "content": "2", "file_name": None, "summarized": True},
+        {"role": "user", "content": "3", "file_name": None, "summarized": True},
+    ]
+
+
+def test_budgeted_views_should_keep_newest_rounds_within_budget():
+    history = History([])
+    history.add_history("user", "old question " * 50)
+    history.add_history("assistant", "old answer")
+    history.add_history("user", "new question")
+
+    rounds = history.latest_rounds_within(20)
+
+    assert [one_round.content for one_round in rounds] == ["old answer", "new question"]
+    assert history.format_messages(20) == [
+        {"role": "assistant", "content": "old answer"},
+        {"role": "user", "content": "new question"},
+    ]
+    assert len(history.format_messages()) == 3
+
+
+def test_budgeted_views_should_truncate_newest_round_exceeding_budget():
+    history = History([])
+    history.add_history("user", "pasted document " * 1000, "doc.txt")
+
+    view = history.format_string_with_file_name(token_budget=54)
+
+    assert count_tokens(view) < 70
+    assert view.startswith("user: pasted document")
+    assert history.rounds[0].content == "pasted document " * 1000
+
+
+def test_round_should_be_tokenized_once(mocker):
+    history = History([])
+    history.add_history("user", "hello")
+    count_tokens_spy = mocker.patch("tracker.context.count_tokens", return_value=1)
+
+    history.format_messages(100)
+    history.add_history("assistant", "hi")
+    history.format_messages(100)
+
+    assert count_tokens_spy.call_count == 2
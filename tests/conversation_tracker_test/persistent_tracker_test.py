@@ -0,0 +1,208 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from nlu.intent_with_entity import Entity, Intent, Slot, SlotType
+from tracker.base import ConversationVersionConflictException
+from tracker.context import ConversationContext
+from tracker.persistent import PersistentConversationTracker
+from tracker.serializer import deserialize_conversation, serialize_conversation
+from tracker.store import RedisConversationStore, SqliteConversationStore
+
+
+class LocalRedis:
+    """local stand-in of a redis server, supporting the commands used by RedisConversationStore"""
+
+    def __init__(self):
+        self.values = {}
+        self.expires_at = {}
+        self.sorted_sets = {}
+
+    def _expire(self, name):
+        if name in self.expires_at and self.expires_at[name] <= time.time():
+            self.values.pop(name, None)
+            self.expires_at.pop(name)
+
+    def get(self, name):
+        self._expire(name)
+        return self.values.get(name)
+
+    def set(self, name, value, nx=False, ex=None):
+        self._expire(name)
+        if nx and name in self.values:
+            return None
+        self.values[name] = value if isinstance(value, bytes) else str(value).encode()
+        if ex:
+            self.expires_at[name] = time.time() + ex
+        return True
+
+    def delete(self, *names):
+        return sum(self.values.pop(name, None) is not None for name in names)
+
+    def zadd(self, name, mapping):
+        self.sorted_sets.setdefault(name, {}).update(mapping)
+
+    def zrangebyscore(self, name, min_score, max_score):
+        upper = float(max_score.lstrip("("))
+        members = self.sorted_sets.get(name, {})
+        return [member.encode() for member, score in sorted(members.items(), key=lambda item: item[1]) if score < upper]
+
+    def zrem(self, name, *members):
+        return sum(self.sorted_sets.get(name, {}).pop(member, None) is not None for member in members)
+
+    def zcard(self, name):
+        return len(self.sorted_sets.get(name, {}))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        store = SqliteConversationStore(str(tmp_path / "conversations.db"))
+    else:
+        store = RedisConversationStore(LocalRedis())
+    yield store
+    store.close()
+
+
+def create_conversation(session_id="session") -> ConversationContext:
+    conversation = ConversationContext("需要查询订单", session_id)
+    slot = Slot(name="order_id", description="order id", slot_type=SlotType.TEXT)
+    intent = Intent(name="query_order", description="query order", confidence=0.9, examples=["查订单"])
+    conversation.current_intent = intent
+    conversation.current_intent_slots = [slot]
+    conversation.intent_queue.append(intent)
+    conversation.entities = [Entity(type="order_id", value="123", confidence=0.8, possible_slot=slot)]
+    conversation.append_user_history("需要查询订单", "order.xlsx")
+    conversation.summarized_history_context = "summary"
+    conversation.set_state("slot_filling:order_id")
+    conversation.add_file_urls(["http://files/order.xlsx"])
+    return conversation
+
+
+def test_serialize_should_keep_conversation_state():
+    conversation = create_conversation()
+
+    restored = deserialize_conversation(serialize_conversation(conversation))
+
+    assert restored.session_id == "session"
+    assert restored.current_intent == conversation.current_intent
+    assert restored.current_intent_slots[0].slot_type == SlotType.TEXT
+    assert list(restored.intent_queue) == [conversation.current_intent]
+    assert restored.intent_queue.maxlen == 3
+    assert restored.entities[0].possible_slot.name == "order_id"
+    assert restored.history.rounds == conversation.history.rounds
+    assert restored.summarized_history_context == "summary"
+    assert restored.state == "slot_filling:order_id"
+    assert restored.inquiry_times == 1
+    assert restored.uploaded_file_urls == ["http://files/order.xlsx"]
+    assert restored.updated_at == conversation.updated_at
+
+
+def test_serialize_should_compress_long_history():
+    conversation = create_conversation()
+    for _ in range(9):
+        conversation.append_user_history("请帮我查询一下这个订单的状态" * 10)
+
+    data = serialize_conversation(conversation)
+
+    assert data.startswith(b"z")
+    assert deserialize_conversation(data).history.rounds == conversation.history.rounds
+
+
+def test_tracker_should_share_conversation_between_instances(store):
+    first_worker = PersistentConversationTracker(store)
+    second_worker = PersistentConversationTracker(store)
+    first_worker.save_conversation("session", create_conversation())
+
+    loaded = second_worker.load_conversation("session")
+
+    assert loaded.current_intent.name == "query_order"
+    assert loaded.version == 1
+
+
+def test_tracker_should_reject_stale_write(store):
+    tracker = PersistentConversationTracker(store)
+    tracker.save_conversation("session", create_conversation())
+    first = tracker.load_conversation("session")
+    second = tracker.load_conversation("session")
+
+    tracker.save_conversation("session", first)
+    with pytest.raises(ConversationVersionConflictException):
+        tracker.save_conversation("session", second)
+
+    assert tracker.load_conversation("session").version == 2
+
+
+def test_tracker_should_return_new_conversation_for_unknown_session(store):
+    conversation = PersistentConversationTracker(store).load_conversation("unknown")
+
+    assert conversation.session_id == "unknown"
+    assert conversation.version == 0
+
+
+def test_save_summarized_history_should_flag_stored_rounds(store):
+    tracker = PersistentConversationTracker(store)
+    conversation = create_conversation()
+    conversation.append_assistant_history(None)
+    tracker.save_conversation("session", conversation)
+    conversation.install_summarized_history("new summary", list(conversation.history.rounds)[:1])
+
+    tracker.save_summarized_history(conversation)
+
+    stored = tracker.load_conversation("session")
+    assert stored.summarized_history_context == "new summary"
+    assert [one_round.summarized for one_round in stored.history.rounds] == [True, False]
+
+
+async def test_sweep_should_remove_inactive_conversations(store):
+    tracker = PersistentConversationTracker(store)
+    inactive = create_conversation("inactive")
+    inactive.updated_at = datetime.now() - timedelta(hours=25)
+    tracker.save_conversation("inactive", inactive)
+    tracker.save_conversation("active", create_conversation("active"))
+
+    await tracker.sweep_inactive_conversations()
+
+    assert tracker.load_conversation("inactive").version == 0
+    assert tracker.load_conversation("active").version == 1
+    assert store.count() == 1
+
+
+async def test_async_tracker_should_do_store_io_off_the_event_loop(store, monkeypatch):
+    io_threads = []
+    for name in ["load", "compare_and_set"]:
+        method = getattr(store, name)
+
+        def record_thread(*args, method=method):
+            io_threads.append(threading.get_ident())
+            return method(*args)
+
+        monkeypatch.setattr(store, name, record_thread)
+    tracker = PersistentConversationTracker(store)
+    await tracker.asave_conversation("session", create_conversation())
+    conversation = await tracker.aload_conversation("session")
+    conversation.append_assistant_history(None)
+    conversation.install_summarized_history("new summary", list(conversation.history.rounds)[:1])
+
+    await tracker.asave_summarized_history(conversation)
+
+    assert (await tracker.aload_conversation("session")).summarized_history_context == "new summary"
+    assert io_threads
+    assert threading.get_ident() not in io_threads
+
+
+def test_redis_store_should_delete_version_claims():
+    client = LocalRedis()
+    store = RedisConversationStore(client)
+
+    assert store.compare_and_set("session", b"first", 0, time.time())
+    assert not store.compare_and_set("session", b"stale", 0, time.time())
+    assert store.compare_and_set("session", b"second", 1, time.time())
+
+    assert sorted(client.values) == ["conversation:session"]
+    assert store.load("session") == (b"second", 2)
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from tracker.session_lock import SessionLockManager, SessionBusyException
+
+
+async def test_requests_of_same_session_should_run_in_order():
+    manager = SessionLockManager()
+    events = []
+
+    async def handle(name, delay):
+        async with manager.lock("session"):
+            events.append(f"{name} start")
+            await asyncio.sleep(delay)
+            events.append(f"{name} end")
+
+    await asyncio.gather(handle("first", 0.02), handle("second", 0))
+
+    assert events == ["first start", "first end", "second start", "second end"]
+    assert manager.locks == {}
+
+
+async def test_requests_of_different_sessions_should_run_concurrently():
+    manager = SessionLockManager()
+    events = []
+
+    async def handle(session_id, delay):
+        async with manager.lock(session_id):
+            events.append(f"{session_id} start")
+            await asyncio.sleep(delay)
+            events.append(f"{session_id} end")
+
+    await asyncio.gather(handle("a", 0.02), handle("b", 0))
+
+    assert events == ["a start", "b start", "b end", "a end"]
+
+
+async def test_should_give_up_when_session_is_busy_for_too_long():
+    manager = SessionLockManager(timeout=0.01)
+
+    async with manager.lock("session"):
+        with pytest.raises(SessionBusyException):
+            async with manager.lock("session"):
+                pass
+        assert manager.active_requests("session") == 1
+
+    assert manager.active_requests("session") == 0
+
+
+async def test_request_given_up_while_being_woken_should_not_keep_the_lock():
+    manager = SessionLockManager(timeout=1)
+
+    async def handle():
+        async with manager.lock("session"):
+            pass
+
+    async with manager.lock("session"):
+        waiting = asyncio.create_task(handle())
+        await asyncio.sleep(0)
+    # the lock is handed to the waiting request, which gives up before it runs again
+    waiting.cancel()
+    await asyncio.gather(waiting, return_exceptions=True)
+
+    await asyncio.wait_for(handle(), 0.1)
+    assert manager.locks == {}
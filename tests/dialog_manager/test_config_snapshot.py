@@ -0,0 +1,75 @@
+import os
+
+from dialog_manager.config_snapshot import ConfigReloader, ConfigSnapshot
+
+
+def write(path, content):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(content)
+
+
+def create_config(tmp_path):
+    scenes = tmp_path / "scenes"
+    prompts = tmp_path / "prompts"
+    scenes.mkdir()
+    prompts.mkdir()
+    write(
+        scenes / "claim.yaml",
+        "name: claim\ndescription: claim\nbusiness: true\naction: claim\nslot_expression: \"a and b\"\n"
+        "slots:\n  - name: a\n    description: a\n    slotType: text\n"
+        "  - name: b\n    description: b\n    slotType: text\n",
+    )
+    write(prompts / "intent_confirm.txt", "confirm {{intent}}")
+    return str(scenes), str(prompts)
+
+
+def test_load_should_read_intents_forms_and_prompts_once(tmp_path):
+    scenes, prompts = create_config(tmp_path)
+
+    snapshot = ConfigSnapshot.load(scenes, prompts)
+    write(os.path.join(prompts, "intent_confirm.txt"), "changed")
+
+    assert snapshot.intent_list_config.get_intent("claim").action == "claim"
+    assert [slot.name for slot in snapshot.form_store.get_form("claim").slots] == ["a", "b"]
+    assert snapshot.prompt_manager.load("intent_confirm").template == "confirm {{intent}}"
+    assert snapshot.prompt_manager.load("missing") is None
+
+
+def test_load_should_accept_the_shipped_scenes_and_prompts():
+    resources = os.path.join(os.path.dirname(__file__), "..", "..", "src", "resources")
+
+    snapshot = ConfigSnapshot.load(os.path.join(resources, "scenes"), os.path.join(resources, "prompt_templates"))
+
+    for intent in snapshot.intent_list_config.intents:
+        # intents without an action, such as unknown, have no form
+        if intent.action:
+            assert snapshot.form_store.get_form(intent.name).action == intent.action
+    assert snapshot.prompt_manager.load("intent_confirm") is not None
+
+
+async def test_reload_should_install_new_snapshot_only_when_files_change(tmp_path):
+    scenes, prompts = create_config(tmp_path)
+    installed = []
+    reloader = ConfigReloader(ConfigSnapshot.load(scenes, prompts), lambda snapshot: snapshot, installed.append)
+
+    assert await reloader.reload() is False
+
+    write(os.path.join(prompts, "intent_confirm.txt"), "confirm again")
+    assert await reloader.reload() is True
+    assert installed == [reloader.snapshot]
+    assert reloader.snapshot.prompt_manager.load("intent_confirm").template == "confirm again"
+    assert await reloader.reload() is False
+
+
+async def test_reload_should_keep_current_snapshot_when_new_one_is_invalid(tmp_path):
+    scenes, prompts = create_config(tmp_path)
+    installed = []
+    snapshot = ConfigSnapshot.load(scenes, prompts)
+    reloader = ConfigReloader(snapshot, lambda new_snapshot: new_snapshot, installed.append)
+
+    write(os.path.join(scenes, "broken.yaml"), "name: broken\nslot_expression: \"a and (\"\n")
+
+    assert await reloader.reload() is False
+    assert await reloader.reload() is False
+    assert installed == []
+    assert reloader.snapshot is snapshot
@@ -0,0 +1,90 @@
+import asyncio
+
+from action.base import Action, ActionResponse
+from action.runner import SimpleActionRunner
+from dialog_manager.base import BaseDialogManager
+from metrics.base import metrics_registry
+from metrics.tracing import STAGE_LATENCY_METRIC
+from reasoner.base import Plan, Reasoner
+from tracker.base import BaseConversationTracker
+from tracker.session_lock import SessionLockManager
+
+
+class StreamingAction(Action):
+    def __init__(self):
+        self.finished = asyncio.Event()
+
+    async def run(self, context):
+        return ActionResponse(code=200, message="", answer=None, jump_out_flag=False)
+
+    async def stream(self, context):
+        for partial_answer in ["first ", "second ", "third"]:
+            await asyncio.sleep(0)
+            yield partial_answer
+        yield await self.run(context)
+        self.finished.set()
+
+    def get_name(self) -> str:
+        return "streaming"
+
+
+class StaticReasoner(Reasoner):
+    def __init__(self, action: Action):
+        self.action = action
+
+    async def think(self, conversation):
+        return Plan(None, "", self.action, [])
+
+
+def dialog_manager(action: Action, session_lock_manager: SessionLockManager = None) -> BaseDialogManager:
+    return BaseDialogManager(
+        BaseConversationTracker(), StaticReasoner(action), SimpleActionRunner(), [], None, session_lock_manager
+    )
+
+
+async def test_streamed_turn_should_yield_partial_answers_then_the_response():
+    manager = dialog_manager(StreamingAction())
+
+    items = [item async for item in manager.handle_message_stream("hi", "session")]
+
+    assert items[:3] == ["first ", "second ", "third"]
+    response, conversation = items[3]
+    assert response.code == 200
+    assert manager.conversation_tracker.load_conversation("session") is conversation
+
+
+async def test_streamed_turn_should_be_saved_when_the_caller_stops_reading():
+    action = StreamingAction()
+    manager = dialog_manager(action)
+
+    stream = manager.handle_message_stream("hi", "session")
+    assert await stream.__anext__() == "first "
+    await stream.aclose()
+    await asyncio.wait_for(action.finished.wait(), 1)
+    await manager.shutdown()
+
+    history = manager.conversation_tracker.load_conversation("session").get_history().to_dicts()
+    assert [one_round["role"] for one_round in history] == ["user", "assistant"]
+    assert manager.session_lock_manager.active_requests("session") == 0
+    assert manager.streamed_turns == set()
+
+
+async def test_unread_stream_should_not_hold_the_session_lock():
+    manager = dialog_manager(StreamingAction(), SessionLockManager(timeout=0.5))
+
+    stalled = manager.handle_message_stream("hi", "session")
+    assert await stalled.__anext__() == "first "
+    # the first client stops reading, the next message of the session is still handled
+    items = [item async for item in manager.handle_message_stream("again", "session")]
+
+    assert items[-1][0].code == 200
+    await stalled.aclose()
+
+
+async def test_action_span_should_not_include_the_time_the_caller_reads():
+    manager = dialog_manager(StreamingAction())
+
+    async for _ in manager.handle_message_stream("hi", "session"):
+        await asyncio.sleep(0.05)
+
+    assert metrics_registry.histogram(STAGE_LATENCY_METRIC, stage="action", action="streaming").quantile(1) < 0.05
@@ -0,0 +1,62 @@
+from metrics.base import MetricsRegistry, Histogram, metrics_registry
+from metrics.tracing import LLM_LATENCY_METRIC, request_trace, trace_span, get_current_trace
+from models.chat_model.registry import TracedChatModel
+
+
+def test_histogram_quantiles():
+    histogram = Histogram()
+    for value in range(1, 101):
+        histogram.observe(value)
+
+    assert histogram.count == 100
+    assert histogram.sum == 5050
+    assert histogram.quantiles() == {0.5: 50, 0.95: 95, 0.99: 99}
+
+
+def test_render_prometheus_text_format():
+    registry = MetricsRegistry()
+    registry.counter("cache_hits_total", "cache hits", cache="intent").inc(2)
+    registry.histogram("stage_latency_seconds", stage="nlu").observe(0.5)
+
+    text = registry.render()
+
+    assert "# HELP cache_hits_total cache hits" in text
+    assert '# TYPE cache_hits_total counter' in text
+    assert 'cache_hits_total{cache="intent"} 2.0' in text
+    assert '# TYPE stage_latency_seconds summary' in text
+    assert 'stage_latency_seconds{quantile="0.99",stage="nlu"} 0.5' in text
+    assert 'stage_latency_seconds_count{stage="nlu"} 1' in text
+
+
+def test_trace_span_should_be_recorded_in_current_request_trace():
+    with request_trace("session") as trace:
+        with trace_span("nlu.intent_call", layer="root"):
+            pass
+        with trace_span("llm:intent_call", sub_scenario=1):
+            pass
+
+    assert [span["name"] for span in trace.breakdown()] == ["nlu.intent_call", "llm:intent_call"]
+    assert trace.breakdown()[0]["layer"] == "root"
+    assert get_current_trace() is None
+
+
+class EchoChatModel:
+    def chat(self, message, **kwargs):
+        return message
+
+    async def achat(self, message, **kwargs):
+        return message
+
+
+async def test_sync_and_async_llm_calls_should_both_be_traced():
+    chat_model = TracedChatModel(EchoChatModel(), "research_report_summarize")
+
+    with request_trace("session") as trace:
+        assert chat_model.chat("question") == "question"
+        assert await chat_model.achat("question") == "question"
+
+    assert [span["name"] for span in trace.breakdown()] == ["llm:research_report_summarize"] * 2
+    histogram = metrics_registry.histogram(
+        LLM_LATENCY_METRIC, stage="llm:research_report_summarize", scenario="research_report_summarize"
+    )
+    assert histogram.count == 2
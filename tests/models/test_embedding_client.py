@@ -0,0 +1,87 @@
+import asyncio
+
+import numpy as np
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from models.embedding_model.client import EmbeddingClient
+from models.embedding_model.embedding import Embedding
+from utils.http_client import http_client_registry
+
+
+@pytest.fixture
+async def embedding_service():
+    requests = []
+
+    async def embeddings(request: web.Request) -> web.Response:
+        texts = (await request.json())["query"]
+        requests.append(texts)
+        return web.json_response({"embeddings": [[len(text), 1.0] for text in texts]})
+
+    app = web.Application()
+    app.router.add_post("/v1/embeddings", embeddings)
+    server = TestServer(app)
+    await server.start_server()
+    yield str(server.make_url("/v1/embeddings")), requests
+    await http_client_registry.close()
+    await server.close()
+
+
+async def test_concurrent_calls_should_be_batched_into_one_request(embedding_service):
+    url, requests = embedding_service
+    client = EmbeddingClient(url, batch_window=0.01, cache_size=0)
+
+    first, second = await asyncio.gather(client.embed(["a", "bb"]), client.embed(["bb", "ccc"]))
+
+    assert requests == [["a", "bb", "ccc"]]
+    assert first.dtype == np.float32
+    assert first.shape == (2, 2)
+    np.testing.assert_allclose(second[0], first[1])
+    np.testing.assert_allclose(np.linalg.norm(second, axis=1), [1, 1], rtol=1e-6)
+
+
+async def test_embedded_texts_should_be_remembered(embedding_service):
+    url, requests = embedding_service
+    client = EmbeddingClient(url, batch_window=0, cache_size=1)
+
+    await client.embed(["system prompt"], pin=True)
+    await client.embed(["first query"])
+    await client.embed(["second query"])
+    await client.embed(["system prompt", "second query", "first query"])
+
+    # the pinned system prompt is never evicted, the lru cache only holds one query
+    assert requests == [["system prompt"], ["first query"], ["second query"], ["first query"]]
+
+
+async def test_pinned_texts_should_be_bounded(embedding_service):
+    url, requests = embedding_service
+    client = EmbeddingClient(url, batch_window=0, cache_size=0, pinned_cache_size=2)
+
+    for prompt in ["first prompt", "second prompt", "third prompt"]:
+        await client.embed([prompt], pin=True)
+    await client.embed(["third prompt", "first prompt"], pin=True)
+
+    assert len(client.pinned) == 2
+    assert requests[-1] == ["first prompt"]
+
+
+async def test_large_calls_should_be_split_by_max_batch_size(embedding_service):
+    url, requests = embedding_service
+    client = EmbeddingClient(url, batch_window=0.01, max_batch_size=2, cache_size=0)
+
+    matrix = await client.embed(["a", "b", "c"])
+
+    assert matrix.shape == (3, 2)
+    assert requests == [["a", "b"], ["c"]]
+
+
+async def test_raw_vectors_should_match_the_sync_embedding(embedding_service):
+    url, _ = embedding_service
+    client = EmbeddingClient(url, model=Embedding.model, batch_window=0, cache_size=0, normalize=False)
+
+    vectors = await client.embed(["a", "bb"])
+    expected = await asyncio.to_thread(Embedding(url).encode, ["a", "bb"])
+
+    np.testing.assert_allclose(vectors, expected)
+    np.testing.assert_allclose(vectors[1], [2, 1])
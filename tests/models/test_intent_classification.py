@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fastapi import HTTPException
+
+from models.intents.intent_classification import AsyncJointBertIntentClassificationModel
+from utils.http_client import http_client_registry
+
+
+def prediction(text: str) -> dict:
+    return {"intent_label": f"intent of {text}", "intent_confidence": 0.9}
+
+
+@pytest.fixture
+async def jointbert():
+    requests = []
+
+    async def predict_one(request: web.Request) -> web.Response:
+        text = (await request.json())["input_text"]
+        requests.append([text])
+        if text == "fail":
+            return web.Response(status=500, text="model failed")
+        return web.json_response(prediction(text))
+
+    async def predict_batch(request: web.Request) -> web.Response:
+        texts = (await request.json())["input_texts"]
+        requests.append(texts)
+        if "fail" in texts:
+            return web.Response(status=500, text="model failed")
+        return web.json_response({"predictions": [prediction(text) for text in texts]})
+
+    app = web.Application()
+    app.router.add_post("/predict/", predict_one)
+    app.router.add_post("/predict/batch", predict_batch)
+    server = TestServer(app)
+    await server.start_server()
+    model = AsyncJointBertIntentClassificationModel(
+        str(server.make_url("/predict/")), str(server.make_url("/predict/batch")), batch_window=0.01, max_batch_size=3
+    )
+    yield model, requests
+    await http_client_registry.close()
+    await server.close()
+
+
+async def test_concurrent_predictions_should_be_sent_in_batches(jointbert):
+    model, requests = jointbert
+
+    responses = await asyncio.gather(*(model.predict(text) for text in ["a", "b", "c", "d"]))
+
+    assert [response.intent for response in responses] == ["intent of a", "intent of b", "intent of c", "intent of d"]
+    assert requests == [["a", "b", "c"], ["d"]]
+
+
+async def test_failed_batch_should_fall_back_to_single_predictions(jointbert):
+    model, requests = jointbert
+
+    ok, failed = await asyncio.gather(model.predict("ok"), model.predict("fail"), return_exceptions=True)
+
+    assert ok.intent == "intent of ok"
+    assert isinstance(failed, HTTPException)
+    assert requests[0] == ["ok", "fail"]
+    assert sorted(requests[1:]) == [["fail"], ["ok"]]
@@ -0,0 +1,88 @@
+from metrics.base import metrics_registry
+from models.chat_model.response_cache import (
+    LLM_RESPONSE_CACHE_METRIC,
+    CachedChatModel,
+    LLMResponseCache,
+    ScenarioResponseCache,
+)
+from tests.nlu.test_intent_example_index import CharacterEmbeddingClient
+
+
+class CountingChatModel:
+    def __init__(self):
+        self.calls = []
+
+    async def achat(self, **kwargs):
+        self.calls.append(kwargs)
+        return f"answer {len(self.calls)}"
+
+
+def chat_params(query: str, system: str = "classify the intent") -> dict:
+    return {
+        "messages": [{"role": "system", "content": system}, {"role": "user", "content": query}],
+        "max_length": 64,
+        "jsonable": True,
+    }
+
+
+def cache_count(scenario: str, result: str) -> float:
+    return metrics_registry.counter(
+        LLM_RESPONSE_CACHE_METRIC, "llm calls answered by the response cache", scenario=scenario, result=result
+    ).value
+
+
+async def test_same_prompt_should_be_answered_from_cache():
+    chat_model = CountingChatModel()
+    cached = CachedChatModel(chat_model, ScenarioResponseCache("exact_scenario"))
+
+    first = await cached.achat(**chat_params("claim my money"), sub_scenario="leaf")
+    second = await cached.achat(**chat_params("claim my money"), sub_scenario="leaf")
+    other_sub_scenario = await cached.achat(**chat_params("claim my money"), sub_scenario="layer")
+
+    assert first == second == "answer 1"
+    assert other_sub_scenario == "answer 2"
+    assert cache_count("exact_scenario", "exact_hit") == 1
+    assert cache_count("exact_scenario", "miss") == 2
+
+
+async def test_shared_sub_scenarios_should_share_answers():
+    chat_model = CountingChatModel()
+    cached = CachedChatModel(chat_model, ScenarioResponseCache("shared_scenario", share_sub_scenarios=True))
+
+    await cached.achat(**chat_params("what is the fee"), sub_scenario=1)
+
+    assert await cached.achat(**chat_params("what is the fee"), sub_scenario=2) == "answer 1"
+
+
+async def test_similar_prompt_should_reuse_answer_only_with_same_system_message():
+    chat_model = CountingChatModel()
+    cache = ScenarioResponseCache(
+        "similar_scenario", similarity_threshold=0.95, embedding_client=CharacterEmbeddingClient()
+    )
+    cached = CachedChatModel(chat_model, cache)
+
+    await cached.achat(**chat_params("claim my money"))
+
+    assert await cached.achat(**chat_params("claim my money!")) == "answer 1"
+    assert await cached.achat(**chat_params("claim my money!", system="other prompt")) == "answer 2"
+    assert await cached.achat(**chat_params("show my policy")) == "answer 3"
+    assert cache_count("similar_scenario", "similar_hit") == 1
+
+
+async def test_expired_answers_should_not_be_reused():
+    chat_model = CountingChatModel()
+    cached = CachedChatModel(chat_model, ScenarioResponseCache("expiring_scenario", ttl=0))
+
+    await cached.achat(**chat_params("claim my money"))
+
+    assert await cached.achat(**chat_params("claim my money")) == "answer 2"
+
+
+def test_only_configured_scenarios_should_be_cached():
+    response_cache = LLMResponseCache({"ttl": 60, "maxsize": 10, "scenarios": {"intent_call": {"maxsize": 5}}})
+    chat_model = CountingChatModel()
+
+    assert isinstance(response_cache.wrap(chat_model, "intent_call"), CachedChatModel)
+    assert response_cache.wrap(chat_model, "rma_pricing_action") is chat_model
+    assert response_cache.caches["intent_call"].responses.maxsize == 5
+    assert response_cache.caches["intent_call"].responses.ttl == 60
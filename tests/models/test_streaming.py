@@ -0,0 +1,26 @@
+from unittest.mock import MagicMock, AsyncMock
+
+from models.chat_model.streaming import astream_chat
+
+
+async def collect(stream):
+    return [delta async for delta in stream]
+
+
+async def test_astream_chat_should_fallback_to_achat_when_model_can_not_stream():
+    chat_model = MagicMock(spec=["achat"])
+    chat_model.achat = AsyncMock(return_value=MagicMock(response="hello world"))
+
+    assert await collect(astream_chat(chat_model, max_length=16)) == ["hello world"]
+    chat_model.achat.assert_called_once_with(max_length=16)
+
+
+async def test_astream_chat_should_yield_non_empty_deltas():
+    async def stream_chat(**kwargs):
+        for delta in ["hello", "", " world"]:
+            yield MagicMock(response=delta)
+
+    chat_model = MagicMock(spec=["astream_chat"])
+    chat_model.astream_chat = stream_chat
+
+    assert await collect(astream_chat(chat_model)) == ["hello", " world"]
@@ -0,0 +1,125 @@
+from nlu.base import Nlu
+from nlu.forms import FormStore
+from nlu.intent_config import IntentConfig, IntentListConfig
+from nlu.intent_with_entity import Intent, IntentWithEntity
+from nlu.llm.entity import LLMEntityExtractor
+from nlu.llm.fused_nlu import FusedNLU
+from prompt_manager.base import PromptManager, PromptWrapper
+from tracker.context import ConversationContext
+
+
+class FusedPromptManager(PromptManager):
+    def load(self, name, domain=None) -> PromptWrapper:
+        return PromptWrapper("{{intent_list}}")
+
+
+class RecordingNlu(Nlu):
+    def __init__(self):
+        self.calls = 0
+
+    async def extract_intents_and_entities(self, conversation_context: ConversationContext) -> IntentWithEntity:
+        self.calls += 1
+        return IntentWithEntity(intent=None, entities=[], action="")
+
+
+def create_fused_nlu(answer):
+    slots = [{"name": "country", "description": "country of the claim", "slotType": "text"}]
+    intent_list_config = IntentListConfig(
+        [
+            IntentConfig("insurance", "insurance", True, None, [], False, has_children=True),
+            IntentConfig("claim", "claim", True, "claim", slots, False, full_name_of_parent_intent="insurance"),
+            IntentConfig("rma", "rma", True, "rma", [], False),
+            IntentConfig("positive", "yes", False, "positive", [], False),
+        ]
+    )
+    fallback = RecordingNlu()
+    fused_nlu = FusedNLU(intent_list_config, FormStore(intent_list_config), FusedPromptManager(), fallback)
+
+    async def call(conversation):
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    fused_nlu.call = call
+    return fused_nlu, fallback
+
+
+async def test_fused_answer_should_set_intent_and_entities():
+    fused_nlu, fallback = create_fused_nlu(
+        {"start_new_topic": True, "intent": "insurance.claim", "confidence": 0.9, "entities": {"country": "HK"}}
+    )
+    conversation = ConversationContext("claim in HK", "session")
+
+    result = await fused_nlu.extract_intents_and_entities(conversation)
+
+    assert fallback.calls == 0
+    assert result.intent.get_full_intent_name() == "insurance.claim"
+    assert [(entity.type, entity.value) for entity in result.entities] == [("country", "HK")]
+    assert conversation.get_current_intent_slot_names() == ["country"]
+
+
+async def test_invalid_fused_answer_should_fall_back():
+    for answer in [
+        None,
+        {"intent": "insurance"},
+        {"intent": "rma", "entities": {"country": "HK"}},
+        ConnectionError("model unavailable"),
+    ]:
+        fused_nlu, fallback = create_fused_nlu(answer)
+
+        await fused_nlu.extract_intents_and_entities(ConversationContext("claim in HK", "session"))
+
+        assert fallback.calls == 1
+
+
+async def test_unknown_intent_should_return_no_intent():
+    fused_nlu, fallback = create_fused_nlu({"intent": "unknown"})
+
+    result = await fused_nlu.extract_intents_and_entities(ConversationContext("hmm", "session"))
+
+    assert fallback.calls == 0
+    assert result.intent is None
+
+
+def claim_in_progress(fused_nlu: FusedNLU, entities: dict) -> ConversationContext:
+    conversation = ConversationContext("claim in HK", "session")
+    conversation.append_assistant_history(None)
+    conversation.append_user_history("yes")
+    conversation.update_intent(
+        Intent.from_intent_config("claim", 1.0, fused_nlu.intent_list_config.get_intent_by_full_name("insurance.claim"))
+    )
+    form = fused_nlu.form_store.get_form("claim")
+    conversation.current_intent_slots = list(form.slots)
+    conversation.add_entity(LLMEntityExtractor.entities_from_values(form, entities))
+    return conversation
+
+
+async def test_confirmation_should_keep_the_filled_slots():
+    fused_nlu, fallback = create_fused_nlu({"start_new_topic": False, "intent": "positive"})
+    conversation = claim_in_progress(fused_nlu, {"country": "HK"})
+    conversation.set_state("slot_confirm: country")
+
+    result = await fused_nlu.extract_intents_and_entities(conversation)
+
+    assert result.intent.name == "claim"
+    assert [(entity.type, entity.value) for entity in conversation.get_entities()] == [("country", "HK")]
+
+
+async def test_same_topic_answer_should_update_only_the_answered_slots():
+    slots = [
+        {"name": "country", "description": "country of the claim", "slotType": "text"},
+        {"name": "amount", "description": "amount of the claim", "slotType": "text"},
+    ]
+    fused_nlu, _ = create_fused_nlu(
+        {"start_new_topic": False, "intent": "insurance.claim", "entities": {"amount": "100"}}
+    )
+    fused_nlu.intent_list_config.get_intent("claim").slots = slots
+    fused_nlu.form_store.forms.clear()
+    conversation = claim_in_progress(fused_nlu, {"country": "HK"})
+
+    await fused_nlu.extract_intents_and_entities(conversation)
+
+    assert sorted((entity.type, entity.value) for entity in conversation.get_entities()) == [
+        ("amount", "100"),
+        ("country", "HK"),
+    ]
@@ -0,0 +1,151 @@
+from nlu.forms import FormStore
+from nlu.intent_config import IntentConfig, IntentListConfig
+from nlu.intent_with_entity import Entity, Intent
+from nlu.llm.entity import LLMEntityExtractor
+from nlu.rule.entity import RuleBasedEntityExtractor
+from prompt_manager.base import PromptManager, PromptWrapper
+from tracker.context import ConversationContext
+
+SLOTS = [
+    {"name": "country", "description": "country of the claim", "slotType": "text"},
+    {"name": "amount", "description": "amount of the claim", "slotType": "text"},
+]
+
+
+class TemplatePromptManager(PromptManager):
+    def load(self, name, domain=None) -> PromptWrapper:
+        return PromptWrapper(name)
+
+
+class JsonResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def get_json_response(self):
+        return self.content
+
+
+class RecordingChatModel:
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = []
+
+    async def achat(self, **kwargs):
+        self.calls.append(kwargs)
+        return JsonResponse(self.answer)
+
+
+class RecordingModelRegistry:
+    def __init__(self, chat_model):
+        self.chat_model = chat_model
+
+    async def get_model(self, scenario, *args, **kwargs):
+        return self.chat_model
+
+
+def create_extractor(answer, incremental=True):
+    intent_list_config = IntentListConfig([IntentConfig("claim", "claim", True, "claim", SLOTS, False)])
+    extractor = LLMEntityExtractor(
+        FormStore(intent_list_config), None, "gpt", TemplatePromptManager(), incremental=incremental
+    )
+    chat_model = RecordingChatModel(answer)
+    extractor.scenario_model_registry = RecordingModelRegistry(chat_model)
+    return extractor, chat_model
+
+
+def conversation_asking_for_amount():
+    conversation = ConversationContext("it is 100 dollars", "session")
+    conversation.append_user_history("it is 100 dollars")
+    conversation.current_intent = Intent(name="claim")
+    extractor, _ = create_extractor({})
+    conversation.current_intent_slots = list(extractor.form_store.get_form("claim").slots)
+    conversation.add_entity([Entity(type="country", value="HK")])
+    conversation.set_state("slot_filling: [['amount']]")
+    return conversation
+
+
+async def test_answer_to_slot_question_should_only_extract_unfilled_slots():
+    extractor, chat_model = create_extractor({"amount": "100", "country": "US"})
+
+    entities = await extractor.extract_entity(conversation_asking_for_amount())
+
+    assert [(entity.type, entity.value) for entity in entities] == [("country", "HK"), ("amount", "100")]
+    assert chat_model.calls[0]["sub_scenario"] == "incremental"
+
+
+async def test_extractor_should_send_whole_history_when_not_incremental():
+    extractor, chat_model = create_extractor({"amount": "100", "country": "US"}, incremental=False)
+
+    entities = await extractor.extract_entity(conversation_asking_for_amount())
+
+    assert {(entity.type, entity.value) for entity in entities} == {("country", "US"), ("amount", "100")}
+    assert "sub_scenario" not in chat_model.calls[0]
+
+
+async def test_llm_should_be_skipped_when_rules_fill_all_required_slots():
+    slots = [
+        {"name": "bic", "description": "bic of the bank", "slotType": "text", "pattern": "bic", "optional": False},
+        {"name": "remark", "description": "remark", "slotType": "text"},
+    ]
+    intent_list_config = IntentListConfig([IntentConfig("rma", "rma", True, "rma", slots, False)])
+    extractor = LLMEntityExtractor(
+        FormStore(intent_list_config),
+        None,
+        "gpt",
+        TemplatePromptManager(),
+        rule_based_entity_extractor=RuleBasedEntityExtractor(),
+    )
+    chat_model = RecordingChatModel({})
+    extractor.scenario_model_registry = RecordingModelRegistry(chat_model)
+    conversation = ConversationContext("check rma of HSBCHKHHXXX", "session")
+    conversation.current_intent = Intent(name="rma")
+    conversation.append_user_history("check rma of HSBCHKHHXXX")
+
+    entities = await extractor.extract_entity(conversation)
+
+    assert [(entity.type, entity.value) for entity in entities] == [("bic", "HSBCHKHHXXX")]
+    assert chat_model.calls == []
+
+
+async def test_llm_should_be_skipped_for_the_only_date_of_a_date_slot():
+    slots = [{"name": "date_of_birth", "description": "date of birth", "slotType": "date", "optional": False}]
+    intent_list_config = IntentListConfig([IntentConfig("claim", "claim", True, "claim", slots, False)])
+    extractor = LLMEntityExtractor(
+        FormStore(intent_list_config),
+        None,
+        "gpt",
+        TemplatePromptManager(),
+        rule_based_entity_extractor=RuleBasedEntityExtractor(),
+    )
+    chat_model = RecordingChatModel({})
+    extractor.scenario_model_registry = RecordingModelRegistry(chat_model)
+    conversation = ConversationContext("I was born on 1990-05-17", "session")
+    conversation.current_intent = Intent(name="claim")
+    conversation.append_user_history("I was born on 1990-05-17")
+
+    entities = await extractor.extract_entity(conversation)
+
+    assert [(entity.type, entity.value) for entity in entities] == [("date_of_birth", "1990-05-17")]
+    assert chat_model.calls == []
+
+
+async def test_numbers_inferred_by_rules_should_not_override_the_llm():
+    slots = [{"name": "amount", "description": "amount of the claim", "slotType": "integer", "optional": True}]
+    intent_list_config = IntentListConfig([IntentConfig("claim", "claim", True, "claim", slots, False)])
+    extractor = LLMEntityExtractor(
+        FormStore(intent_list_config),
+        None,
+        "gpt",
+        TemplatePromptManager(),
+        rule_based_entity_extractor=RuleBasedEntityExtractor(),
+    )
+    chat_model = RecordingChatModel({"amount": 3000})
+    extractor.scenario_model_registry = RecordingModelRegistry(chat_model)
+    conversation = ConversationContext("claim 3 thousand", "session")
+    conversation.current_intent = Intent(name="claim")
+    conversation.append_user_history("claim 3 thousand")
+
+    entities = await extractor.extract_entity(conversation)
+
+    assert [(entity.type, entity.value) for entity in entities] == [("amount", 3000)]
+    assert len(chat_model.calls) == 1
@@ -0,0 +1,91 @@
+from typing import Optional
+
+import pytest
+
+from metrics.base import metrics_registry
+from nlu.base import IntentClassifier
+from nlu.intent_config import IntentConfig, IntentListConfig
+from nlu.intent_with_entity import Intent
+from nlu.rule.intent import FAST_PATH_METRIC, CharacterNgramModel, FastPathIntentClassifier
+from tracker.context import ConversationContext
+
+
+class RecordingClassifier(IntentClassifier):
+    def __init__(self):
+        self.calls = 0
+
+    async def classify_intent(self, conversation_context: ConversationContext) -> Optional[Intent]:
+        self.calls += 1
+        return None
+
+    async def check_is_providing_more_info(self, conversation_context: ConversationContext) -> bool:
+        return False
+
+
+def intent_list_config() -> IntentListConfig:
+    return IntentListConfig(
+        [
+            IntentConfig("chitchat", "chitchat with bot", False, "chitchat", [], False, examples=["hello", "hi"]),
+            IntentConfig(
+                "claim", "claim money", True, "claim", [], False, examples=["claim my money", "i want to claim"]
+            ),
+        ]
+    )
+
+
+def fast_path_count(result: str) -> float:
+    return metrics_registry.counter(FAST_PATH_METRIC, "intents resolved without the llm", result=result).value
+
+
+@pytest.mark.parametrize(
+    "user_input, expected",
+    [
+        ("Yes", "positive"),
+        ("  ok!", "positive"),
+        ("好的", "positive"),
+        ("No thanks.", "negative"),
+        ("不用了", "negative"),
+        ("Hello", "chitchat"),
+        ("no no", "negative"),
+        ("claim my money", "claim"),
+    ],
+)
+def test_short_replies_should_be_classified_locally(user_input, expected):
+    classifier = FastPathIntentClassifier(RecordingClassifier(), intent_list_config())
+
+    intent_name, confidence = classifier.classify_locally(user_input)
+
+    assert intent_name == expected
+    assert confidence >= classifier.threshold
+
+
+def test_long_or_unknown_input_should_have_low_confidence():
+    classifier = FastPathIntentClassifier(RecordingClassifier(), intent_list_config())
+
+    assert classifier.classify_locally("please tell me how the reimbursement of my claim works") == (None, 0.0)
+    assert classifier.classify_locally("xyz") == (None, 0.0)
+    assert classifier.classify_locally("yes pls")[1] < classifier.threshold
+
+
+def test_model_confidence_should_drop_when_labels_are_close():
+    model = CharacterNgramModel([("yes", "positive"), ("yes not", "negative")])
+
+    label, confidence = model.predict("yes")
+
+    assert label == "positive"
+    assert confidence < 0.6
+
+
+async def test_classifier_should_defer_to_the_wrapped_classifier_on_low_confidence():
+    wrapped = RecordingClassifier()
+    classifier = FastPathIntentClassifier(wrapped, intent_list_config())
+    hits, deferred = fast_path_count("hit"), fast_path_count("deferred")
+
+    intent = await classifier.classify_intent(ConversationContext("yes", "session"))
+    assert intent.name == "positive"
+    assert intent.confidence == 1.0
+    assert wrapped.calls == 0
+
+    assert await classifier.classify_intent(ConversationContext("what is the status of my claim", "session")) is None
+    assert wrapped.calls == 1
+    assert (fast_path_count("hit"), fast_path_count("deferred")) == (hits + 1, deferred + 1)
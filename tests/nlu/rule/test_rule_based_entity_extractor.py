@@ -0,0 +1,67 @@
+import pytest
+
+from nlu.forms import Form
+from nlu.intent_with_entity import Slot, SlotType
+from nlu.rule.entity import RuleBasedEntityExtractor
+
+
+def form(*slots: Slot) -> Form:
+    return Form(name="rma_pricing", slots=list(slots), action="rma_pricing", intent_description="rma pricing")
+
+
+def extract(user_input: str, *slots: Slot) -> dict:
+    entities = RuleBasedEntityExtractor().extract(form(*slots), user_input)
+    return {entity.type: entity.value for entity in entities}
+
+
+@pytest.mark.parametrize(
+    "user_input, expected",
+    [
+        ("the LC expires on 2024-03-05", "2024-03-05"),
+        ("到期日是2024年3月5日", "2024-03-05"),
+        ("expiry 5 Mar 2024 please", "2024-03-05"),
+        ("from 2024-03-05 to 2024-04-05", None),
+        ("no date here", None),
+    ],
+)
+def test_date_slot_should_take_the_only_date(user_input, expected):
+    assert extract(user_input, Slot(name="expiry date", description="", slot_type=SlotType.DATE)).get(
+        "expiry date"
+    ) == expected
+
+
+def test_number_slots_should_ignore_dates_and_ambiguous_types():
+    amount = Slot(name="amount", description="", slot_type=SlotType.INTEGER)
+    fee = Slot(name="fee", description="", slot_type=SlotType.FLOAT)
+    tenor = Slot(name="tenor", description="", slot_type=SlotType.INTEGER)
+
+    assert extract("amount 1,350 on 2024-03-05", amount) == {"amount": 1350}
+    assert extract("金额是350元", amount) == {"amount": 350}
+    assert extract("fee 12.5", fee) == {"fee": 12.5}
+    assert extract("amount 350, tenor 90", amount, tenor) == {}
+    # one number never fills two slots, even of different types
+    assert extract("amount 350", amount, fee) == {}
+
+
+@pytest.mark.parametrize(
+    "user_input", ["帮我查一下这个客户", "我要一个PPT", "results of Q3", "rate 5%", "tenor 10-20"]
+)
+def test_number_slots_should_only_take_numbers_written_in_digits(user_input):
+    top_n = Slot(name="top_n", description="", slot_type=SlotType.INTEGER)
+    rate = Slot(name="rate", description="", slot_type=SlotType.FLOAT)
+    answer = Slot(name="answer", description="", slot_type=SlotType.NUMERIC_OR_TEXT)
+
+    assert extract(user_input, top_n) == {}
+    assert extract(user_input, rate) == {}
+    assert extract(user_input, answer) == {}
+
+
+def test_pattern_slots_should_take_the_only_match():
+    bic = Slot(name="bic", description="", slot_type=SlotType.TEXT, pattern="bic")
+    rate = Slot(name="rate", description="", slot_type=SlotType.TEXT, pattern="percentage")
+    is_ppt_output = Slot(name="is_ppt_output", description="", slot_type=SlotType.BOOLEAN, pattern="yes_no")
+
+    assert extract("advising bank HSBCHKHHXXX at 1.5 %", bic, rate) == {"bic": "HSBCHKHHXXX", "rate": "1.5"}
+    assert extract("HSBCHKHH or BKCHCNBJ", bic) == {}
+    assert extract("Yes", is_ppt_output) == {"is_ppt_output": True}
+    assert extract("yes, and also a chart", is_ppt_output) == {}
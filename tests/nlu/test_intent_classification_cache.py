@@ -0,0 +1,88 @@
+from nlu.intent_config import IntentConfig, IntentListConfig
+from nlu.intent_with_entity import Intent
+from nlu.llm.intent_cache import IntentClassificationCache, normalize_user_input
+
+
+def intent_list_config(description="check rma status"):
+    return IntentListConfig(
+        [
+            IntentConfig("rma", description, True, "rma_action", [], False),
+            IntentConfig("greeting", "say hi", False, "chitchat", [], False),
+        ]
+    )
+
+
+def test_normalize_user_input():
+    assert normalize_user_input("  Check   RMA\tstatus ") == "check rma status"
+    assert normalize_user_input("ＲＭＡ") == "rma"
+
+
+def test_cached_layer_should_be_returned_for_same_input():
+    cache = IntentClassificationCache(maxsize=10, ttl=60, persist_path=None)
+    config = intent_list_config()
+    cache.set("check RMA status", None, config, Intent(name="rma", confidence=0.9), Intent(name="greeting"))
+
+    intent, unique_intent = cache.get("check rma  status", None, config)
+
+    assert (intent.name, intent.confidence, intent.description) == ("rma", 0.9, "check rma status")
+    assert unique_intent.name == "greeting"
+    assert cache.get("check rma status", "parent", config) is None
+
+
+def test_cached_layer_should_be_invalid_after_config_changed():
+    cache = IntentClassificationCache(maxsize=10, ttl=60, persist_path=None)
+    cache.set("check rma status", None, intent_list_config(), Intent(name="rma", confidence=0.9), None)
+
+    assert cache.get("check rma status", None, intent_list_config())[0].name == "rma"
+    assert cache.get("check rma status", None, intent_list_config("changed")) is None
+
+
+def test_turns_without_intent_should_not_be_cached():
+    cache = IntentClassificationCache(maxsize=10, ttl=60, persist_path=None)
+    cache.set("hmm", None, intent_list_config(), None, None)
+
+    assert cache.get("hmm", None, intent_list_config()) is None
+
+
+def test_cached_layer_should_depend_on_the_previous_intent():
+    cache = IntentClassificationCache(maxsize=10, ttl=60, persist_path=None)
+    config = intent_list_config()
+    cache.set("yes", None, config, Intent(name="rma", confidence=0.9), None, "layer", "rma")
+
+    assert cache.get("yes", None, config, "layer", "rma")[0].name == "rma"
+    assert cache.get("yes", None, config, "layer", "greeting") is None
+    assert cache.get("yes", None, config) is None
+
+
+def test_cached_layer_should_be_persisted(tmp_path):
+    path = str(tmp_path / "intent_cache.db")
+    config = intent_list_config()
+    cache = IntentClassificationCache(maxsize=10, ttl=60, persist_path=path)
+    cache.set("check rma status", None, config, Intent(name="rma", confidence=0.8), None)
+    cache.cache.close()
+
+    intent, unique_intent = IntentClassificationCache(maxsize=10, ttl=60, persist_path=path).get(
+        "check rma status", None, config
+    )
+
+    assert intent.name == "rma"
+    assert unique_intent is None
+
+
+def test_cached_leaf_should_keep_its_parent_when_leaf_names_repeat():
+    cache = IntentClassificationCache(maxsize=10, ttl=60, persist_path=None)
+    config = IntentListConfig(
+        [
+            IntentConfig("rma", "rma", True, None, [], False, has_children=True),
+            IntentConfig("order", "order", True, None, [], False, has_children=True),
+            IntentConfig("status", "rma status", True, "rma_status", [], False, full_name_of_parent_intent="rma"),
+            IntentConfig("status", "order status", True, "order_status", [], False, full_name_of_parent_intent="order"),
+        ]
+    )
+    order_status = config.get_intent_by_full_name("order.status")
+    cache.set("where is it", None, config, Intent.from_intent_config("status", 0.9, order_status), None, mode="leaf")
+
+    intent, _ = cache.get("where is it", None, config, mode="leaf")
+
+    assert intent.get_full_intent_name() == "order.status"
+    assert intent.description == "order status"
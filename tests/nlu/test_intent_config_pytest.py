@@ -1,6 +1,8 @@
+import json
+
 import pytest
 
-from nlu.intent_config import IntentConfig
+from nlu.intent_config import IntentConfig, IntentListConfig
 
 
 def intent_with_full_name_of_parent_intent(full_name_of_parent_intent):
@@ -36,3 +38,79 @@ def ancestor_intent_config():
 )
 def test_is_ancestor_of(descendant, ancestor, expected):
     assert ancestor.is_ancestor_of(descendant) == expected
+
+
+def intent_tree():
+    return IntentListConfig(
+        [
+            IntentConfig("insurance", "insurance", True, None, [], False, has_children=True),
+            IntentConfig(
+                "claim", "claim", True, None, [], False, has_children=True, full_name_of_parent_intent="insurance"
+            ),
+            IntentConfig("car", "car claim", True, "car", [], False, full_name_of_parent_intent="insurance.claim"),
+            IntentConfig("policy", "policy", True, "policy", [], False, full_name_of_parent_intent="insurance"),
+            IntentConfig("insurance_agent", "agent", True, "agent", [], False),
+            IntentConfig("unknown", "unknown", False, "unknown", [], False),
+        ]
+    )
+
+
+def test_get_leaf_intents_should_return_leaves_under_parent():
+    config = intent_tree()
+
+    assert [intent.get_full_intent_name() for intent in config.get_leaf_intents("insurance")] == [
+        "insurance.claim.car",
+        "insurance.policy",
+    ]
+    assert [intent.name for intent in config.get_leaf_intents()] == [
+        "car",
+        "policy",
+        "insurance_agent",
+        "positive",
+        "negative",
+    ]
+
+
+def test_get_ancestor_intents_should_return_path_from_root():
+    config = intent_tree()
+
+    ancestors = config.get_ancestor_intents(config.get_intent_by_full_name("insurance.claim.car"))
+
+    assert [intent.get_full_intent_name() for intent in ancestors] == ["insurance", "insurance.claim"]
+
+
+def test_get_intent_and_children_should_use_indexes():
+    config = intent_tree()
+
+    assert config.get_intent("car").get_full_intent_name() == "insurance.claim.car"
+    assert config.get_intent("missing") is None
+    assert config.get_intent_name_list_by_their_parent_intent() == [
+        "insurance",
+        "insurance_agent",
+        "positive",
+        "negative",
+    ]
+    assert config.get_intent_name_list_by_their_parent_intent("insurance") == ["claim", "policy"]
+    assert config.get_intent_name_list_by_their_parent_intent("missing") == []
+    assert [intent.name for intent in config.get_children_intents(config.get_intent("insurance"))] == [
+        "claim",
+        "car",
+        "policy",
+    ]
+    assert config.get_children_intents(config.get_intent("policy")) == []
+
+
+def test_intent_list_payload_should_be_rendered_once_per_parent():
+    config = intent_tree()
+
+    payload = config.get_intent_list_payload("insurance")
+
+    assert json.loads(payload) == [
+        {"name": "claim", "description": ["claim", "car claim"]},
+        {"name": "policy", "description": ["policy"]},
+    ]
+    assert config.get_intent_list_payload("insurance") is payload
+    assert json.loads(config.get_leaf_intent_list_payload("insurance")) == [
+        {"name": "insurance.claim.car", "description": ["car claim", "insurance", "claim"]},
+        {"name": "insurance.policy", "description": ["policy", "insurance"]},
+    ]
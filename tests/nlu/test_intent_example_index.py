@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+
+from models.embedding_model.client import normalize_rows
+from nlu.intent_config import IntentConfig, IntentListConfig
+from nlu.llm.intent_example_index import IntentExampleIndex
+
+
+def extract_examples(response):
+    # same fields as nlu.llm.intent.process_one_intent_example reads
+    return [
+        dict(
+            intent=item.meta__reference.model_extra["meta__intent_result"],
+            example=item.model_extra["text"],
+            score=item.meta__score,
+        )
+        for item in response.items
+    ]
+
+
+class CharacterEmbeddingClient:
+    """embed texts by their character counts, similar texts get similar vectors"""
+
+    model = "characters"
+
+    def __init__(self):
+        self.embedded_texts = []
+
+    async def embed(self, texts):
+        self.embedded_texts.extend(texts)
+        matrix = np.zeros((len(texts), 128), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for char in text:
+                matrix[row, ord(char) % 128] += 1
+        return normalize_rows(matrix)
+
+
+def intent_list_config(extra_example=None):
+    insurance_examples = ["apply for a claim"] + ([extra_example] if extra_example else [])
+    return IntentListConfig(
+        [
+            IntentConfig("insurance", "insurance", True, None, [], False, has_children=True),
+            IntentConfig("claim", "claim", True, "claim", [], False, insurance_examples, False, "insurance"),
+            IntentConfig("policy", "policy", True, "policy", [], False, ["show my policy"], False, "insurance"),
+            IntentConfig("rma", "rma", True, "rma", [], False, ["check rma status"]),
+        ]
+    )
+
+
+async def test_search_should_only_return_examples_under_parent_intent():
+    index = IntentExampleIndex(CharacterEmbeddingClient(), snapshot_path=None)
+    config = intent_list_config()
+    await index.build(config)
+
+    root_examples = extract_examples(await index.search("check rma", None, size=1))
+    insurance_examples = extract_examples(await index.search("check rma", "insurance", size=3))
+
+    assert index.is_fresh(config)
+    assert root_examples[0]["example"] == "check rma status"
+    assert json.loads(root_examples[0]["intent"]) == {"intent": "rma"}
+    assert {example["example"] for example in insurance_examples} == {"apply for a claim", "show my policy"}
+    assert insurance_examples[0]["score"] >= insurance_examples[1]["score"]
+
+
+async def test_index_should_be_stale_after_config_changed():
+    index = IntentExampleIndex(CharacterEmbeddingClient(), snapshot_path=None)
+    await index.build(intent_list_config())
+
+    assert not index.is_fresh(intent_list_config("claim my money"))
+    assert (await index.search("anything", "unknown_parent")).items == []
+
+
+async def test_snapshot_should_be_reused_when_examples_not_changed(tmp_path):
+    snapshot_path = str(tmp_path / "intent_examples")
+    await IntentExampleIndex(CharacterEmbeddingClient(), snapshot_path).build(intent_list_config())
+    embedding_client = CharacterEmbeddingClient()
+    index = IntentExampleIndex(embedding_client, snapshot_path)
+
+    await index.build(intent_list_config())
+    assert embedding_client.embedded_texts == []
+    assert isinstance(index.matrix, np.memmap)
+
+    await index.build(intent_list_config("claim my money"))
+    assert embedding_client.embedded_texts == ["claim my money"]
+    assert index.search_by_embedding(index.matrix[0], None, 4).size == 4
@@ -0,0 +1,119 @@
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from nlu.llm.intent_example_sync import IntentExampleDiff, IntentExampleSynchronizer, example_id
+from third_system.unified_search import UnifiedSearch
+from utils.http_client import http_client_registry
+
+
+def example(text, intent="claim", full_parent_intent="insurance.claim"):
+    return {"intent": intent, "example": text, "full_parent_intent": full_parent_intent}
+
+
+class RecordingUnifiedSearch:
+    def __init__(self, fail_on_upsert=False):
+        self.calls = []
+        self.fail_on_upsert = fail_on_upsert
+
+    async def add_intents_examples(self, table, intent_examples, recreate=False):
+        if self.fail_on_upsert:
+            raise ConnectionError("unified search is down")
+        self.calls.append(("add", recreate, [item["example"] for item in intent_examples]))
+
+
+def test_diff_should_report_added_removed_and_changed_intents():
+    synced = {example_id(item): item for item in [example("apply a claim"), example("show policy", "policy")]}
+
+    diff = IntentExampleDiff.between(
+        synced, [example("apply for a claim"), example("show policy", "policy"), example("rma", "rma", "rma")]
+    )
+
+    assert [item["example"] for item in diff.added.values()] == ["apply for a claim", "rma"]
+    assert [item["example"] for item in diff.removed.values()] == ["apply a claim"]
+    assert diff.changes_by_intent() == {
+        "insurance.claim": {"added": 1, "removed": 1},
+        "rma": {"added": 1, "removed": 0},
+    }
+    assert "insurance.claim: changed, +1 -1" in diff.report()
+    assert IntentExampleDiff.between(synced, list(synced.values())).is_empty()
+
+
+async def test_sync_should_recreate_once_then_only_append_added_examples_in_batches(tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    unified_search = RecordingUnifiedSearch()
+    synchronizer = IntentExampleSynchronizer("topic", manifest_path, unified_search, batch_size=2)
+
+    await synchronizer.sync([example("a"), example("b")])
+    await synchronizer.sync([example("a"), example("b"), example("c"), example("d"), example("e")])
+
+    assert unified_search.calls == [
+        ("add", True, ["a", "b"]),
+        ("add", False, ["c", "d"]),
+        ("add", False, ["e"]),
+    ]
+    with open(manifest_path, encoding="utf-8") as file:
+        assert sorted(item["example"] for item in json.load(file).values()) == ["a", "b", "c", "d", "e"]
+
+
+async def test_removed_examples_should_recreate_the_table(tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    unified_search = RecordingUnifiedSearch()
+    synchronizer = IntentExampleSynchronizer("topic", manifest_path, unified_search)
+
+    await synchronizer.sync([example("a"), example("b")])
+    await synchronizer.sync([example("a"), example("c")])
+
+    assert unified_search.calls == [("add", True, ["a", "b"]), ("add", True, ["a", "c"])]
+    with open(manifest_path, encoding="utf-8") as file:
+        assert sorted(item["example"] for item in json.load(file).values()) == ["a", "c"]
+
+
+async def test_sync_should_only_use_the_upload_endpoint_of_the_service(tmp_path):
+    uploads = []
+
+    async def intent_examples(request: web.Request) -> web.Response:
+        uploads.append((request.match_info["table"], request.query["recreate"], await request.json()))
+        return web.json_response({})
+
+    app = web.Application()
+    # the only intent example endpoint of unified search, examples are appended or the table is recreated
+    app.router.add_post("/vector/{table}/intent_examples", intent_examples)
+    server = TestServer(app)
+    await server.start_server()
+    unified_search = UnifiedSearch()
+    unified_search.base_url = str(server.make_url("")).rstrip("/")
+    synchronizer = IntentExampleSynchronizer("topic", str(tmp_path / "manifest.json"), unified_search)
+
+    await synchronizer.sync([example("a")])
+    await synchronizer.sync([example("a"), example("b")])
+    await synchronizer.sync([example("b")])
+    await http_client_registry.close()
+    await server.close()
+
+    assert uploads == [
+        ("topic", "True", [example("a")]),
+        ("topic", "False", [example("b")]),
+        ("topic", "True", [example("b")]),
+    ]
+
+
+async def test_dry_run_and_failed_sync_should_not_change_manifest(tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    await IntentExampleSynchronizer("topic", manifest_path, RecordingUnifiedSearch()).sync([example("a")])
+    unified_search = RecordingUnifiedSearch()
+
+    diff = await IntentExampleSynchronizer("topic", manifest_path, unified_search).sync(
+        [example("b")], dry_run=True
+    )
+    assert unified_search.calls == []
+    assert len(diff.added) == 1 and len(diff.removed) == 1
+
+    with pytest.raises(ConnectionError):
+        await IntentExampleSynchronizer("topic", manifest_path, RecordingUnifiedSearch(fail_on_upsert=True)).sync(
+            [example("a"), example("b")]
+        )
+    with open(manifest_path, encoding="utf-8") as file:
+        assert [item["example"] for item in json.load(file).values()] == ["a"]
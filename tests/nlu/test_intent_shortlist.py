@@ -0,0 +1,67 @@
+import json
+
+from nlu.intent_config import IntentConfig, IntentListConfig
+from nlu.llm.intent_shortlist import IntentShortlist
+from tests.nlu.test_intent_example_index import CharacterEmbeddingClient
+
+
+def intent_list_config() -> IntentListConfig:
+    return IntentListConfig(
+        [
+            IntentConfig("insurance", "insurance", True, None, [], False, has_children=True),
+            IntentConfig("claim", "claim", True, "claim", [], False, ["apply for a claim"], False, "insurance"),
+            IntentConfig("policy", "policy", True, "policy", [], False, ["show my policy"], False, "insurance"),
+            IntentConfig("rma", "rma", True, "rma", [], False, ["check rma status"]),
+            IntentConfig("weather", "weather", False, "weather", [], False, ["how is the weather today"]),
+            IntentConfig("exchange", "exchange rate", True, "exchange", [], False, ["usd to eur exchange rate"]),
+        ]
+    )
+
+
+def root_intents(config: IntentListConfig) -> list[IntentConfig]:
+    return config.intents_by_parent[None]
+
+
+async def test_shortlist_should_keep_closest_intents_in_original_order():
+    config = intent_list_config()
+    shortlist = IntentShortlist(CharacterEmbeddingClient(), size=1, always_include=["negative"])
+    await shortlist.build(config)
+
+    shortlisted = await shortlist.shortlist("show my policy", root_intents(config), config)
+
+    # insurance is kept for the example of its child intent policy
+    assert [intent.name for intent in shortlisted] == ["insurance", "negative"]
+
+
+async def test_shortlist_should_keep_the_ancestor_of_the_previous_intent():
+    config = intent_list_config()
+    shortlist = IntentShortlist(CharacterEmbeddingClient(), size=1, always_include=[])
+    await shortlist.build(config)
+
+    shortlisted = await shortlist.shortlist(
+        "how is the weather today", root_intents(config), config, keep=["insurance.claim", None]
+    )
+
+    assert [intent.name for intent in shortlisted] == ["insurance", "weather"]
+
+
+async def test_shortlist_should_offer_all_intents_until_built_or_when_few():
+    config = intent_list_config()
+    embedding_client = CharacterEmbeddingClient()
+    shortlist = IntentShortlist(embedding_client, size=1)
+
+    assert await shortlist.shortlist("show my policy", root_intents(config), config) is None
+    await shortlist.building_task
+    assert shortlist.is_fresh(config)
+    assert await shortlist.shortlist("show my policy", config.get_leaf_intents("insurance")[:1], config) is None
+
+
+def test_intent_list_payload_should_only_list_the_given_intents():
+    config = intent_list_config()
+
+    layer = json.loads(config.get_intent_list_payload(None, {"rma", "weather"}))
+    leaf = json.loads(config.get_leaf_intent_list_payload("insurance", {"insurance.policy"}))
+
+    assert [item["name"] for item in layer] == ["rma", "weather"]
+    assert leaf == [{"name": "insurance.policy", "description": ["policy", "insurance"]}]
+    assert len(json.loads(config.get_intent_list_payload(None))) == len(root_intents(config))
@@ -0,0 +1,58 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from third_system.unified_search import UnifiedSearch
+from utils.http_client import HttpClientRegistry, http_client_registry
+
+
+async def test_sessions_should_be_reused_per_name_until_closed():
+    registry = HttpClientRegistry(connection_limit_per_host=4, dns_cache_ttl=60, connect_timeout=1, read_timeout=5)
+
+    session = registry.get_session("search")
+
+    assert registry.get_session("search") is session
+    assert registry.get_session("graph") is not session
+    assert session.connector.limit_per_host == 4
+    assert session.timeout.connect == 1
+    assert session.timeout.sock_read == 5
+
+    await registry.close()
+
+    assert session.closed
+    assert registry.get_session("search") is not session
+    await registry.close()
+
+
+def test_sessions_should_not_be_shared_across_event_loops():
+    registry = HttpClientRegistry()
+
+    async def get_and_close():
+        session = registry.get_session()
+        await registry.close()
+        return session
+
+    assert asyncio.run(get_and_close()) is not asyncio.run(get_and_close())
+
+
+async def test_unified_search_calls_should_keep_the_connection_alive():
+    peers = set()
+
+    async def link(request: web.Request) -> web.Response:
+        peers.add(request.transport.get_extra_info("peername"))
+        return web.json_response(f"link of {request.query['filename']}")
+
+    app = web.Application()
+    app.router.add_get("/file/link", link)
+    server = TestServer(app)
+    await server.start_server()
+    unified_search = UnifiedSearch()
+    unified_search.base_url = str(server.make_url("")).rstrip("/")
+
+    links = [await unified_search.generate_file_link(name) for name in ["a.docx", "b.docx"]]
+    await http_client_registry.close()
+    await server.close()
+
+    assert links == ["link of a.docx", "link of b.docx"]
+    assert len(peers) == 1